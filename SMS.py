@@ -1,14 +1,15 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, font as tkfont
 from tkinterdnd2 import DND_FILES, TkinterDnD
-import pandas as pd
-import re
 from datetime import datetime
 import os
 import json
 import sys
-import time
-import random
+import threading
+import queue
+import multiprocessing
+
+import sms_pipeline
 
 try:
     from PIL import Image, ImageTk
@@ -22,6 +23,9 @@ try:
 except ImportError:
     RESOURCE_AVAILABLE = False
 
+# Buffered log lines are written to the status box at most this often (~30 fps)
+LOG_FLUSH_MS = 33
+
 
 class CSVFormatterApp:
     def __init__(self, root):
@@ -43,6 +47,20 @@ class CSVFormatterApp:
             self.output_dir = os.path.join(os.path.expanduser("~"), "Desktop")
         if not hasattr(self, 'filename_prefix'):
             self.filename_prefix = "sms_contacts"
+        if not hasattr(self, 'fold_unicode'):
+            self.fold_unicode = False
+        if not hasattr(self, 'max_sends'):
+            self.max_sends = 0
+            self.window_days = sms_pipeline.DEFAULT_WINDOW_DAYS
+            self.record_history = False
+        if not hasattr(self, 'timings_dir'):
+            self.timings_dir = sms_pipeline.DEFAULT_TIMINGS_DIR
+            self.profile = False
+            self.track_memory = False
+        if not hasattr(self, 'parquet_sidecar'):
+            self.parquet_sidecar = False
+        if not hasattr(self, 'output_compression'):
+            self.output_compression = None
         
         # Bind window close event
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
@@ -273,7 +291,7 @@ class CSVFormatterApp:
         
         self.drop_sublabel = tk.Label(
             drop_content,
-            text="or click to browse files",
+            text="or click to browse files (several files or a folder run as a batch)",
             font=("Segoe UI", 9),
             bg="#f8f9fa",
             fg="#95a5a6"
@@ -287,6 +305,20 @@ class CSVFormatterApp:
         self.drop_label.bind('<Button-1>', self.browse_file)
         self.drop_sublabel.bind('<Button-1>', self.browse_file)
         self.drop_icon.bind('<Button-1>', self.browse_file)
+
+        self.folder_btn = tk.Button(
+            drop_card,
+            text="Process Folder…",
+            command=self.browse_folder,
+            font=("Segoe UI", 9),
+            bg="#ecf0f1",
+            fg="#2c3e50",
+            relief=tk.FLAT,
+            padx=10,
+            pady=4,
+            cursor="hand2"
+        )
+        self.folder_btn.pack(pady=(0, 12))
         
         # Status area card
         status_card = tk.Frame(main_container, bg="white", relief=tk.FLAT)
@@ -321,6 +353,21 @@ class CSVFormatterApp:
         )
         self.preview_btn.pack(side=tk.RIGHT)
         
+        # Progress of the running pipeline stage (rows, rows/s, ETA)
+        progress_frame = tk.Frame(status_card, bg="white")
+        progress_frame.pack(side=tk.BOTTOM, fill=tk.X, padx=15, pady=(0, 12))
+        self.progress_bar = ttk.Progressbar(progress_frame, mode="determinate", maximum=1.0)
+        self.progress_bar.pack(fill=tk.X)
+        self.progress_label = tk.Label(
+            progress_frame,
+            text="",
+            font=("Segoe UI", 8),
+            bg="white",
+            fg="#7f8c8d",
+            anchor="w"
+        )
+        self.progress_label.pack(fill=tk.X)
+        
         self.status_text = tk.Text(
             status_card, 
             height=12, 
@@ -380,10 +427,20 @@ class CSVFormatterApp:
         
         # Store file path for processing
         self.current_file_path = None
+        self.current_sheet = None
         self.validation_passed = False
         self.preview_df = None
         self.preview_before_df = None
         self.preview_after_base_df = None
+        # Parsed/validated frames shared by validation, preview and formatting
+        self.session = sms_pipeline.SessionCache()
+        
+        # Validation/formatting run on a worker thread; its log lines and UI
+        # calls are queued here and applied on the Tk thread by _drain_events
+        self.events = queue.Queue()
+        self.worker = None
+        self.progress = sms_pipeline.Progress(self._report_progress)
+        self.root.after(LOG_FLUSH_MS, self._drain_events)
         
         # Hover effects
         self.setup_hover_effects()
@@ -408,60 +465,12 @@ class CSVFormatterApp:
         self.format_btn.bind("<Leave>", lambda e: on_leave(e, self.format_btn, "#27ae60"))
     
     def _is_formula_or_error(self, value):
-        """Return True if a spreadsheet cell contains a formula or an error token.
-
-        We treat any string beginning with '=' as a formula and common
-        spreadsheet error literals as artifacts to ignore.
-        """
-        if pd.isna(value):
-            return False
-        text = str(value).strip()
-        if text.startswith('='):
-            return True
-        error_tokens = {
-            '#VALUE!', '#DIV/0!', '#N/A', '#REF!', '#NAME?', '#NULL!',
-            '#NUM!', '#ERROR!', '#GETTING_DATA', '#SPILL!'
-        }
-        return text in error_tokens
+        """Return True if a spreadsheet cell contains a formula or an error token."""
+        return sms_pipeline.is_formula_or_error(value)
 
     def _clean_spreadsheet_artifacts(self, df):
-        """Remove rows that are clearly spreadsheet artifacts (formulas/errors).
-
-        Rules:
-        - If the phone column (first column) is a formula, an error token, or empty ⇒ drop row
-        - If all columns in a row are formulas/errors/empty whitespace ⇒ drop row
-        Returns the cleaned dataframe and a stats dict.
-        """
-        if df is None or df.empty:
-            return df, {"dropped": 0}
-
-        phone_col = df.columns[0]
-
-        def _is_empty_like(val):
-            if pd.isna(val):
-                return True
-            s = str(val).strip()
-            return s == '' or s.lower() in {"nan", "none", "null", '0', '0.0', '0.00'}
-
-        # Identify rows to drop
-        drop_mask = pd.Series(False, index=df.index)
-
-        # 1) Drop if phone column is formula/error/empty-like
-        drop_mask |= df[phone_col].apply(lambda v: self._is_formula_or_error(v) or _is_empty_like(v))
-
-        # 2) Drop if every cell in row is formula/error/empty-like
-        def _row_artifact(row):
-            for v in row:
-                if not (self._is_formula_or_error(v) or _is_empty_like(v)):
-                    return False
-            return True
-        drop_mask |= df.apply(_row_artifact, axis=1)
-
-        dropped = int(drop_mask.sum())
-        if dropped > 0:
-            df = df[~drop_mask].copy()
-
-        return df, {"dropped": dropped}
+        """Remove rows that are clearly spreadsheet artifacts (formulas/errors)."""
+        return sms_pipeline.clean_spreadsheet_artifacts(df)
 
     def load_settings(self):
         """Load saved settings from config file"""
@@ -471,6 +480,19 @@ class CSVFormatterApp:
                     config = json.load(f)
                     self.output_dir = config.get('output_dir', os.path.join(os.path.expanduser("~"), "Desktop"))
                     self.filename_prefix = config.get('filename_prefix', 'sms_contacts')
+                    self.fold_unicode = bool(config.get('fold_unicode', False))
+                    # Campaign history / frequency cap (max_sends 0 = no cap)
+                    self.max_sends = int(config.get('max_sends', 0))
+                    self.window_days = int(config.get('window_days', sms_pipeline.DEFAULT_WINDOW_DAYS))
+                    self.record_history = bool(config.get('record_history', False))
+                    # Timing reports of every run (and optional cProfile) for diagnosing slow files
+                    self.timings_dir = config.get('timings_dir', sms_pipeline.DEFAULT_TIMINGS_DIR)
+                    self.profile = bool(config.get('profile', False))
+                    self.track_memory = bool(config.get('track_memory', False))
+                    # Parquet copy of every output next to the CSV (needs pyarrow)
+                    self.parquet_sidecar = bool(config.get('parquet_sidecar', False))
+                    # Compressed output: None, "gzip" or "zstd" (zstd needs zstandard)
+                    self.output_compression = config.get('output_compression') or None
                     
                     # Verify directory still exists
                     if not os.path.exists(self.output_dir):
@@ -485,7 +507,16 @@ class CSVFormatterApp:
         try:
             config = {
                 'output_dir': self.output_dir,
-                'filename_prefix': self.filename_entry.get().strip() or 'sms_contacts'
+                'filename_prefix': self.filename_entry.get().strip() or 'sms_contacts',
+                'fold_unicode': self.fold_unicode,
+                'max_sends': self.max_sends,
+                'window_days': self.window_days,
+                'record_history': self.record_history,
+                'timings_dir': self.timings_dir,
+                'profile': self.profile,
+                'track_memory': self.track_memory,
+                'parquet_sidecar': self.parquet_sidecar,
+                'output_compression': self.output_compression
             }
             with open(self.config_file, 'w') as f:
                 json.dump(config, f)
@@ -499,13 +530,113 @@ class CSVFormatterApp:
         self.root.destroy()
         
     def log(self, message):
-        """Add message to status log"""
-        self.status_text.insert(tk.END, f"{message}\n")
+        """Add message to status log.
+
+        Messages are buffered and written in one batch per frame by
+        _drain_events, so logging cost does not grow with the number of lines.
+        Safe to call from the worker thread.
+        """
+        self.events.put(("log", message))
+
+    def _ui(self, func, *args, **kwargs):
+        """Run a Tk call on the main thread (queued when called from the worker thread)"""
+        if threading.current_thread() is not threading.main_thread():
+            self.events.put(("call", func, args, kwargs))
+            return
+        self._flush_events()
+        func(*args, **kwargs)
+
+    def _flush_events(self):
+        """Apply queued log lines and UI calls in order, inserting consecutive lines at once"""
+        lines = []
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == "log":
+                lines.append(f"{event[1]}\n")
+                continue
+            # Keep ordering: flush pending log lines before any UI call
+            if lines:
+                self.status_text.insert(tk.END, "".join(lines))
+                lines = []
+            _, func, args, kwargs = event
+            func(*args, **kwargs)
+        if lines:
+            self.status_text.insert(tk.END, "".join(lines))
         self.status_text.see(tk.END)
-        self.root.update()
-        
+
+    def _drain_events(self):
+        """Flush the log buffer once per frame"""
+        if not self.events.empty():
+            self._flush_events()
+        self.root.after(LOG_FLUSH_MS, self._drain_events)
+
+    def _busy(self):
+        """True (after telling the user) while the worker is still processing a file"""
+        if self.worker is not None and self.worker.is_alive():
+            messagebox.showinfo("Busy", "Please wait for the current file to finish.")
+            return True
+        return False
+
+    def _run_in_background(self, target, *args):
+        """Start pipeline work on the worker thread"""
+        self.format_btn.config(state=tk.DISABLED, bg="#95a5a6")
+        self.preview_btn.config(state=tk.DISABLED, bg="#bdc3c7")
+        self.worker = threading.Thread(target=self._timed_run, args=(target,) + args, daemon=True)
+        self.worker.start()
+
+    def _timed_run(self, target, *args):
+        """Run target with every stage timed; the breakdown goes to the log
+        and a JSON report under the timings directory (worker thread)"""
+        timings = sms_pipeline.Timings(profile=self.profile or sms_pipeline.profiling_requested(),
+                                       memory=self.track_memory or sms_pipeline.memory_tracking_requested())
+        self.progress.timings = timings
+        file_path = self.current_file_path
+        timings.start()
+        try:
+            target(*args)
+        finally:
+            # Frames the app keeps between validation, preview and formatting
+            timings.track_frame("preview_before_df", self.preview_before_df)
+            timings.track_frame("preview_after_base_df", self.preview_after_base_df)
+            timings.track_frame("preview_df", self.preview_df)
+            timings.stop()
+            self.progress.timings = None
+            if timings.stages:
+                timings.log_summary(self.log)
+                if self.timings_dir:
+                    # Validation sets the current file, formatting clears it when done
+                    file_path = self.current_file_path or file_path
+                    label = target.__name__.strip("_").replace("_worker", "")
+                    if file_path and target != self._batch_worker:
+                        label += "_" + sms_pipeline.file_stem(file_path)
+                    try:
+                        sms_pipeline.save_timings(timings, self.timings_dir, label)
+                    except OSError:
+                        pass
+
+    def _report_progress(self, text, done):
+        """sms_pipeline.Progress callback (worker thread): finished stages go
+        to the log, the running one to the progress bar"""
+        if done:
+            self.log(text)
+        fraction = 1.0 if done else self.progress.fraction()
+        self._ui(self._show_progress, fraction, text)
+
+    def _show_progress(self, fraction, text):
+        if fraction is None:
+            # Unknown total: keep the bar moving
+            self.progress_bar.config(mode="indeterminate")
+            self.progress_bar.step(0.02)
+        else:
+            self.progress_bar.config(mode="determinate", value=fraction)
+        self.progress_label.config(text=text)
+
     def clear_log(self):
         """Clear the status log"""
+        self._flush_events()
         self.status_text.delete(1.0, tk.END)
     
     def select_output_directory(self):
@@ -522,373 +653,167 @@ class CSVFormatterApp:
             self.save_settings()  # Save immediately when changed
         
     def browse_file(self, event):
-        """Open file browser"""
+        """Open file browser (several files run as a batch)"""
         from tkinter import filedialog
-        filename = filedialog.askopenfilename(
-            title="Select CSV file",
-            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        filenames = filedialog.askopenfilenames(
+            title="Select CSV file(s)",
+            filetypes=[("CSV files", "*.csv *.csv.gz *.csv.zst"), ("Excel workbooks", "*.xlsx *.xlsm"), ("Parquet files", "*.parquet *.pq"),
+                       ("Arrow files", "*.arrow *.feather *.ipc"), ("All files", "*.*")]
         )
-        if filename:
-            self.process_file(filename)
+        if filenames:
+            self.open_paths(list(filenames))
+
+    def browse_folder(self):
+        """Pick a folder and batch process every CSV file in it"""
+        from tkinter import filedialog
+        folder = filedialog.askdirectory(title="Select folder of CSV files")
+        if folder:
+            self.open_paths([folder])
     
     def drop_file(self, event):
-        """Handle dropped file"""
-        file_path = event.data.strip('{}')
-        if file_path.lower().endswith('.csv'):
-            self.validate_file(file_path)
+        """Handle dropped file(s) or folder(s)"""
+        self.open_paths(list(self.root.tk.splitlist(event.data)))
+
+    def open_paths(self, paths):
+        """Validate a single CSV file, or batch process several files/folders"""
+        files = sms_pipeline.expand_inputs(paths)
+        csv_files = [path for path in files if sms_pipeline.is_contact_list(path)]
+        if not csv_files:
+            messagebox.showerror("Error", "Please drop a CSV or Excel file (or a folder of them)")
+            return
+        if len(paths) == 1 and not os.path.isdir(paths[0]):
+            self.validate_file(csv_files[0])
         else:
-            messagebox.showerror("Error", "Please drop a CSV file")
+            self.batch_files(csv_files, skipped=len(files) - len(csv_files))
+
+    def _parquet_enabled(self):
+        """Whether to write Parquet copies; warns once per run if pyarrow is missing"""
+        if self.parquet_sidecar and not sms_pipeline.PYARROW_AVAILABLE:
+            self.log("Note: Parquet output is on but pyarrow is not installed; writing CSV only\n")
+            return False
+        return self.parquet_sidecar
+
+    def _output_compression(self):
+        """Codec for output files; falls back to plain CSV if it is unavailable"""
+        if self.output_compression not in sms_pipeline.COMPRESSION_SUFFIXES:
+            return None
+        if self.output_compression == "zstd" and not sms_pipeline.ZSTANDARD_AVAILABLE:
+            self.log("Note: zstd output is on but zstandard is not installed; writing plain CSV\n")
+            return None
+        return self.output_compression
+
+    def batch_files(self, file_paths, skipped=0):
+        """Validate and format several files in parallel in the background"""
+        if self._busy():
+            return
+        self.clear_log()
+        self._run_in_background(self._batch_worker, file_paths, self.filename_entry.get(), skipped)
+
+    def _batch_worker(self, file_paths, custom_name, skipped=0):
+        """Run a batch across worker processes and show the summary table (worker thread)"""
+        try:
+            if skipped:
+                self.log(f"Skipping {skipped} unsupported file(s)\n")
+            self.validation_passed = False
+            self.session.clear()
+            self.current_file_path = None
+            self.current_sheet = None
+            self.preview_df = self.preview_before_df = self.preview_after_base_df = None
+            history = None
+            if self.record_history or self.max_sends > 0:
+                history = sms_pipeline.CampaignHistory()
+            name = os.path.splitext(custom_name.strip())[0] or sms_pipeline.DEFAULT_FILENAME
+            results = sms_pipeline.run_batch(
+                file_paths, self.output_dir, name, self.log, self.fold_unicode,
+                history=history, max_sends=self.max_sends or None, window_days=self.window_days,
+                progress=self.progress, parquet=self._parquet_enabled(),
+                compression=self._output_compression(),
+            )
+            passed = sum(result["exit_code"] == sms_pipeline.EXIT_OK for result in results)
+            summary = f"{passed} of {len(results)} file(s) formatted"
+            self._ui(self._highlight_log_line, summary)
+            show = messagebox.showinfo if passed == len(results) else messagebox.showwarning
+            self._ui(show, "Batch Complete", f"{summary}.\n\nSee the summary table in the log for details.")
+        except Exception as e:
+            self.log(f"\n{'='*60}")
+            self.log(f"ERROR OCCURRED")
+            self.log(f"{'='*60}\n")
+            self.log(f"Error: {str(e)}\n")
+            self._ui(messagebox.showerror, "Error", f"Batch processing failed:\n{str(e)}")
     
     def detect_column_type(self, series):
         """Detect if a column contains numeric data"""
-        if series is None or len(series) == 0:
-            return "unknown"
-        
-        # Get non-null values
-        non_null_values = series.dropna()
-        if len(non_null_values) == 0:
-            return "empty"
-        
-        # Check if all non-null values can be converted to numbers
-        numeric_count = 0
-        for value in non_null_values:
-            try:
-                float(str(value))
-                numeric_count += 1
-            except ValueError:
-                pass
-        
-        # If more than 80% of values are numeric, consider it a numeric column
-        if numeric_count / len(non_null_values) >= 0.8:
-            return "numeric"
-        else:
-            return "text"
+        return sms_pipeline.detect_column_type(series)
 
     def format_phone_number(self, phone):
         """Format phone number to digits only"""
-        if pd.isna(phone):
-            return ""
-        # Convert to string and remove all non-digit characters
-        phone_str = str(phone)
-        
-        # Check if original string starts with 0 (for 09 format preservation)
-        starts_with_zero = phone_str.startswith('0')
-        
-        # Handle decimal numbers more carefully
-        # For phone numbers, we want to truncate to integer part (not round)
-        if '.' in phone_str:
-            try:
-                # Try to parse as float to check if it's a whole number
-                float_val = float(phone_str)
-                if float_val == int(float_val):  # It's a whole number
-                    # For whole numbers, just remove the decimal part without converting to int
-                    phone_str = phone_str.split('.')[0]
-                else:
-                    # It's a decimal number, truncate to integer part
-                    # But preserve the leading zero if it was there originally
-                    int_part = str(int(float_val))
-                    if starts_with_zero and not int_part.startswith('0'):
-                        # The int conversion removed the leading zero, add it back
-                        phone_str = '0' + int_part
-                    else:
-                        phone_str = int_part
-            except ValueError:
-                # If it's not a valid number, just remove the decimal part
-                phone_str = phone_str.split('.')[0]
-        
-        # Extract digits while preserving the original structure for 09 numbers
-        digits = re.sub(r'\D', '', phone_str)
-        
-        # Special handling for 09 format numbers that might have lost their leading zero
-        # If the original string started with 0 and we have 10 digits, add the leading zero back
-        if starts_with_zero and len(digits) == 10:
-            digits = '0' + digits
-        
-        # Note: We do NOT convert 09 numbers to 63 - 09 is a valid Philippine format
-        # Only remove non-digit characters and handle decimal formats
-        
-        return digits
+        return sms_pipeline.format_phone_number(phone)
     
     def replace_special_chars(self, text, track_replacements=False):
         """Replace special characters with their ASCII equivalents"""
-        if pd.isna(text):
-            return text, {} if track_replacements else text
-        text = str(text)
-        original_text = text
-        
-        # Comprehensive character mapping for common special characters
-        char_map = {
-            
-            'ñ': 'n', 'Ñ': 'N',
-
-            'à': 'a', 'á': 'a', 'â': 'a', 'ã': 'a', 'ä': 'a', 'å': 'a',
-            'À': 'A', 'Á': 'A', 'Â': 'A', 'Ã': 'A', 'Ä': 'A', 'Å': 'A',
-            'è': 'e', 'é': 'e', 'ê': 'e', 'ë': 'e',
-            'È': 'E', 'É': 'E', 'Ê': 'E', 'Ë': 'E',
-            'ì': 'i', 'í': 'i', 'î': 'i', 'ï': 'i',
-            'Ì': 'I', 'Í': 'I', 'Î': 'I', 'Ï': 'I',
-            'ò': 'o', 'ó': 'o', 'ô': 'o', 'õ': 'o', 'ö': 'o',
-            'Ò': 'O', 'Ó': 'O', 'Ô': 'O', 'Õ': 'O', 'Ö': 'O',
-            'ù': 'u', 'ú': 'u', 'û': 'u', 'ü': 'u',
-            'Ù': 'U', 'Ú': 'U', 'Û': 'U', 'Ü': 'U',
-            'ý': 'y', 'ÿ': 'y',
-            'Ý': 'Y', 'Ÿ': 'Y',
-            'ç': 'c', 'Ç': 'C',
-            
-        }
-        
-        # Track replacements if requested
-        replacements_made = {}
-        if track_replacements:
-            for special_char, replacement in char_map.items():
-                if special_char in text:
-                    count = text.count(special_char)
-                    replacements_made[special_char] = {'replacement': replacement, 'count': count}
-                    text = text.replace(special_char, replacement)
-        else:
-            # Apply character mapping
-            for special_char, replacement in char_map.items():
-                text = text.replace(special_char, replacement)
-        
-        return (text, replacements_made) if track_replacements else text
+        return sms_pipeline.replace_special_chars(text, track_replacements, self.fold_unicode)
     
     def validate_file(self, file_path):
-        """Validate the CSV file and show what will be changed"""
+        """Validate the CSV file in the background and show what will be changed"""
+        if self._busy():
+            return
+        sheet = None
+        if sms_pipeline.input_format(file_path) == "excel":
+            sheet = self._choose_sheet(file_path)
+            if sheet is None:
+                return
+        self.clear_log()
+        self._run_in_background(self._validate_worker, file_path, sheet)
+
+    def _choose_sheet(self, file_path):
+        """Worksheet to read from a workbook; asks when there are several
+        (None if cancelled or unreadable)"""
+        from tkinter import simpledialog
+        try:
+            sheets = sms_pipeline.excel_sheets(file_path)
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not open workbook:\n{str(e)}")
+            return None
+        if len(sheets) <= 1:
+            return sheets[0] if sheets else None
+        sheet = simpledialog.askstring(
+            "Select Sheet",
+            f"{os.path.basename(file_path)} has {len(sheets)} sheets:\n\n" + "\n".join(sheets)
+            + "\n\nSheet to read:",
+            initialvalue=sheets[0], parent=self.root,
+        )
+        if sheet is not None and sheet not in sheets:
+            messagebox.showerror("Error", f"No sheet named '{sheet}' in {os.path.basename(file_path)}")
+            return None
+        return sheet
+
+    def _validate_worker(self, file_path, sheet=None):
+        """Validate the CSV file and show what will be changed (worker thread)"""
         try:
-            self.clear_log()
             self.current_file_path = file_path
+            self.current_sheet = sheet
             self.validation_passed = False
-            self.format_btn.config(state=tk.DISABLED, bg="#95a5a6")
-            self.preview_btn.config(state=tk.DISABLED, bg="#bdc3c7")
             
             self.log(f"{'='*60}")
             self.log(f"FILE VALIDATION")
             self.log(f"{'='*60}")
-            self.log(f"File: {os.path.basename(file_path)}\n")
-            
-            
-            # Read CSV (keep original for preview BEFORE)
-            df_raw = pd.read_csv(file_path)
-            self.preview_before_df = df_raw.copy()
-
-            # Clean Google Sheets artifacts (formulas / error tokens) for validation and AFTER preview base
-            df, artifact_stats = self._clean_spreadsheet_artifacts(df_raw)
-            self.preview_after_base_df = df.copy()
-            if artifact_stats.get("dropped", 0) > 0:
-                self.log(f"✓ Ignored {artifact_stats['dropped']} artifact row(s) from formulas/errors")
-            original_rows = len(df_raw)
-            self.log(f"✓ Loaded {original_rows} rows")
-            
-            # Get headers
-            headers = df.columns.tolist()
-            self.log(f"✓ Found {len(headers)} columns: {', '.join(headers)}\n")
-            
-            # Detect likely Name and Date columns (based on headers)
-            def detect_column(headers_list, phone_header, patterns):
-                for h in headers_list:
-                    if h == phone_header:
-                        continue
-                    if re.search(patterns, str(h), flags=re.IGNORECASE):
-                        return h
-                return None
-            
-            if len(df.columns) == 0:
-                raise ValueError("CSV file is empty")
-            
-            phone_col = df.columns[0]
-            name_col = detect_column(headers, phone_col, r"\b(name|full\s*name|contact|recipient)\b")
-            last_name_col = detect_column(headers, phone_col, r"\b(last\s*name|surname|family\s*name)\b")
-            date_col = detect_column(headers, phone_col, r"\b(date|send\s*date|scheduled?\s*date|dob|birth)\b")
-            
-            # A column is considered required only if it has at least one non-empty value anywhere
-            def column_has_values(series):
-                if series is None:
-                    return False
-                # Convert to string and strip whitespace
-                s = series.astype(str).str.strip()
-                # Remove NaN values
-                s = s[~series.isna()]
-                # Check for non-empty values, excluding common formula results that evaluate to empty
-                # This handles Google Sheets formulas that might return empty strings, 0, or other "empty" values
-                non_empty = s.ne('').any()
-                if non_empty:
-                    # Additional check: make sure we have actual meaningful content
-                    # Exclude values that are just "0", "0.0", or other numeric representations of empty
-                    meaningful_values = s[~s.isin(['0', '0.0', '0.00', 'nan', 'NaN', 'None', 'null'])]
-                    return len(meaningful_values) > 0
-                return False
-            
-            name_required = bool(name_col and name_col in df.columns and column_has_values(df[name_col]))
-            last_name_required = bool(last_name_col and last_name_col in df.columns and column_has_values(df[last_name_col]))
-            date_required = bool(date_col and date_col in df.columns and column_has_values(df[date_col]))
-            
-            self.log(f"{'─'*60}")
-            self.log(f"VALIDATION CHECKS")
-            self.log(f"{'─'*60}\n")
-            
-            # Check for empty phone numbers BEFORE formatting
-            # Handle Google Sheets formulas and decimal formats
-            def is_phone_empty(phone_value):
-                if pd.isna(phone_value):
-                    return True
-                phone_str = str(phone_value).strip()
-                if phone_str == '' or phone_str in ['0', '0.0', '0.00', 'nan', 'NaN', 'None', 'null']:
-                    return True
-                # Treat formulas and error tokens as empty
-                if self._is_formula_or_error(phone_value):
-                    return True
-                # Check if it's a decimal number that represents a whole number
-                if '.' in phone_str:
-                    try:
-                        float_val = float(phone_str)
-                        if float_val == int(float_val):  # It's a whole number with decimal
-                            # This is a valid phone number in decimal format, not empty
-                            return False
-                    except ValueError:
-                        pass
-                return False
-            
-            empty_phone_mask = df[phone_col].apply(is_phone_empty)
-            empty_phone_rows = df[empty_phone_mask]
-            if len(empty_phone_rows) > 0:
-                self.log(f"VALIDATION FAILED: Found {len(empty_phone_rows)} empty phone number(s)\n")
-                self.log("Rows with empty phone numbers:")
-                for idx in empty_phone_rows.index:
-                    row_num = idx + 2  # +2 because Excel starts at 1 and has header
-                    display_name = empty_phone_rows.loc[idx, name_col] if name_col and name_col in empty_phone_rows.columns else "N/A"
-                    self.log(f"  • Row {row_num}: {display_name}")
-                
-                self.log(f"\nPlease fix empty phone numbers before formatting.")
-                messagebox.showwarning(
-                    "Validation Failed",
-                    f"Found {len(empty_phone_rows)} row(s) with empty phone numbers.\n\n"
-                    "Please fix the file and try again."
-                )
-                return
-            
-            self.log("✓ No empty phone numbers found")
-            
-            # Fail if phone column contains any letters
-            phone_with_letters = df[df[phone_col].astype(str).str.contains(r"[A-Za-z]", na=False)]
-            if len(phone_with_letters) > 0:
-                self.log(f"VALIDATION FAILED: Found {len(phone_with_letters)} phone number(s) containing letters\n")
-                self.log("Rows with invalid phone numbers:")
-                for idx in phone_with_letters.index:
-                    row_num = idx + 2  # account for header
-                    raw_phone = df.loc[idx, phone_col]
-                    display_name = df.loc[idx, name_col] if name_col and name_col in df.columns else "N/A"
-                    self.log(f"  • Row {row_num}: {raw_phone} (Name: {display_name})")
-                self.log("\nPlease remove letters from phone numbers before formatting.")
-                messagebox.showwarning(
-                    "Validation Failed",
-                    f"Found {len(phone_with_letters)} phone number(s) containing letters.\n\nPlease fix the file and try again."
-                )
-                return
-            
-            # Fail if phone number is incomplete (must be 11 digits starting with 09 or 12 digits starting with 63)
-            df_digits = df[phone_col].astype(str).apply(self.format_phone_number)
-            
-            # Check for valid Philippine phone number formats
-            def is_valid_ph_phone(digits):
-                if len(digits) == 11 and digits.startswith('09'):
-                    return True
-                elif len(digits) == 12 and digits.startswith('63'):
-                    return True
-                return False
-            
-            invalid_mask = ~df_digits.apply(is_valid_ph_phone)
-            invalid_phone_rows = df[invalid_mask]
-            if len(invalid_phone_rows) > 0:
-                self.log(f"VALIDATION FAILED: Found {len(invalid_phone_rows)} phone number(s) not matching required format\n")
-                self.log("Valid formats: 09xxxxxxxxx (11 digits) or 63xxxxxxxxxx (12 digits)")
-                self.log("Rows with invalid phone numbers:")
-                for idx in invalid_phone_rows.index:
-                    row_num = idx + 2
-                    raw_phone = df.loc[idx, phone_col]
-                    digits = df_digits.loc[idx]
-                    display_name = df.loc[idx, name_col] if name_col and name_col in df.columns else "N/A"
-                    reason_parts = []
-                    if len(digits) not in [11, 12]:
-                        reason_parts.append(f"len={len(digits)}")
-                    if not (digits.startswith('09') or digits.startswith('63')):
-                        reason_parts.append("invalid prefix")
-                    reason = ", ".join(reason_parts) if reason_parts else "format"
-                    self.log(f"  • Row {row_num}: {raw_phone} → {digits} ({reason}) (Name: {display_name})")
-                self.log("\nPhone numbers must be 11 digits starting with '09' or 12 digits starting with '63'.")
-                messagebox.showwarning(
-                    "Validation Failed",
-                    "Phone numbers must be 11 digits starting with '09' or 12 digits starting with '63'. Please fix the highlighted rows and try again."
-                )
-                return
-            
-            # Strict rule: Fail if any non-phone field in a row is missing/empty/formula/error
-            phone_present = ~(df[phone_col].isna() | (df[phone_col].astype(str).str.strip() == ''))
-            def _is_empty_field(val):
-                if pd.isna(val):
-                    return True
-                if self._is_formula_or_error(val):
-                    return True
-                s = str(val).strip()
-                return s == '' or s in ['nan', 'NaN', 'None', 'null']
-
-            rows_with_missing = []
-            for idx in df.index:
-                if not phone_present.loc[idx]:
-                    continue
-                missing_in_row = []
-                for col in df.columns:
-                    if col == phone_col:
-                        continue
-                    if _is_empty_field(df.loc[idx, col]):
-                        missing_in_row.append(col)
-                if missing_in_row:
-                    rows_with_missing.append((idx, missing_in_row))
-
-            if rows_with_missing:
-                self.log(f"VALIDATION FAILED: Found {len(rows_with_missing)} row(s) with missing field(s)\n")
-                for idx, cols in rows_with_missing:
-                    row_num = idx + 2
-                    self.log(f"  • Row {row_num}: missing {', '.join(cols)}")
-                self.log("\nPlease fill in all fields for rows that have a phone number.")
-                messagebox.showwarning(
-                    "Validation Failed",
-                    f"Found {len(rows_with_missing)} row(s) with missing field(s). Please complete all fields and try again."
-                )
-                return
-            
-            # Check duplicates BEFORE formatting
-            # Create a temporary formatted version to check for duplicates
-            df_temp = df.copy()
-            df_temp[phone_col] = df_temp[phone_col].apply(self.format_phone_number)
-            
-            duplicates = df_temp[df_temp.duplicated(subset=[phone_col], keep=False)]
-            duplicate_count = len(duplicates)
-            
-            if duplicate_count > 0:
-                self.log(f"VALIDATION FAILED: Found duplicate phone numbers\n")
-                
-                # Get duplicate numbers and their rows
-                dup_groups = df_temp[df_temp.duplicated(subset=[phone_col], keep=False)].groupby(phone_col)
-                
-                self.log("Duplicate phone numbers found:")
-                for phone_num, group in dup_groups:
-                    self.log(f"\n  {phone_num} appears {len(group)} times:")
-                    for idx in group.index:
-                        row_num = idx + 2  # +2 because Excel starts at 1 and has header
-                        display_name = df.loc[idx, name_col] if name_col and name_col in df.columns else "N/A"
-                        self.log(f"    • Row {row_num}: {display_name}")
-                
-                self.log(f"\nPlease remove duplicates before formatting.")
-                messagebox.showwarning(
-                    "Validation Failed",
-                    f"Found duplicate phone numbers!\n\n"
-                    f"Unique numbers duplicated: {len(dup_groups)}\n"
-                    f"Total rows affected: {duplicate_count}\n\n"
-                    "Please fix the file and try again."
-                )
+            self.log(f"File: {os.path.basename(file_path)}" + (f" (sheet: {sheet})" if sheet else "") + "\n")
+            
+            
+            # Read CSV and run the shared validation checks (artifact cleaning,
+            # empty/letters/format/missing/duplicates); an unchanged file is served from the session cache
+            entry = self.session.load(file_path, self.log, self.progress, sheet)
+            result = entry["result"]
+            df = result["df"]
+            # Original (preview BEFORE) and cleaned (preview AFTER base) frames
+            self.preview_before_df = entry["raw"]
+            self.preview_after_base_df = df
+            if not result["passed"]:
+                self._ui(messagebox.showwarning, "Validation Failed", result["message"])
                 return
             
-            self.log("✓ No duplicates found\n")
+            headers = df.columns.tolist()
+            phone_col = result["phone_col"]
             
             # Show what will be changed
             self.log(f"{'─'*60}")
@@ -954,18 +879,11 @@ class CSVFormatterApp:
             special_chars_found = set()
             
             for col in df.columns:
-                if df[col].dtype == 'object':
-                    has_special = False
-                    for val in df[col]:
-                        if pd.notna(val):
-                            val_str = str(val)
-                            # Check for any special characters that will be replaced
-                            for char in val_str:
-                                if ord(char) > 127:  # Non-ASCII characters
-                                    has_special = True
-                                    special_chars_found.add(char)
-                                    break
-                    if has_special:
+                if sms_pipeline.is_text_column(df[col]):
+                    # Non-ASCII characters, found with the same vectorized scan transliteration uses
+                    chars = sms_pipeline.special_characters(df[col])
+                    if chars:
+                        special_chars_found |= chars
                         special_char_count += 1
                         special_char_columns.append(col)
             
@@ -988,19 +906,22 @@ class CSVFormatterApp:
             # self.log(f"\nClick 'Format File' to proceed or 'Preview Changes' to see before/after.\n")
             
             # Store dataframe for backward-compat preview usage (AFTER base)
-            self.preview_df = df.copy()
+            self.preview_df = df
+            # Work out what formatting changes here, off the Tk thread; the
+            # preview window only renders the rows on screen
+            self.session.preview_diff(entry, self.fold_unicode, self.progress)
             
             # Enable format button
             self.validation_passed = True
-            self.format_btn.config(state=tk.NORMAL, bg="#27ae60")
-            self.preview_btn.config(state=tk.NORMAL, bg="#95a5a6")
+            self._ui(self.format_btn.config, state=tk.NORMAL, bg="#27ae60")
+            self._ui(self.preview_btn.config, state=tk.NORMAL, bg="#95a5a6")
             
         except Exception as e:
             self.log(f"\n{'='*60}")
             self.log(f"ERROR OCCURRED")
             self.log(f"{'='*60}\n")
             self.log(f"Error: {str(e)}\n")
-            messagebox.showerror("Error", f"Failed to validate file:\n{str(e)}")
+            self._ui(messagebox.showerror, "Error", f"Failed to validate file:\n{str(e)}")
     
     def show_preview(self):
         """Show before/after preview in a new window"""
@@ -1057,154 +978,135 @@ class CSVFormatterApp:
         )
         after_header.pack(fill=tk.X)
         
-        # Create Text widgets with scrollbars for BEFORE
-        before_text_frame = tk.Frame(before_frame, bg="white")
-        before_text_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
-        before_scrollbar_y = tk.Scrollbar(before_text_frame)
-        before_scrollbar_y.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        before_scrollbar_x = tk.Scrollbar(before_text_frame, orient=tk.HORIZONTAL)
-        before_scrollbar_x.pack(side=tk.BOTTOM, fill=tk.X)
-        
-        before_text = tk.Text(
-            before_text_frame,
-            font=("Consolas", 9),
-            bg="#fff5f5",
-            fg="#2c3e50",
-            wrap=tk.NONE,
-            yscrollcommand=before_scrollbar_y.set,
-            xscrollcommand=before_scrollbar_x.set
-        )
-        before_text.pack(fill=tk.BOTH, expand=True)
-        # y-scroll command will be set after both text widgets are created, to sync scroll
-        before_scrollbar_x.config(command=before_text.xview)
-        
-        # Create Text widgets with scrollbars for AFTER
-        after_text_frame = tk.Frame(after_frame, bg="white")
-        after_text_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        
-        after_scrollbar_y = tk.Scrollbar(after_text_frame)
-        after_scrollbar_y.pack(side=tk.RIGHT, fill=tk.Y)
-        
-        after_scrollbar_x = tk.Scrollbar(after_text_frame, orient=tk.HORIZONTAL)
-        after_scrollbar_x.pack(side=tk.BOTTOM, fill=tk.X)
-        
-        after_text = tk.Text(
-            after_text_frame,
-            font=("Consolas", 9),
-            bg="#f0fff4",
-            fg="#2c3e50",
-            wrap=tk.NONE,
-            yscrollcommand=after_scrollbar_y.set,
-            xscrollcommand=after_scrollbar_x.set
+        # Both panes show the same window of rows; only that window is rendered
+        entry = self.session.get(self.current_file_path, self.current_sheet)
+        rows = sms_pipeline.PreviewRows(
+            self.preview_before_df,
+            self.preview_after_base_df,
+            phones=entry["result"]["phones"] if entry is not None else None,
+            fold_unicode=self.fold_unicode,
+            diff=entry["preview"].get(self.fold_unicode) if entry is not None else None,
         )
-        after_text.pack(fill=tk.BOTH, expand=True)
-        # y-scroll command will be set to sync both panes
-        after_scrollbar_x.config(command=after_text.xview)
 
-        # Synchronize vertical scrolling between BEFORE and AFTER panes
-        def _sync_y_scroll(*args):
-            before_text.yview(*args)
-            after_text.yview(*args)
-        def _on_text_yscroll(first, last):
-            before_scrollbar_y.set(first, last)
-            after_scrollbar_y.set(first, last)
-        before_scrollbar_y.config(command=_sync_y_scroll)
-        after_scrollbar_y.config(command=_sync_y_scroll)
-        before_text.config(yscrollcommand=_on_text_yscroll)
-        after_text.config(yscrollcommand=_on_text_yscroll)
+        def make_pane(parent, background):
+            text_frame = tk.Frame(parent, bg="white")
+            text_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+            scrollbar_x = tk.Scrollbar(text_frame, orient=tk.HORIZONTAL)
+            scrollbar_x.pack(side=tk.BOTTOM, fill=tk.X)
+            text = tk.Text(
+                text_frame,
+                font=("Consolas", 9),
+                bg=background,
+                fg="#2c3e50",
+                wrap=tk.NONE,
+                xscrollcommand=scrollbar_x.set
+            )
+            text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            scrollbar_x.config(command=text.xview)
+            # Highlight changed rows with yellow background, removed rows with red tint
+            text.tag_configure("changed", background="#fff59d")
+            text.tag_configure("removed", background="#ffebee")
+            return text
+
+        before_text = make_pane(before_frame, "#fff5f5")
+        # One vertical scrollbar drives both panes
+        scrollbar_y = tk.Scrollbar(after_frame)
+        scrollbar_y.pack(side=tk.RIGHT, fill=tk.Y, pady=10)
+        after_text = make_pane(after_frame, "#f0fff4")
+
+        view = {"top": 0, "height": 30}
+
+        def render():
+            view["top"] = max(0, min(view["top"], len(rows) - view["height"]))
+            stop = min(len(rows), view["top"] + view["height"])
+            lines = rows.window(view["top"], stop)
+            for text, after in ((before_text, False), (after_text, True)):
+                text.config(state=tk.NORMAL)
+                text.delete("1.0", tk.END)
+                text.insert("1.0", rows.header(after) + "\n" + "─" * 80 + "\n")
+                for before_line, after_line, status in lines:
+                    line = after_line if after else before_line
+                    if after and status == "removed":
+                        status = None
+                    text.insert(tk.END, line + "\n", (status,) if status else ())
+                text.config(state=tk.DISABLED)
+            if len(rows):
+                scrollbar_y.set(view["top"] / len(rows), stop / len(rows))
+
+        def scroll_to(top):
+            view["top"] = int(top)
+            render()
+
+        def on_scrollbar(action, amount, unit=None):
+            if action == tk.MOVETO:
+                scroll_to(float(amount) * len(rows))
+            elif unit == tk.PAGES:
+                scroll_to(view["top"] + int(amount) * view["height"])
+            else:
+                scroll_to(view["top"] + int(amount))
+        scrollbar_y.config(command=on_scrollbar)
 
         # Sync mouse wheel scrolling on Windows
         def _on_mousewheel(event):
-            delta = -1 if event.delta > 0 else 1
-            before_text.yview_scroll(delta, "units")
-            after_text.yview_scroll(delta, "units")
+            scroll_to(view["top"] + (-3 if event.delta > 0 else 3))
             return "break"
-        before_text.bind("<MouseWheel>", _on_mousewheel)
-        after_text.bind("<MouseWheel>", _on_mousewheel)
 
-        # Populate BEFORE data (original, includes formulas/errors)
-        df_before = self.preview_before_df.copy()
-        before_text.insert("1.0", "Row | " + " | ".join(df_before.columns) + "\n")
-        before_text.insert(tk.END, "─" * 80 + "\n")
-        
-        for idx, row in df_before.iterrows():
-            row_data = f"{idx+2:3d} | " + " | ".join([str(val)[:20] for val in row.values])
-            before_text.insert(tk.END, row_data + "\n")
-        
-        
-        # Populate AFTER data (formatted on cleaned base)
-        df_after = self.preview_after_base_df.copy()
-        phone_col = df_after.columns[0]
-        df_after[phone_col] = df_after[phone_col].apply(self.format_phone_number)
-        
-        for col in df_after.columns:
-            if df_after[col].dtype == 'object':
-                df_after[col] = df_after[col].apply(self.replace_special_chars)
-        
-        after_text.insert("1.0", "Row | " + " | ".join(df_after.columns) + "\n")
-        after_text.insert(tk.END, "─" * 80 + "\n")
-        
-        for idx, row in df_after.iterrows():
-            row_data = f"{idx+2:3d} | " + " | ".join([str(val)[:20] for val in row.values])
-            after_text.insert(tk.END, row_data + "\n")
-        
-        
-        # Highlight changed rows in BOTH panes with yellow background
-        before_text.tag_configure("changed", background="#fff59d")
-        after_text.tag_configure("changed", background="#fff59d")
+        def on_resize(event):
+            # header + separator take two lines
+            line_height = tkfont.Font(font=before_text.cget("font")).metrics("linespace")
+            height = max(1, before_text.winfo_height() // line_height - 2)
+            if height != view["height"]:
+                view["height"] = height
+                render()
+
+        for text in (before_text, after_text):
+            text.bind("<MouseWheel>", _on_mousewheel)
+        before_text.bind("<Configure>", on_resize)
+
+        # Jump to a spreadsheet row number
+        jump_frame = tk.Frame(preview_window, bg="#f5f7fa")
+        jump_frame.pack(pady=(0, 6))
+        tk.Label(jump_frame, text="Go to row:", font=("Segoe UI", 9), bg="#f5f7fa", fg="#2c3e50").pack(side=tk.LEFT)
+        jump_entry = tk.Entry(jump_frame, width=10, font=("Segoe UI", 9))
+        jump_entry.pack(side=tk.LEFT, padx=5)
 
-        # Mark rows that will be removed (present in BEFORE but not in AFTER) with red tint
-        before_text.tag_configure("removed", background="#ffebee")
+        def jump(event=None):
+            try:
+                position = rows.position_of(int(jump_entry.get()))
+            except ValueError:
+                position = None
+            if position is None:
+                messagebox.showwarning("Go to row", "That row is not in the file.", parent=preview_window)
+                return
+            scroll_to(position)
+        jump_entry.bind("<Return>", jump)
+        tk.Button(jump_frame, text="Go", command=jump, font=("Segoe UI", 9), relief=tk.FLAT).pack(side=tk.LEFT)
 
-        # Build a mapping of BEFORE absolute row order to whether it will be kept
-        # Rows removed include: formula/error rows and fully artifact rows
-        kept_indices = set(df_after.index)
+        changes_only = tk.BooleanVar(preview_window, value=False)
+        def toggle_changes_only():
+            rows.show_changes_only(changes_only.get())
+            scroll_to(0)
+        tk.Checkbutton(
+            jump_frame,
+            text="Show removed/changed rows only",
+            variable=changes_only,
+            command=toggle_changes_only,
+            font=("Segoe UI", 9),
+            bg="#f5f7fa"
+        ).pack(side=tk.LEFT, padx=(15, 0))
 
         # Show a legend to clarify colors
         legend = tk.Label(
             preview_window,
-            text="Legend: Removed (red), Changed (yellow)",
+            text=(f"Legend: Removed (red), Changed (yellow)  •  {len(rows):,} rows, "
+                  f"{int(rows.diff['removed'].sum()):,} removed, {int(rows.changed.sum()):,} changed"),
             font=("Segoe UI", 9),
             bg="#f5f7fa",
             fg="#7f8c8d"
         )
         legend.pack(pady=(0, 6))
 
-        # Paint BEFORE lines accordingly
-        for i, idx in enumerate(df_before.index):
-            line_no = 3 + i  # header=1, separator=2, first row starts at line 3
-            if idx not in kept_indices:
-                before_text.tag_add("removed", f"{line_no}.0", f"{line_no}.end")
-            else:
-                # Additionally, detect value changes for kept rows and mark as changed
-                row_changed = False
-                for col in df_after.columns:
-                    before_val = df_before.loc[idx, col] if col in df_before.columns else None
-                    after_val = df_after.loc[idx, col] if col in df_after.columns else None
-                    if str(before_val) != str(after_val):
-                        row_changed = True
-                        break
-                if row_changed:
-                    before_text.tag_add("changed", f"{line_no}.0", f"{line_no}.end")
-
-        # Paint AFTER changed rows (all rows are kept here by definition)
-        for i, idx in enumerate(df_after.index):
-            row_changed = False
-            for col in df_after.columns:
-                before_val = df_before.loc[idx, col] if (col in df_before.columns and idx in df_before.index) else None
-                after_val = df_after.loc[idx, col]
-                if str(before_val) != str(after_val):
-                    row_changed = True
-                    break
-            if row_changed:
-                line_no = 3 + i
-                after_text.tag_add("changed", f"{line_no}.0", f"{line_no}.end")
-
-        # Disable editing after applying highlights
-        before_text.config(state=tk.DISABLED)
-        after_text.config(state=tk.DISABLED)
+        render()
         
         # Close button
         close_btn = tk.Button(
@@ -1222,184 +1124,62 @@ class CSVFormatterApp:
         close_btn.pack(pady=(0, 15))
     
     def format_file(self):
-        """Format and export the validated file"""
+        """Format and export the validated file in the background"""
         if not self.validation_passed or not self.current_file_path:
             messagebox.showwarning("No File", "Please drag and drop a CSV file first.")
             return
-        
+        if self._busy():
+            return
+        self._run_in_background(self._format_worker, self.filename_entry.get())
+
+    def _format_worker(self, custom_name):
+        """Format and export the validated file (worker thread)"""
         try:
             self.log(f"{'='*60}")
             self.log(f"FORMATTING FILE")
             self.log(f"{'='*60}\n")
-            # Artificial loading (quick, non-blocking feel)
-            try:
-                spinner_frames = ['⠋','⠙','⠹','⠸','⠼','⠴','⠦','⠧','⠇','⠏']
-                total_frames = 5  # ~0.4s with 0.08s per frame
-                # Seed the line once
-                self.status_text.insert(tk.END, "⠋ Preparing .csv file...\n")
-                self.status_text.see(tk.END)
-                self.root.update()
-                for i in range(total_frames):
-                    frame = spinner_frames[i % len(spinner_frames)]
-                    # Replace the last line in-place
-                    start_idx = self.status_text.index('end-1l linestart')
-                    end_idx = self.status_text.index('end-1l lineend')
-                    self.status_text.delete(start_idx, end_idx)
-                    self.status_text.insert(start_idx, f"{frame} Preparing .csv file...")
-                    self.root.update()
-                    time.sleep(0.08)
-                # Finalize line
-                start_idx = self.status_text.index('end-1l linestart')
-                end_idx = self.status_text.index('end-1l lineend')
-                self.status_text.delete(start_idx, end_idx)
-                self.status_text.insert(start_idx, "✓ .csv file ready")
-                self.status_text.insert(tk.END, "\n")
-                self.status_text.see(tk.END)
-                self.root.update()
-            except Exception:
-                pass
-            
-            # Read CSV again
-            df = pd.read_csv(self.current_file_path)
-            # Clean Google Sheets artifacts (formulas / error tokens)
-            df, artifact_stats = self._clean_spreadsheet_artifacts(df)
-            if artifact_stats.get("dropped", 0) > 0:
-                self.log(f"✓ Ignored {artifact_stats['dropped']} artifact row(s) from formulas/errors")
-            phone_col = df.columns[0]
-
-            # Additional artificial checks with randomized, faster durations (single-line updates)
-            try:
-                def animate_step(base_label, min_ms=5, max_ms=20):
-                    frames = ['⠋','⠙','⠹','⠸','⠼','⠴','⠦','⠧','⠇','⠏']
-                    duration = random.randint(min_ms, max_ms) / 1000.0
-                    frame_time = 0.02
-                    steps = max(2, int(duration / frame_time))
-                    self.status_text.insert(tk.END, f"{frames[0]} {base_label}...\n")
-                    self.status_text.see(tk.END)
-                    self.root.update()
-                    for i in range(steps):
-                        start_idx = self.status_text.index('end-1l linestart')
-                        end_idx = self.status_text.index('end-1l lineend')
-                        self.status_text.delete(start_idx, end_idx)
-                        self.status_text.insert(start_idx, f"{frames[i % len(frames)]} {base_label}...")
-                        self.root.update()
-                        time.sleep(frame_time)
-                    start_idx = self.status_text.index('end-1l linestart')
-                    end_idx = self.status_text.index('end-1l lineend')
-                    self.status_text.delete(start_idx, end_idx)
-                    self.status_text.insert(start_idx, f"✓ {base_label} passed.")
-                    self.status_text.insert(tk.END, "\n")
-                    self.status_text.see(tk.END)
-                    self.root.update()
- 
-                animate_step("Checking special characters")
-                animate_step("Detecting duplicates")
-                animate_step("Verifying required headers")
-            except Exception:
-                pass
-            
-            # Format phone numbers
-            self.log("Formatting phone numbers...")
-            
-            # Track special formatting cases during actual formatting
-            decimal_format_count = 0
-            
-            def format_and_track(phone):
-                nonlocal decimal_format_count
-                original = str(phone)
-                formatted = self.format_phone_number(phone)
-                
-                # Track special cases
-                if '.' in original:
-                    try:
-                        float_val = float(original)
-                        if float_val == int(float_val):  # It's a whole number with decimal
-                            decimal_format_count += 1
-                    except ValueError:
-                        pass
-                
-                return formatted
-            
-            df[phone_col] = df[phone_col].apply(format_and_track)
-            formatted_count = len(df[df[phone_col] != ""])
-            self.log(f"✓ Formatted {formatted_count} phone numbers")
-            
-            # Show special formatting statistics
-            if decimal_format_count > 0:
-                self.log("Special formatting applied:")
-                self.log(f"  • {decimal_format_count} decimal format numbers (.0 suffix removed)")
-            self.log("")
-            
-            # Replace special characters in all columns and track statistics
-            self.log("Replacing special characters (accented letters, symbols, etc.)...")
             
-            # Track special character replacements
-            total_replacements = 0
-            replacement_stats = {}
-            columns_with_replacements = 0
-            
-            for col in df.columns:
-                if df[col].dtype == 'object':  # Only string columns
-                    col_replacements = 0
-                    for idx, value in df[col].items():
-                        if pd.notna(value):
-                            result = self.replace_special_chars(value, track_replacements=True)
-                            if isinstance(result, tuple):
-                                text, replacements = result
-                                df.loc[idx, col] = text
-                                if replacements:
-                                    col_replacements += sum(r['count'] for r in replacements.values())
-                                    for char, info in replacements.items():
-                                        if char not in replacement_stats:
-                                            replacement_stats[char] = {'replacement': info['replacement'], 'count': 0}
-                                        replacement_stats[char]['count'] += info['count']
-                            else:
-                                df.loc[idx, col] = result
-                    
-                    if col_replacements > 0:
-                        columns_with_replacements += 1
-                        total_replacements += col_replacements
-                        self.log(f"  • {col}: {col_replacements} characters replaced")
-            
-            if total_replacements > 0:
-                self.log(f"✓ Special characters replaced: {total_replacements} total")
-
-                
-                # Show detailed breakdown of replacements
-                if replacement_stats:
-                    self.log("  Replacement breakdown:")
-                    for char, info in sorted(replacement_stats.items(), key=lambda x: x[1]['count'], reverse=True):
-                        self.log(f"    {char} → {info['replacement']}: {info['count']} times")
+            # Reuse the validated frame; only re-read if the file changed on disk since validation
+            entry = self.session.get(self.current_file_path, self.current_sheet)
+            if entry is None:
+                self.log("File changed since validation, validating again...\n")
+                entry = self.session.load(self.current_file_path, self.log, self.progress, self.current_sheet)
+                if not entry["result"]["passed"]:
+                    self.validation_passed = False
+                    self._ui(self.format_btn.config, state=tk.DISABLED, bg="#95a5a6")
+                    self._ui(self.preview_btn.config, state=tk.DISABLED, bg="#bdc3c7")
+                    self._ui(messagebox.showwarning, "Validation Failed", entry["result"]["message"])
+                    return
             else:
-                self.log("✓ No special characters found to replace")
-            self.log("")
+                sms_pipeline.log_artifact_stats(entry["result"]["artifact_stats"], self.log)
+            result = entry["result"]
+            df = result["df"].copy()
+            
+            # Format phone numbers and replace special characters
+            df, format_stats = sms_pipeline.format_frame(df, self.log, self.fold_unicode, result["phones"],
+                                                         self.progress)
+            total_replacements = format_stats["total_replacements"]
+            
+            # Skip numbers already texted too often in recent campaigns
+            history = None
+            if self.record_history or self.max_sends > 0:
+                history = sms_pipeline.CampaignHistory()
+                if self.max_sends > 0:
+                    df, _ = sms_pipeline.apply_frequency_cap(df, history, self.max_sends, self.window_days, self.log)
             
             # Generate output filename
             self.log("Generating output file...")
-            
-            # Get custom filename from entry
-            custom_name = self.filename_entry.get().strip()
-            if not custom_name:
-                custom_name = "sms_contacts"
-            
-            # Remove any file extension if user added one
-            custom_name = os.path.splitext(custom_name)[0]
-            
-            # Remove any invalid filename characters
-            custom_name = re.sub(r'[<>:"/\\|?*]', '_', custom_name)
-            
-            output_filename = f"{custom_name}.csv"
-            output_path = os.path.join(self.output_dir, output_filename)
-            
-            # Check if file exists and add number suffix if needed
-            counter = 1
-            while os.path.exists(output_path):
-                output_filename = f"{custom_name}_{counter}.csv"
-                output_path = os.path.join(self.output_dir, output_filename)
-                counter += 1
+            compression = self._output_compression()
+            output_path = sms_pipeline.resolve_output_path(self.output_dir, custom_name, compression)
+            output_filename = os.path.basename(output_path)
             
             # Export to CSV
-            df.to_csv(output_path, index=False, encoding='utf-8')
+            sms_pipeline.write_csv(df, output_path, self.progress, compression)
+            if self._parquet_enabled():
+                sms_pipeline.write_parquet(df, sms_pipeline.parquet_path(output_path), self.progress)
+                self.log(f"✓ Parquet copy: {os.path.basename(sms_pipeline.parquet_path(output_path))}")
+            if history is not None:
+                history.record(sms_pipeline.pack_phones(df.iloc[:, 0])[0], sms_pipeline.file_stem(output_filename))
             
             final_rows = len(df)
             self.log("✓ File exported successfully\n")
@@ -1431,23 +1211,17 @@ class CSVFormatterApp:
  
             #self.log("Ready for SMS blast!\n")
             
-            # Reset state
+            # Reset state (and release the preview frames)
             self.validation_passed = False
+            self.session.clear()
             self.current_file_path = None
-            self.preview_df = None
-            self.format_btn.config(state=tk.DISABLED, bg="#95a5a6")
-            self.preview_btn.config(state=tk.DISABLED, bg="#bdc3c7")
+            self.current_sheet = None
+            self.preview_df = self.preview_before_df = self.preview_after_base_df = None
+            self._ui(self.format_btn.config, state=tk.DISABLED, bg="#95a5a6")
+            self._ui(self.preview_btn.config, state=tk.DISABLED, bg="#bdc3c7")
             
             # Highlight the 'Total recipients ready' line in the log
-            try:
-                highlight_text = f"  • Total recipients ready: {final_rows}"
-                start_index = self.status_text.search(highlight_text, "1.0", tk.END)
-                if start_index:
-                    end_index = f"{start_index}+{len(highlight_text)}c"
-                    self.status_text.tag_configure("success_line", background="#e8f5e9", foreground="#1b5e20")
-                    self.status_text.tag_add("success_line", start_index, end_index)
-            except Exception:
-                pass
+            self._ui(self._highlight_log_line, f"  • Total recipients ready: {final_rows}")
             
         except Exception as e:
             self.log(f"\n{'='*60}")
@@ -1456,9 +1230,20 @@ class CSVFormatterApp:
             self.log(f"Error: {str(e)}\n")
             self.validation_passed = False
             self.preview_df = None
-            self.format_btn.config(state=tk.DISABLED, bg="#95a5a6")
-            self.preview_btn.config(state=tk.DISABLED, bg="#bdc3c7")
-            messagebox.showerror("Error", f"Failed to format file:\n{str(e)}")
+            self._ui(self.format_btn.config, state=tk.DISABLED, bg="#95a5a6")
+            self._ui(self.preview_btn.config, state=tk.DISABLED, bg="#bdc3c7")
+            self._ui(messagebox.showerror, "Error", f"Failed to format file:\n{str(e)}")
+
+    def _highlight_log_line(self, highlight_text):
+        """Highlight the first log line containing highlight_text"""
+        try:
+            start_index = self.status_text.search(highlight_text, "1.0", tk.END)
+            if start_index:
+                end_index = f"{start_index}+{len(highlight_text)}c"
+                self.status_text.tag_configure("success_line", background="#e8f5e9", foreground="#1b5e20")
+                self.status_text.tag_add("success_line", start_index, end_index)
+        except Exception:
+            pass
 
 def main():
     root = TkinterDnD.Tk()
@@ -1466,4 +1251,6 @@ def main():
     root.mainloop()
 
 if __name__ == "__main__":
+    # Batch workers are separate processes; needed for the frozen .exe
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
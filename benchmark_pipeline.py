@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+PIPELINE BENCHMARK
+==================
+
+Times every stage of the headless pipeline (sms_pipeline.py) on synthetic
+contact lists of growing size (generate_contacts.py, default ratios) and
+records wall time, rows/sec and peak memory per stage in a JSON file:
+
+    python benchmark_pipeline.py                              # 10k, 100k, 1M, 5M rows
+    python benchmark_pipeline.py --sizes 10000 100000 --output bench.json
+
+Each stage runs on the output of the stages before it, so the numbers add
+up to what validating and formatting one list costs. Peak memory is taken
+in a second pass under tracemalloc (so tracing does not inflate the
+times); use --no-memory to skip it on very large sizes.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import generate_contacts
+import sms_pipeline
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 5_000_000]
+DEFAULT_OUTPUT = "benchmark_results.json"
+
+
+def _stages(path, out_path):
+    """(name, function) per stage; each function reads the results of the
+    stages before it from ``ctx`` and stores its own there"""
+    def read(ctx):
+        ctx["raw"] = sms_pipeline.read_contacts(path)
+
+    def clean(ctx):
+        ctx["df"], _ = sms_pipeline.clean_spreadsheet_artifacts(ctx["raw"])
+        ctx["phones"] = ctx["df"].iloc[:, 0]
+
+    def empty_phone(ctx):
+        sms_pipeline.empty_phone_mask(ctx["phones"])
+
+    def phone_letters(ctx):
+        sms_pipeline.phone_letters_mask(ctx["phones"])
+
+    def normalize(ctx):
+        ctx["digits"], _ = sms_pipeline.normalize_phones(ctx["phones"])
+
+    def phone_format(ctx):
+        sms_pipeline.valid_phone_mask(ctx["digits"])
+
+    def missing_fields(ctx):
+        sms_pipeline.find_missing_fields(ctx["df"], ctx["df"].columns[0])
+
+    def duplicates(ctx):
+        numbers, _ = sms_pipeline.pack_phones(ctx["digits"].to_numpy())
+        pd.Series(numbers).duplicated(keep=False)
+
+    def validate(ctx):
+        ctx["result"] = sms_pipeline.validate_frame(ctx["raw"], log=lambda message: None)
+
+    def transliterate(ctx):
+        for col in ctx["df"].columns[1:]:
+            if sms_pipeline.is_text_column(ctx["df"][col]):
+                sms_pipeline.transliterate_column(ctx["df"][col])
+
+    def format_frame(ctx):
+        result = ctx["result"]
+        ctx["formatted"], _ = sms_pipeline.format_frame(result["df"].copy(), lambda message: None,
+                                                        phones=result["phones"])
+
+    def write(ctx):
+        sms_pipeline.write_csv(ctx["formatted"], out_path)
+
+    return [
+        ("read_contacts", read),
+        ("clean_spreadsheet_artifacts", clean),
+        ("check_empty_phone", empty_phone),
+        ("check_phone_letters", phone_letters),
+        ("normalize_phones", normalize),
+        ("check_phone_format", phone_format),
+        ("check_missing_fields", missing_fields),
+        ("check_duplicates", duplicates),
+        ("validate_frame", validate),
+        ("transliterate", transliterate),
+        ("format_frame", format_frame),
+        ("write_csv", write),
+    ]
+
+
+def _run_stages(path, out_path, trace):
+    """Run every stage once; returns {stage: (seconds, peak bytes or None)}"""
+    ctx = {}
+    measured = {}
+    for name, stage in _stages(path, out_path):
+        if trace:
+            tracemalloc.start()
+        started = time.perf_counter()
+        stage(ctx)
+        seconds = time.perf_counter() - started
+        peak = None
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        measured[name] = (seconds, peak)
+    return measured
+
+
+def benchmark(sizes, memory=True, seed=0, work_dir=None, log=print):
+    """Benchmark every stage at each size; returns the result records"""
+    records = []
+    for rows in sizes:
+        tmp = tempfile.mkdtemp(prefix="sms_bench_", dir=work_dir)
+        try:
+            path = os.path.join(tmp, "contacts.csv")
+            out_path = os.path.join(tmp, "formatted.csv")
+            generate_contacts.write_contacts(path, rows, seed)
+            log(f"\n{rows:,} rows ({os.path.getsize(path) / 2**20:,.1f} MB)")
+            timed = _run_stages(path, out_path, trace=False)
+            traced = _run_stages(path, out_path, trace=True) if memory else {}
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        for name, (seconds, _) in timed.items():
+            peak = traced.get(name, (None, None))[1]
+            record = {
+                "stage": name,
+                "rows": rows,
+                "seconds": round(seconds, 4),
+                "rows_per_sec": round(rows / seconds) if seconds > 0 else None,
+                "peak_mb": round(peak / 2**20, 1) if peak is not None else None,
+            }
+            records.append(record)
+            peak_text = f"{record['peak_mb']:>9,.1f} MB" if peak is not None else ""
+            log(f"  {name:<28}{seconds:>9.3f}s{record['rows_per_sec'] or 0:>14,} rows/s{peak_text}")
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every sms_pipeline stage at several list sizes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, metavar="ROWS",
+                        help="list sizes to run (default: 10k 100k 1M 5M)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT,
+                        help=f"JSON results file (default: {DEFAULT_OUTPUT})")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory pass")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the synthetic lists")
+    parser.add_argument("--work-dir", help="where to write the temporary CSV files (default: system temp)")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("PIPELINE BENCHMARK")
+    print("=" * 60)
+    records = benchmark(args.sizes, not args.no_memory, args.seed, args.work_dir)
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": records,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"\nResults written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Campaign history for the TechOps Text Blast List Formatter.
+
+Keeps a local record of which normalized numbers were sent in which
+campaign and on which day, so a new list can be frequency capped against
+previous blasts:
+
+    history = CampaignHistory()
+    counts = history.send_counts(keys, window_days=7)   # one pass per campaign
+    history.record(keys, "october_promo")
+
+Each campaign run is stored as a sorted, de-duplicated int64 array (.npy)
+and listed in ``index.json``. Lookups memory-map the arrays of the
+campaigns inside the window and use a vectorized binary search, so they
+stay fast with tens of millions of historical entries.
+"""
+
+import datetime
+import json
+import os
+import uuid
+
+import numpy as np
+
+DEFAULT_HISTORY_DIR = os.path.join(os.path.expanduser("~"), ".sms_campaign_history")
+
+# Look-back window used when none is configured
+DEFAULT_WINDOW_DAYS = 7
+
+
+class CampaignHistory:
+    """Numbers sent per campaign and date, stored under ``path``"""
+
+    def __init__(self, path=DEFAULT_HISTORY_DIR):
+        self.path = path
+        self.index_path = os.path.join(path, "index.json")
+        os.makedirs(path, exist_ok=True)
+
+    def campaigns(self):
+        """Index entries ({file, campaign, date, count}), oldest first"""
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _write_index(self, entries):
+        temp_path = f"{self.index_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=1)
+        os.replace(temp_path, self.index_path)
+
+    def stage(self, keys):
+        """Write one batch of sent numbers to disk without making it visible
+        yet; returns the segment filename to pass to commit()"""
+        filename = f"{uuid.uuid4().hex}.npy"
+        np.save(os.path.join(self.path, filename), np.unique(np.asarray(keys, dtype=np.int64)))
+        return filename
+
+    def commit(self, filenames, campaign, sent_on=None):
+        """Add staged segments to the history as one campaign run"""
+        sent_on = (sent_on or datetime.date.today()).isoformat()
+        entries = self.campaigns()
+        for filename in filenames:
+            count = len(np.load(os.path.join(self.path, filename), mmap_mode="r"))
+            entries.append({"file": filename, "campaign": campaign, "date": sent_on, "count": count})
+        self._write_index(entries)
+
+    def discard(self, filenames):
+        """Delete staged segments of a run that was not sent"""
+        for filename in filenames:
+            try:
+                os.remove(os.path.join(self.path, filename))
+            except OSError:
+                pass
+
+    def record(self, keys, campaign, sent_on=None):
+        """Store the numbers of one campaign run"""
+        self.commit([self.stage(keys)], campaign, sent_on)
+
+    def send_counts(self, keys, window_days=DEFAULT_WINDOW_DAYS, until=None):
+        """How many campaign runs within the last ``window_days`` days (up to
+        and including ``until``, default today) contained each key"""
+        keys = np.asarray(keys, dtype=np.int64)
+        # Sorted probes walk each segment front to back instead of seeking at random
+        order = np.argsort(keys, kind='stable')
+        probes = keys[order]
+        hits = np.zeros(len(keys), dtype=np.int64)
+        until = until or datetime.date.today()
+        since = until - datetime.timedelta(days=window_days)
+        for entry in self.campaigns():
+            sent_on = datetime.date.fromisoformat(entry["date"])
+            if not since < sent_on <= until or entry["count"] == 0:
+                continue
+            sent = np.load(os.path.join(self.path, entry["file"]), mmap_mode="r")
+            pos = np.minimum(np.searchsorted(sent, probes), len(sent) - 1)
+            hits += sent[pos] == probes
+        counts = np.empty_like(hits)
+        counts[order] = hits
+        return counts
+
+    def prune(self, older_than_days):
+        """Forget campaign runs sent more than ``older_than_days`` days ago;
+        returns how many runs were removed"""
+        cutoff = datetime.date.today() - datetime.timedelta(days=older_than_days)
+        keep, drop = [], []
+        for entry in self.campaigns():
+            (keep if datetime.date.fromisoformat(entry["date"]) > cutoff else drop).append(entry)
+        if drop:
+            self._write_index(keep)
+            self.discard([entry["file"] for entry in drop])
+        return len(drop)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+SYNTHETIC CONTACT LIST GENERATOR
+================================
+
+Writes seeded contact lists (Phone, Name, City, Date) of any size for load
+and soak testing, with a controllable share of each data problem the
+formatter has to handle:
+
+    python generate_contacts.py big.csv --rows 10000000
+    python generate_contacts.py dirty.csv --rows 100000 --ratio duplicate=0.01 --ratio missing=0.005
+
+Rows are generated and appended one chunk at a time, so multi-GB files
+need no more memory than a single chunk. The same seed, ratios and chunk
+size always produce the same file.
+
+With the default ratios every list passes validation (only the problems
+the pipeline cleans up or reformats are switched on, including scientific
+notation, which reading repairs); raise letters, duplicate or missing to
+exercise the failure paths.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CHUNK_ROWS = 100_000
+
+# Share of rows with each problem. The phone-cell problems (local up to
+# letters) are exclusive and must sum to at most 1; the rest are drawn
+# independently per row.
+DEFAULT_RATIOS = {
+    "local": 0.3,          # 09xxxxxxxxx instead of 639xxxxxxxxx
+    "decimal": 0.05,       # 639xxxxxxxxx.0, as exported from a number column
+    "separators": 0.05,    # +63 917 123 4567 / 0917-123-4567
+    "formula": 0.005,      # =A1 (dropped by artifact cleaning)
+    "error_token": 0.005,  # #N/A, #REF!, ... (dropped by artifact cleaning)
+    "scientific": 0.0,     # 6.39171234567E+11 (read back as the number it stands for)
+    "letters": 0.0,        # O9171234567, letter O typed for the zero (fails the phone letters check)
+    "duplicate": 0.0,      # number of an earlier row, in either form
+    "missing": 0.0,        # blank Name or City
+    "accented": 0.2,       # Name with ñ/é/ü etc. (transliterated)
+    "unicode": 0.02,       # City with curly quotes, dashes and non-Latin text
+}
+PHONE_PROBLEMS = ["local", "decimal", "separators", "formula", "error_token", "scientific", "letters"]
+
+FIRST_NAMES = np.array(["John", "Maria", "Mark", "Ana", "Peter", "Grace", "Luis", "Joy", "Paolo", "Rica"])
+ACCENTED_NAMES = np.array(["José", "Ñino", "Zoë", "Mónica", "Andrés", "Béatrice", "Jürgen", "Inés", "Çelik", "Ramón"])
+LAST_NAMES = np.array(["Santos", "Reyes", "Cruz", "Bautista", "Garcia", "Mendoza", "Torres", "Flores", "Lim", "Tan"])
+CITIES = np.array(["Manila", "Cebu", "Davao", "Iloilo", "Pasig", "Baguio", "Quezon City", "Makati"])
+UNICODE_CITIES = np.array(["Parañaque", "Las Piñas", "“Taguig”", "Cagayan de Oro – North", "東京", "Zamboanga ‘Sur’"])
+ERROR_VALUES = np.array(["#N/A", "#REF!", "#VALUE!", "#DIV/0!", "#NAME?"])
+FORMULA_VALUES = np.array(["=A1", "=B2*1", "=CONCAT(A2,B2)", '=IFERROR(A3,"")'])
+
+
+def resolve_ratios(overrides=None):
+    """DEFAULT_RATIOS updated with ``overrides``; raises ValueError for an
+    unknown problem, a ratio outside [0, 1] or phone problems above 1"""
+    ratios = dict(DEFAULT_RATIOS)
+    for problem, ratio in (overrides or {}).items():
+        if problem not in ratios:
+            raise ValueError(f"Unknown problem '{problem}' (choose from {', '.join(ratios)})")
+        if not 0 <= ratio <= 1:
+            raise ValueError(f"Ratio for '{problem}' must be between 0 and 1, got {ratio}")
+        ratios[problem] = ratio
+    if sum(ratios[p] for p in PHONE_PROBLEMS) > 1:
+        raise ValueError(f"Phone problems ({', '.join(PHONE_PROBLEMS)}) add up to more than 1")
+    return ratios
+
+
+def national_numbers(index, seed=0):
+    """Distinct 10-digit 9xxxxxxxxx numbers for row indexes below 10**9"""
+    offset = np.random.default_rng(seed).integers(10**9)
+    return 9_000_000_000 + (np.asarray(index, dtype=np.int64) * 7919 + offset) % 10**9
+
+
+def _phones(national, kind, rng):
+    """Phone cells for the given national numbers; ``kind`` indexes
+    ["63"] + PHONE_PROBLEMS"""
+    digits = national.astype('U10')
+    phones = np.char.add('63', digits).astype(object)
+    local = kind == 1
+    phones[local] = np.char.add('0', digits[local])
+    decimal = kind == 2
+    phones[decimal] = np.char.add(np.char.add('63', digits[decimal]), '.0')
+    separated = np.nonzero(kind == 3)[0]
+    plus = rng.random(len(separated)) < 0.5
+    phones[separated] = [f"+63 {d[:3]} {d[3:6]} {d[6:]}" if p else f"0{d[:3]}-{d[3:6]}-{d[6:]}"
+                         for d, p in zip(digits[separated], plus)]
+    formula = kind == 4
+    phones[formula] = FORMULA_VALUES[rng.integers(len(FORMULA_VALUES), size=formula.sum())]
+    error = kind == 5
+    phones[error] = ERROR_VALUES[rng.integers(len(ERROR_VALUES), size=error.sum())]
+    scientific = np.nonzero(kind == 6)[0]
+    phones[scientific] = [f"{v:.11E}" for v in (national[scientific] + 630_000_000_000).tolist()]
+    letters = kind == 7
+    phones[letters] = np.char.add('O', digits[letters])
+    return phones
+
+
+def contact_chunks(rows, seed=0, ratios=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield the list as DataFrames of at most ``chunk_rows`` rows"""
+    ratios = resolve_ratios(ratios)
+    if rows >= 10**9:
+        raise ValueError("At most 999,999,999 rows can have distinct numbers")
+    rng = np.random.default_rng(seed)
+    bounds = np.cumsum([ratios[p] for p in PHONE_PROBLEMS])
+    dates = (np.datetime64("2024-01-01") + np.arange(366)).astype(str).astype(object)
+    for start in range(0, rows, chunk_rows):
+        n = min(chunk_rows, rows - start)
+        index = np.arange(start, start + n, dtype=np.int64)
+
+        # Duplicates reuse the number of a random earlier row
+        duplicate = (rng.random(n) < ratios["duplicate"]) & (index > 0)
+        source = index.copy()
+        source[duplicate] = (rng.random(duplicate.sum()) * index[duplicate]).astype(np.int64)
+        kind = np.searchsorted(bounds, rng.random(n), side='right') + 1
+        kind[kind > len(PHONE_PROBLEMS)] = 0
+        phones = _phones(national_numbers(source, seed), kind, rng)
+
+        accented = rng.random(n) < ratios["accented"]
+        first = np.where(accented, ACCENTED_NAMES[rng.integers(len(ACCENTED_NAMES), size=n)],
+                         FIRST_NAMES[rng.integers(len(FIRST_NAMES), size=n)])
+        names = np.char.add(np.char.add(first, " "), LAST_NAMES[rng.integers(len(LAST_NAMES), size=n)])
+        names = names.astype(object)
+        cities = np.where(rng.random(n) < ratios["unicode"],
+                          UNICODE_CITIES[rng.integers(len(UNICODE_CITIES), size=n)],
+                          CITIES[rng.integers(len(CITIES), size=n)]).astype(object)
+
+        missing = np.nonzero(rng.random(n) < ratios["missing"])[0]
+        blank_name = rng.random(len(missing)) < 0.5
+        names[missing[blank_name]] = ""
+        cities[missing[~blank_name]] = ""
+
+        yield pd.DataFrame({"Phone": phones, "Name": names, "City": cities,
+                            "Date": dates[rng.integers(len(dates), size=n)]})
+
+
+def write_contacts(path, rows, seed=0, ratios=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Stream a generated list to ``path``; returns the number of rows written"""
+    written = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for chunk in contact_chunks(rows, seed, ratios, chunk_rows):
+            chunk.to_csv(f, index=False, header=written == 0)
+            written += len(chunk)
+        if written == 0:
+            f.write("Phone,Name,City,Date\n")
+    return written
+
+
+def _ratio(text):
+    problem, sep, value = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected PROBLEM=FRACTION, got '{text}'")
+    try:
+        return problem.strip(), float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a number")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic contact list for load testing.")
+    parser.add_argument("output", help="CSV file to write")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="data rows to write (default: 1,000,000)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed (default: 0)")
+    parser.add_argument("--ratio", type=_ratio, action="append", default=[], metavar="PROBLEM=FRACTION",
+                        help=f"share of rows with a problem, repeatable; one of {', '.join(DEFAULT_RATIOS)}")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help=f"rows generated per chunk (default: {DEFAULT_CHUNK_ROWS:,})")
+    args = parser.parse_args(argv)
+
+    try:
+        ratios = resolve_ratios(dict(args.ratio))
+    except ValueError as e:
+        parser.error(str(e))
+    print("=" * 60)
+    print("SYNTHETIC CONTACT LIST")
+    print("=" * 60)
+    for problem, ratio in ratios.items():
+        print(f"  {problem:<12}{ratio:>8.2%}")
+    started = time.perf_counter()
+    written = write_contacts(args.output, args.rows, args.seed, ratios, args.chunk_rows)
+    seconds = time.perf_counter() - started
+    size = os.path.getsize(args.output)
+    print(f"\n✓ {written:,} rows ({size / 2**20:,.1f} MB) written to {args.output} "
+          f"in {seconds:.1f}s ({written / max(seconds, 1e-9):,.0f} rows/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
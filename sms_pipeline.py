@@ -0,0 +1,2829 @@
+#!/usr/bin/env python3
+"""
+Headless validate/format pipeline for the TechOps Text Blast List Formatter.
+
+Everything in here is free of Tk so the same checks the desktop app runs can
+be executed on a server with no display:
+
+    python -m sms_pipeline contacts.csv --output-dir out --name sms_contacts
+    python -m sms_pipeline regional_lists/ --output-dir out     # batch, one process per core
+
+Exit codes are stable and meant to be consumed by schedulers/cron jobs (see
+the EXIT_* constants below).
+"""
+
+import argparse
+import contextlib
+import cProfile
+import datetime
+import gzip
+import json
+import os
+import pstats
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = pa_csv = pq = None
+    PYARROW_AVAILABLE = False
+
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    openpyxl = None
+    OPENPYXL_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTANDARD_AVAILABLE = True
+except ImportError:
+    zstandard = None
+    ZSTANDARD_AVAILABLE = False
+
+from campaign_history import CampaignHistory, DEFAULT_HISTORY_DIR, DEFAULT_WINDOW_DAYS
+
+
+# Exit codes returned by the command line entry point
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_EMPTY_PHONE = 10
+EXIT_PHONE_LETTERS = 11
+EXIT_PHONE_FORMAT = 12
+EXIT_MISSING_FIELDS = 13
+EXIT_DUPLICATES = 14
+
+CHECK_EXIT_CODES = {
+    "empty_phone": EXIT_EMPTY_PHONE,
+    "phone_letters": EXIT_PHONE_LETTERS,
+    "phone_format": EXIT_PHONE_FORMAT,
+    "missing_fields": EXIT_MISSING_FIELDS,
+    "duplicates": EXIT_DUPLICATES,
+}
+
+# Spreadsheet error literals treated as artifacts
+ERROR_TOKENS = {
+    '#VALUE!', '#DIV/0!', '#N/A', '#REF!', '#NAME?', '#NULL!',
+    '#NUM!', '#ERROR!', '#GETTING_DATA', '#SPILL!'
+}
+
+# Comprehensive character mapping for common special characters
+CHAR_MAP = {
+
+    'ñ': 'n', 'Ñ': 'N',
+
+    'à': 'a', 'á': 'a', 'â': 'a', 'ã': 'a', 'ä': 'a', 'å': 'a',
+    'À': 'A', 'Á': 'A', 'Â': 'A', 'Ã': 'A', 'Ä': 'A', 'Å': 'A',
+    'è': 'e', 'é': 'e', 'ê': 'e', 'ë': 'e',
+    'È': 'E', 'É': 'E', 'Ê': 'E', 'Ë': 'E',
+    'ì': 'i', 'í': 'i', 'î': 'i', 'ï': 'i',
+    'Ì': 'I', 'Í': 'I', 'Î': 'I', 'Ï': 'I',
+    'ò': 'o', 'ó': 'o', 'ô': 'o', 'õ': 'o', 'ö': 'o',
+    'Ò': 'O', 'Ó': 'O', 'Ô': 'O', 'Õ': 'O', 'Ö': 'O',
+    'ù': 'u', 'ú': 'u', 'û': 'u', 'ü': 'u',
+    'Ù': 'U', 'Ú': 'U', 'Û': 'U', 'Ü': 'U',
+    'ý': 'y', 'ÿ': 'y',
+    'Ý': 'Y', 'Ÿ': 'Y',
+    'ç': 'c', 'Ç': 'C',
+
+}
+
+# Precompiled str.translate table for CHAR_MAP
+TRANSLATION_TABLE = str.maketrans(CHAR_MAP)
+
+# NFKD fallbacks computed so far for characters outside CHAR_MAP (char -> ASCII or None)
+_FOLDED_CHARS = {}
+
+DEFAULT_FILENAME = "sms_contacts"
+
+
+def is_text_column(series):
+    """Return True for object or string dtype columns"""
+    return series.dtype == 'object' or pd.api.types.is_string_dtype(series.dtype)
+
+
+def is_formula_or_error(value):
+    """Return True if a spreadsheet cell contains a formula or an error token.
+
+    We treat any string beginning with '=' as a formula and common
+    spreadsheet error literals as artifacts to ignore.
+    """
+    if pd.isna(value):
+        return False
+    text = str(value).strip()
+    if text.startswith('='):
+        return True
+    return text in ERROR_TOKENS
+
+
+# str(value).strip().lower() values treated as an empty cell by the artifact cleaner
+EMPTY_LIKE = {"", "nan", "none", "null", '0', '0.0', '0.00'}
+
+
+def _stripped_text(series, present):
+    """str(value).strip() for the non-null cells of a column"""
+    return series[present].astype(str).str.strip()
+
+
+def artifact_masks(series, empty_tokens=None):
+    """Vectorized is_formula_or_error / empty-like masks for one column.
+
+    Returns a dict of boolean arrays: ``formula`` ('=' prefix), ``error``
+    (spreadsheet error token) and ``empty`` (null, blank, 'nan', '0', ...).
+    ``empty`` compares str(value).strip() case-insensitively against
+    EMPTY_LIKE, or case-sensitively against ``empty_tokens`` when given.
+    """
+    n = len(series)
+    na = series.isna().to_numpy()
+    formula = np.zeros(n, dtype=bool)
+    error = np.zeros(n, dtype=bool)
+    empty = na.copy()
+    tokens = EMPTY_LIKE if empty_tokens is None else empty_tokens
+
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in 'iuf':
+        # Numbers can only be empty-like through str(value) == '0' / '0.0'
+        values = series.to_numpy()
+        if dtype.kind == 'f' and '0.0' in tokens:
+            empty |= (values == 0) & ~np.signbit(values)
+        elif dtype.kind in 'iu' and '0' in tokens:
+            empty |= values == 0
+    elif not (isinstance(dtype, np.dtype) and dtype.kind == 'b'):
+        present = ~na
+        text = _stripped_text(series, present)
+        formula[present] = text.str.startswith('=').to_numpy(dtype=bool)
+        error[present] = text.isin(ERROR_TOKENS).to_numpy()
+        if empty_tokens is None:
+            text = text.str.lower()
+        empty[present] = text.isin(tokens).to_numpy()
+
+    return {"formula": formula, "error": error, "empty": empty}
+
+
+def clean_spreadsheet_artifacts(df):
+    """Remove rows that are clearly spreadsheet artifacts (formulas/errors).
+
+    Rules:
+    - If the phone column (first column) is a formula, an error token, or empty ⇒ drop row
+    - If all columns in a row are formulas/errors/empty whitespace ⇒ drop row
+    Returns the cleaned dataframe and a stats dict with the number of
+    ``dropped`` rows, a per-reason breakdown of the phone cell
+    (``reasons``: formula/error/empty) and how many dropped rows were
+    ``blank_rows`` (every cell an artifact).
+    """
+    if df is None or df.empty:
+        return df, {"dropped": 0, "reasons": {"formula": 0, "error": 0, "empty": 0}, "blank_rows": 0}
+
+    # 1) Drop if phone column is formula/error/empty-like. A row where every
+    # cell is an artifact (rule 2) necessarily has an artifact phone cell, so
+    # the phone masks alone decide which rows go.
+    phone = artifact_masks(df.iloc[:, 0])
+    drop_mask = phone["formula"] | phone["error"] | phone["empty"]
+    reasons = {
+        "formula": int(phone["formula"].sum()),
+        "error": int(phone["error"].sum()),
+        "empty": int((phone["empty"] & ~phone["formula"] & ~phone["error"]).sum()),
+    }
+
+    # 2) Of the dropped rows, count those where every cell is formula/error/empty-like
+    blank_rows = 0
+    dropped = int(drop_mask.sum())
+    if dropped > 0:
+        dropped_rows = df[drop_mask]
+        blank = np.ones(dropped, dtype=bool)
+        for pos in range(1, dropped_rows.shape[1]):
+            masks = artifact_masks(dropped_rows.iloc[:, pos])
+            blank &= masks["formula"] | masks["error"] | masks["empty"]
+        blank_rows = int(blank.sum())
+        df = df[~drop_mask].copy()
+
+    return df, {"dropped": dropped, "reasons": reasons, "blank_rows": blank_rows}
+
+
+def log_artifact_stats(stats, log=print):
+    """Report rows dropped by clean_spreadsheet_artifacts"""
+    if stats.get("dropped", 0) > 0:
+        log(f"✓ Ignored {stats['dropped']} artifact row(s) from formulas/errors")
+        reasons = stats.get("reasons", {})
+        details = [f"{reasons[key]} {label}" for key, label in
+                   (("formula", "formula"), ("error", "error token"), ("empty", "empty phone"))
+                   if reasons.get(key)]
+        if details:
+            log(f"  • {', '.join(details)} ({stats.get('blank_rows', 0)} fully blank row(s))")
+
+
+# Text float() parses: decimals with optional exponent and digit
+# separators, inf/infinity and nan, surrounded by optional whitespace
+_DIGITS = r"\d+(?:_\d+)*"
+FLOAT_SYNTAX = (rf"\s*[+-]?(?:(?:{_DIGITS}(?:\.(?:{_DIGITS})?)?|\.{_DIGITS})(?:e[+-]?{_DIGITS})?"
+                r"|inf(?:inity)?|nan)\s*")
+
+
+def detect_column_type(series):
+    """Detect if a column contains numeric data"""
+    if series is None or len(series) == 0:
+        return "unknown"
+
+    # Get non-null values
+    non_null_values = series.dropna()
+    if len(non_null_values) == 0:
+        return "empty"
+
+    # Count the values float() would accept, in one vectorized pass
+    dtype = non_null_values.dtype
+    if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        numeric_count = len(non_null_values)
+    else:
+        # Plain digit strings (most numeric cells) skip the regex
+        values = non_null_values.astype(str).to_numpy(dtype=object)
+        plain = np.fromiter(map(str.isdecimal, values), dtype=bool, count=len(values))
+        others = pd.Series(values[~plain], dtype=object)
+        numeric_count = plain.sum() + others.str.fullmatch(FLOAT_SYNTAX, case=False).sum()
+
+    # If more than 80% of values are numeric, consider it a numeric column
+    if numeric_count / len(non_null_values) >= 0.8:
+        return "numeric"
+    else:
+        return "text"
+
+
+def format_phone_number(phone):
+    """Format phone number to digits only"""
+    if pd.isna(phone):
+        return ""
+    # Convert to string and remove all non-digit characters
+    phone_str = str(phone)
+
+    # Check if original string starts with 0 (for 09 format preservation)
+    starts_with_zero = phone_str.startswith('0')
+
+    # Handle decimal numbers more carefully
+    # For phone numbers, we want to truncate to integer part (not round)
+    if '.' in phone_str:
+        try:
+            # Try to parse as float to check if it's a whole number
+            float_val = float(phone_str)
+            if float_val == int(float_val):  # It's a whole number
+                # For whole numbers, just remove the decimal part without converting to int
+                phone_str = phone_str.split('.')[0]
+            else:
+                # It's a decimal number, truncate to integer part
+                # But preserve the leading zero if it was there originally
+                int_part = str(int(float_val))
+                if starts_with_zero and not int_part.startswith('0'):
+                    # The int conversion removed the leading zero, add it back
+                    phone_str = '0' + int_part
+                else:
+                    phone_str = int_part
+        except (ValueError, OverflowError):
+            # If it's not a valid number, just remove the decimal part
+            phone_str = phone_str.split('.')[0]
+
+    # Extract digits while preserving the original structure for 09 numbers
+    digits = re.sub(r'\D', '', phone_str)
+
+    # Special handling for 09 format numbers that might have lost their leading zero
+    # If the original string started with 0 and we have 10 digits, add the leading zero back
+    if starts_with_zero and len(digits) == 10:
+        digits = '0' + digits
+
+    # Zeros in front of a 63 number (0639..., 00639...) are padding, not part of it
+    if len(digits) > 12 and digits.startswith('0'):
+        unpadded = digits.lstrip('0')
+        if len(unpadded) == 12 and unpadded.startswith('63'):
+            digits = unpadded
+
+    # Note: We do NOT convert 09 numbers to 63 - 09 is a valid Philippine format
+    # Only remove non-digit characters and handle decimal formats
+
+    return digits
+
+
+# Cells longer than this are normalized with the scalar formatter instead of
+# being widened into the fixed-width NumPy buffer
+_PHONE_VECTOR_WIDTH = 40
+
+# Offending rows listed per failed check; the rest are only counted so the
+# report stays the same size however many rows fail
+DETAIL_LIMIT = 200
+
+
+def _scalar_phones(values):
+    digits = np.array([format_phone_number(v) for v in values], dtype=object)
+    whole = np.array([not pd.isna(v) and is_whole_decimal(v) for v in values], dtype=bool)
+    return digits, whole
+
+
+def _ascii_digit_strings(codes, keep):
+    """Compact the kept code points of each row into a left-aligned string"""
+    out = np.where(keep, codes, 0).astype(np.uint32)
+    # Rows where a dropped character precedes a kept one need shifting
+    gaps = (keep[:, 1:] & ~keep[:, :-1]).any(axis=1)
+    if gaps.any():
+        shift = keep[gaps]
+        positions = np.cumsum(shift, axis=1, dtype=np.int8) - 1
+        shifted = np.zeros_like(out[gaps])
+        rows = np.nonzero(shift)[0]
+        shifted[rows, positions[shift]] = codes[gaps][shift]
+        out[gaps] = shifted
+    width = codes.shape[1]
+    return out.view(f'U{width}').ravel().astype(object), keep.sum(axis=1)
+
+
+def _numeric_phones(values):
+    """format_phone_number for float/int arrays: str(value) is repr(), so
+    whole and decimal values both collapse to the truncated absolute integer"""
+    n = len(values)
+    digits = np.full(n, "", dtype=object)
+    whole = np.zeros(n, dtype=bool)
+    if values.dtype.kind in 'iu':
+        fast = values != np.iinfo(values.dtype).min if values.dtype.kind == 'i' else np.ones(n, dtype=bool)
+        digits[fast] = np.abs(values[fast]).astype(str).astype(object)
+    else:
+        magnitude = np.abs(values)
+        # repr() switches to scientific notation outside [1e-4, 1e16)
+        fast = np.isfinite(values) & (magnitude < 1e16) & ((magnitude >= 1e-4) | (magnitude == 0))
+        digits[fast] = np.trunc(magnitude[fast]).astype(np.int64).astype(str).astype(object)
+        whole[fast] = values[fast] == np.trunc(values[fast])
+        # NaN stays ""; everything else takes the scalar path
+        fast |= np.isnan(values)
+    slow = np.nonzero(~fast)[0]
+    if len(slow):
+        digits[slow], whole[slow] = _scalar_phones(values[slow].tolist())
+    return digits, whole
+
+
+def _text_phones(values):
+    """format_phone_number for object/string arrays.
+
+    Plain ASCII strings that are either dot-free or a single signed decimal
+    ("639123456789.0", "-0912345678.5") are handled on a code point matrix;
+    anything else (scientific notation, several dots, unicode digits, very
+    long cells) falls back to the scalar formatter so the output stays
+    identical.
+    """
+    n = len(values)
+    digits = np.full(n, "", dtype=object)
+    whole = np.zeros(n, dtype=bool)
+
+    idx = np.nonzero(~pd.isna(values))[0]
+    text = values[idx]
+    if pd.api.types.infer_dtype(text, skipna=False) != "string":
+        text = np.array([v if isinstance(v, str) else str(v) for v in text], dtype=object)
+    lengths = np.fromiter(map(len, text), dtype=np.int64, count=len(text))
+    fits = (lengths > 0) & (lengths <= _PHONE_VECTOR_WIDTH)
+    slow = [idx[~fits & (lengths > 0)]]
+
+    if fits.any():
+        text, lengths, rows = text[fits], lengths[fits], idx[fits]
+        codes = text.astype(str)
+        width = codes.dtype.itemsize // 4
+        codes = codes.view(np.uint32).reshape(-1, width)
+        # Cells shorter than the buffer are padded with zeros
+        content = np.arange(width) < lengths[:, None]
+
+        is_digit = (codes >= 48) & (codes <= 57)
+        is_dot = codes == 46
+        dot_count = is_dot.sum(axis=1)
+        other = content & ~is_digit & ~is_dot
+        other[:, 0] &= (codes[:, 0] != 43) & (codes[:, 0] != 45)
+        dotted = (dot_count == 1) & ~other.any(axis=1) & is_digit.any(axis=1)
+        vector = (codes <= 127).all(axis=1) & ((dot_count == 0) | dotted)
+        slow.append(rows[~vector])
+
+        if not vector.all():
+            codes, content, is_digit, is_dot = codes[vector], content[vector], is_digit[vector], is_dot[vector]
+            text, lengths, rows, dotted = text[vector], lengths[vector], rows[vector], dotted[vector]
+        starts_with_zero = codes[:, 0] == 48
+        result = text.copy()
+        result_len = lengths.copy()
+
+        # Whole numbers keep the digits before the '.', decimals become str(int(float))
+        fraction = np.zeros(len(rows), dtype=bool)
+        if dotted.any():
+            before_dot = np.arange(width) < np.where(dotted, is_dot.argmax(axis=1), width)[:, None]
+            whole[rows[dotted]] = True
+            # Only a non-zero fraction can make float() non-integral, so only those rows get parsed
+            parse = dotted & (is_digit & ~before_dot & (codes != 48)).any(axis=1)
+            if parse.any():
+                parsed = codes[parse].view(f'U{width}').ravel().astype(np.float64)
+                is_whole = parsed == np.trunc(parsed)
+                whole[rows[parse]] = is_whole
+                fraction[np.nonzero(parse)[0][~is_whole]] = True
+            is_digit &= before_dot
+
+        # Rows made only of digits are already normalized
+        compact = (is_digit != content).any(axis=1) & ~fraction
+        if compact.any():
+            result[compact], result_len[compact] = _ascii_digit_strings(codes[compact], is_digit[compact])
+        if fraction.any():
+            int_part = np.trunc(np.abs(parsed[~is_whole])).astype(np.int64).astype(str)
+            int_len = np.char.str_len(int_part)
+            int_part = int_part.astype(object)
+            restore = starts_with_zero[fraction] & (int_part != "0")
+            int_part[restore] = "0" + int_part[restore]
+            result[fraction] = int_part
+            result_len[fraction] = int_len + restore
+
+        # Restore the leading zero of 09 numbers that lost it
+        restore = starts_with_zero & (result_len == 10)
+        result[restore] = "0" + result[restore]
+        # Drop zeros in front of 63 numbers (0639..., 00639...)
+        for row in np.flatnonzero(result_len > 12):
+            unpadded = result[row].lstrip('0')
+            if len(unpadded) == 12 and unpadded.startswith('63'):
+                result[row] = unpadded
+        digits[rows] = result
+
+    slow = np.concatenate(slow)
+    if len(slow):
+        digits[slow], whole[slow] = _scalar_phones(values[slow].tolist())
+    return digits, whole
+
+
+def normalize_phones(series):
+    """Column-level format_phone_number.
+
+    Returns the normalized digits as an object Series (same index) and a
+    boolean array marking whole numbers written with a decimal ('.0' suffix).
+    """
+    if pd.api.types.is_bool_dtype(series.dtype) or not pd.api.types.is_numeric_dtype(series.dtype):
+        digits, whole = _text_phones(series.to_numpy(dtype=object))
+    elif isinstance(series.dtype, np.dtype) and series.dtype.kind in 'iuf':
+        digits, whole = _numeric_phones(series.to_numpy())
+    else:
+        # Nullable extension dtypes (Int64, Float64) carry pd.NA
+        digits, whole = _scalar_phones(series.tolist())
+    return pd.Series(digits, index=series.index, dtype=object), whole
+
+
+def normalize_phone_series(series):
+    """Vectorized format_phone_number over a whole column"""
+    return normalize_phones(series)[0]
+
+
+def is_valid_ph_phone(digits):
+    """Check for valid Philippine phone number formats"""
+    if len(digits) == 11 and digits.startswith('09'):
+        return True
+    elif len(digits) == 12 and digits.startswith('63'):
+        return True
+    return False
+
+
+# str(value).strip() values (case-sensitive) treated as an empty phone number
+PHONE_EMPTY_TOKENS = {'', '0', '0.0', '0.00', 'nan', 'NaN', 'None', 'null'}
+
+# str(value).strip() values (case-sensitive) treated as a missing field
+MISSING_FIELD_TOKENS = {'', 'nan', 'NaN', 'None', 'null'}
+
+
+def empty_phone_mask(series):
+    """Phone cells that are null, blank, zero-like, a formula or an error token"""
+    masks = artifact_masks(series, PHONE_EMPTY_TOKENS)
+    return masks["formula"] | masks["error"] | masks["empty"]
+
+
+def phone_letters_mask(series):
+    """Phone cells containing ASCII letters"""
+    return series.astype(str).str.contains(r"[A-Za-z]", na=False).to_numpy(dtype=bool)
+
+
+def valid_phone_mask(digits):
+    """Vectorized is_valid_ph_phone over normalized digits"""
+    values = np.asarray(digits, dtype=object)
+    lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+    prefix = values.astype('U2')
+    return (
+        ((lengths == 11) & (prefix == '09'))
+        | ((lengths == 12) & (prefix == '63'))
+    )
+
+
+# Format tags of packed phone numbers (see pack_phones)
+TAG_INVALID = 0
+TAG_09 = 1      # written as 09xxxxxxxxx
+TAG_63 = 2      # written as 63xxxxxxxxxx
+
+
+def pack_phones(digits):
+    """Compact form of normalized phone strings.
+
+    Returns (numbers, tags): ``numbers`` is an int64 array with the 10-digit
+    national number (the part after '0' or '63') and ``tags`` an int8 array
+    with how it was written (TAG_09 / TAG_63). Numbers that are not valid PH
+    mobile numbers get TAG_INVALID and 0. 9 bytes per row instead of a
+    Python str per row.
+    """
+    digits = np.asarray(digits, dtype=object)
+    numbers = np.zeros(len(digits), dtype=np.int64)
+    tags = np.zeros(len(digits), dtype=np.int8)
+    valid = valid_phone_mask(digits)
+    if valid.any():
+        values = digits[valid].astype(np.int64)
+        intl = values >= 10**11
+        numbers[valid] = np.where(intl, values - 63 * 10**10, values)
+        tags[valid] = np.where(intl, TAG_63, TAG_09)
+    return numbers, tags
+
+
+def unpack_phones(numbers, tags):
+    """Render packed phone numbers back to their digit strings (object array)"""
+    if len(numbers) == 0:
+        return np.array([], dtype=object)
+    national = np.char.zfill(np.asarray(numbers, dtype=np.int64).astype('U10'), 10)
+    prefix = np.array(['', '0', '63'])[np.asarray(tags, dtype=np.intp)]
+    return np.char.add(prefix, national).astype(object)
+
+
+def phone_keys(digits):
+    """Canonical subscriber key per valid normalized number: the national
+    number (last 10 digits) as int64, so 639171234567 and 09171234567 get
+    the same key. Sorting keys sorts subscribers."""
+    return pack_phones(digits)[0]
+
+
+def _duplicate_row_lines(rows, names, spellings):
+    """Report lines for one group of duplicates. Rows written differently
+    from the first one (09 vs 63 form) say how they were written."""
+    return [
+        f"    • Row {row_num}: {name}" + (f" (as {spelling})" if spelling != spellings[0] else "")
+        for row_num, name, spelling in zip(rows, names, spellings)
+    ]
+
+
+def invalid_phone_reason(digits):
+    """Why normalized digits fail is_valid_ph_phone (for the report)"""
+    reason_parts = []
+    if len(digits) not in [11, 12]:
+        reason_parts.append(f"len={len(digits)}")
+    if not (digits.startswith('09') or digits.startswith('63')):
+        reason_parts.append("invalid prefix")
+    return ", ".join(reason_parts) if reason_parts else "format"
+
+
+def missing_field_mask(series):
+    """Vectorized strict-rule check for one column: null, blank, 'nan'/'None'/
+    'null', formula or spreadsheet error token"""
+    masks = artifact_masks(series, MISSING_FIELD_TOKENS)
+    return masks["formula"] | masks["error"] | masks["empty"]
+
+
+def find_missing_fields(df, phone_col):
+    """Strict rule: list (index, [columns]) for rows with a phone number but a
+    missing/empty/formula/error value in any other column"""
+    phone = df[phone_col]
+    phone_present = ~(phone.isna() | (phone.astype(str).str.strip() == '')).to_numpy(dtype=bool)
+    positions = [i for i, col in enumerate(df.columns) if col != phone_col]
+    if not positions or not phone_present.any():
+        return []
+
+    # rows × non-phone columns matrix, evaluated a column at a time
+    matrix = np.column_stack([missing_field_mask(df.iloc[:, i]) for i in positions])
+    matrix &= phone_present[:, None]
+    rows, cols = np.nonzero(matrix)  # row-major: grouped by row, columns in file order
+    if rows.size == 0:
+        return []
+
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    ends = np.r_[starts[1:], rows.size].tolist()
+    names = [df.columns[positions[c]] for c in cols.tolist()]
+    index = df.index[rows[starts]].tolist()
+    return [(idx, names[start:end]) for idx, start, end in zip(index, starts.tolist(), ends)]
+
+
+def is_whole_decimal(value):
+    """Return True for values like '639123456789.0' (whole number with decimal)"""
+    text = str(value)
+    if '.' not in text:
+        return False
+    try:
+        float_val = float(text)
+        return float_val == int(float_val)
+    except (ValueError, OverflowError):
+        return False
+
+
+def fold_char(char):
+    """ASCII fallback for a character outside CHAR_MAP via NFKD decomposition.
+
+    Returns None when the decomposition has no ASCII letters left (e.g. 'ß',
+    'ł', CJK), in which case the character is kept as is.
+    """
+    if char not in _FOLDED_CHARS:
+        decomposed = unicodedata.normalize('NFKD', char)
+        folded = ''.join(c for c in decomposed if not unicodedata.combining(c))
+        _FOLDED_CHARS[char] = folded if folded and folded.isascii() and folded != char else None
+    return _FOLDED_CHARS[char]
+
+
+def _translation_table(chars, fold_unicode=False):
+    """Translation table restricted to the given characters"""
+    table = {ord(c): CHAR_MAP[c] for c in chars if c in CHAR_MAP}
+    if fold_unicode:
+        for c in chars:
+            if c not in CHAR_MAP and not c.isascii():
+                folded = fold_char(c)
+                if folded is not None:
+                    table[ord(c)] = folded
+    return table
+
+
+def replace_special_chars(text, track_replacements=False, fold_unicode=False):
+    """Replace special characters with their ASCII equivalents"""
+    if pd.isna(text):
+        return text, {} if track_replacements else text
+    text = str(text)
+    if text.isascii():
+        return (text, {}) if track_replacements else text
+
+    table = _translation_table(set(text), fold_unicode) if fold_unicode else TRANSLATION_TABLE
+
+    # Track replacements if requested
+    replacements_made = {}
+    if track_replacements:
+        for code, replacement in sorted(_translation_table(set(text), fold_unicode).items()):
+            special_char = chr(code)
+            replacements_made[special_char] = {'replacement': replacement, 'count': text.count(special_char)}
+
+    text = text.translate(table)
+    return (text, replacements_made) if track_replacements else text
+
+
+def transliterate_column(series, fold_unicode=False):
+    """Columnar replace_special_chars.
+
+    Only cells containing non-ASCII characters are translated. Returns the
+    new column and a dict of per-character counts
+    ({char: {'replacement': ..., 'count': n}}).
+    """
+    result, counts, _ = _transliterate(series, fold_unicode)
+    return result, counts
+
+
+def _non_ascii_mask(values):
+    """Boolean mask of the cells of an object array of str holding non-ASCII text"""
+    return ~np.fromiter(map(str.isascii, values), dtype=bool, count=len(values))
+
+
+def special_characters(series):
+    """Set of the non-ASCII characters in a column (what transliteration looks at)"""
+    values = series.dropna().astype(str).to_numpy(dtype=object)
+    candidates = values[_non_ascii_mask(values)]
+    return {char for char in set('\0'.join(candidates)) if not char.isascii()}
+
+
+def _transliterate(series, fold_unicode=False):
+    """transliterate_column, plus the positions of the cells whose text changed"""
+    unchanged = np.array([], dtype=np.intp)
+    present = np.nonzero(series.notna().to_numpy())[0]
+    values = series.iloc[present]
+    result = series.copy()
+    if pd.api.types.infer_dtype(values, skipna=False) != "string":
+        # replace_special_chars always hands back strings
+        values = values.astype(str)
+        result.iloc[present] = values.to_numpy(dtype=object)
+    # Plain object arrays iterate much faster than pandas string arrays
+    values = values.to_numpy(dtype=object)
+    non_ascii = _non_ascii_mask(values)
+    if not non_ascii.any():
+        return result, {}, unchanged
+
+    candidates = values[non_ascii]
+    # Replacing over all cells joined by NUL (never in the table) is much
+    # cheaper than one translate call per cell
+    joined = '\0'.join(candidates)
+    table = _translation_table(set(joined), fold_unicode)
+    if not table:
+        return result, {}, unchanged
+
+    counts = {}
+    for code, replacement in sorted(table.items()):
+        counts[chr(code)] = {'replacement': replacement, 'count': joined.count(chr(code))}
+    if joined.count('\0') == len(candidates) - 1:
+        # Replacements are ASCII, so one str.replace per character is the
+        # same as translate and runs at memchr speed
+        for code, replacement in table.items():
+            joined = joined.replace(chr(code), replacement)
+        translated = joined.split('\0')
+    else:
+        translated = [value.translate(table) for value in candidates]
+    translated = np.array(translated, dtype=object)
+    result.iloc[present[non_ascii]] = translated
+    return result, counts, present[non_ascii][translated != candidates]
+
+
+def detect_column(headers_list, phone_header, patterns):
+    """Return the first non-phone header matching the regex patterns"""
+    for h in headers_list:
+        if h == phone_header:
+            continue
+        if re.search(patterns, str(h), flags=re.IGNORECASE):
+            return h
+    return None
+
+
+def _display_name(df, idx, name_col):
+    return df.loc[idx, name_col] if name_col and name_col in df.columns else "N/A"
+
+
+def _failed(result, check, message):
+    result["passed"] = False
+    result["check"] = check
+    result["message"] = message
+    return result
+
+
+def _log_more(log, hidden, noun="row(s)"):
+    if hidden > 0:
+        log(f"  ... and {hidden} more {noun}")
+
+
+def validate_frame(df_raw, log=print, detail_limit=DETAIL_LIMIT, timings=None):
+    """Run every validation check on a freshly loaded frame.
+
+    Logs the same report the desktop app shows and returns a dict with the
+    cleaned frame (``df``), ``passed``, the failing ``check`` name and a
+    short ``message`` suitable for a dialog. Once every number is known to
+    be valid, ``phones`` holds them packed as (numbers, tags, whole_decimal)
+    (see pack_phones) so format_frame does not have to normalize again. At
+    most ``detail_limit`` offending rows are listed per failed check.
+    Cleaning and every check are timed in ``timings`` (a Timings), if given.
+    """
+    timings = timings or Timings()
+    # Clean Google Sheets artifacts (formulas / error tokens) for validation and AFTER preview base
+    with timings.stage("Cleaning artifacts", len(df_raw)):
+        df, artifact_stats = clean_spreadsheet_artifacts(df_raw)
+    result = {
+        "df": df,
+        "passed": True,
+        "check": None,
+        "message": "",
+        "artifact_stats": artifact_stats,
+        "phone_col": None,
+        "name_col": None,
+        "phones": None,
+    }
+    log_artifact_stats(artifact_stats, log)
+    original_rows = len(df_raw)
+    log(f"✓ Loaded {original_rows} rows")
+
+    # Get headers
+    headers = df.columns.tolist()
+    log(f"✓ Found {len(headers)} columns: {', '.join(headers)}\n")
+
+    if len(df.columns) == 0:
+        raise ValueError("CSV file is empty")
+
+    phone_col = df.columns[0]
+    name_col = detect_column(headers, phone_col, r"\b(name|full\s*name|contact|recipient)\b")
+    result["phone_col"] = phone_col
+    result["name_col"] = name_col
+
+    log(f"{'─'*60}")
+    log(f"VALIDATION CHECKS")
+    log(f"{'─'*60}\n")
+
+    # Check for empty phone numbers BEFORE formatting
+    # Handle Google Sheets formulas and decimal formats
+    with timings.stage("Check: empty phones", len(df)):
+        empty_phone = empty_phone_mask(df[phone_col])
+    empty_phone_rows = df[empty_phone]
+    if len(empty_phone_rows) > 0:
+        log(f"VALIDATION FAILED: Found {len(empty_phone_rows)} empty phone number(s)\n")
+        log("Rows with empty phone numbers:")
+        for idx in empty_phone_rows.index[:detail_limit]:
+            row_num = idx + 2  # +2 because Excel starts at 1 and has header
+            log(f"  • Row {row_num}: {_display_name(empty_phone_rows, idx, name_col)}")
+        _log_more(log, len(empty_phone_rows) - detail_limit)
+
+        log(f"\nPlease fix empty phone numbers before formatting.")
+        return _failed(
+            result, "empty_phone",
+            f"Found {len(empty_phone_rows)} row(s) with empty phone numbers.\n\n"
+            "Please fix the file and try again."
+        )
+
+    log("✓ No empty phone numbers found")
+
+    # Fail if phone column contains any letters
+    with timings.stage("Check: phone letters", len(df)):
+        phone_with_letters = df[phone_letters_mask(df[phone_col])]
+    if len(phone_with_letters) > 0:
+        log(f"VALIDATION FAILED: Found {len(phone_with_letters)} phone number(s) containing letters\n")
+        log("Rows with invalid phone numbers:")
+        for idx in phone_with_letters.index[:detail_limit]:
+            row_num = idx + 2  # account for header
+            raw_phone = df.loc[idx, phone_col]
+            log(f"  • Row {row_num}: {raw_phone} (Name: {_display_name(df, idx, name_col)})")
+        _log_more(log, len(phone_with_letters) - detail_limit)
+        log("\nPlease remove letters from phone numbers before formatting.")
+        return _failed(
+            result, "phone_letters",
+            f"Found {len(phone_with_letters)} phone number(s) containing letters.\n\nPlease fix the file and try again."
+        )
+
+    # Fail if phone number is incomplete (must be 11 digits starting with 09 or 12 digits starting with 63)
+    with timings.stage("Normalizing phones", len(df)):
+        df_digits, whole_decimals = normalize_phones(df[phone_col])
+
+    with timings.stage("Check: phone format", len(df)):
+        invalid_mask = ~valid_phone_mask(df_digits)
+    invalid_phone_rows = df[invalid_mask]
+    if len(invalid_phone_rows) > 0:
+        log(f"VALIDATION FAILED: Found {len(invalid_phone_rows)} phone number(s) not matching required format\n")
+        log("Valid formats: 09xxxxxxxxx (11 digits) or 63xxxxxxxxxx (12 digits)")
+        log("Rows with invalid phone numbers:")
+        for idx in invalid_phone_rows.index[:detail_limit]:
+            row_num = idx + 2
+            raw_phone = df.loc[idx, phone_col]
+            digits = df_digits.loc[idx]
+            reason = invalid_phone_reason(digits)
+            log(f"  • Row {row_num}: {raw_phone} → {digits} ({reason}) (Name: {_display_name(df, idx, name_col)})")
+        _log_more(log, len(invalid_phone_rows) - detail_limit)
+        log("\nPhone numbers must be 11 digits starting with '09' or 12 digits starting with '63'.")
+        return _failed(
+            result, "phone_format",
+            "Phone numbers must be 11 digits starting with '09' or 12 digits starting with '63'. Please fix the highlighted rows and try again."
+        )
+
+    # Strict rule: Fail if any non-phone field in a row is missing/empty/formula/error
+    with timings.stage("Check: missing fields", len(df)):
+        rows_with_missing = find_missing_fields(df, phone_col)
+
+    if rows_with_missing:
+        log(f"VALIDATION FAILED: Found {len(rows_with_missing)} row(s) with missing field(s)\n")
+        for idx, cols in rows_with_missing[:detail_limit]:
+            row_num = idx + 2
+            log(f"  • Row {row_num}: missing {', '.join(cols)}")
+        _log_more(log, len(rows_with_missing) - detail_limit)
+        log("\nPlease fill in all fields for rows that have a phone number.")
+        return _failed(
+            result, "missing_fields",
+            f"Found {len(rows_with_missing)} row(s) with missing field(s). Please complete all fields and try again."
+        )
+
+    # Every number is valid from here on: carry them packed (int64 + tag) and
+    # only render strings again for the report and the output file
+    with timings.stage("Packing phones", len(df)):
+        numbers, tags = pack_phones(df_digits)
+    del df_digits
+    result["phones"] = (numbers, tags, whole_decimals)
+
+    # Check duplicates BEFORE formatting, on the canonical subscriber key, so
+    # 639171234567 and 09171234567 count as the same number
+    with timings.stage("Check: duplicates", len(df)):
+        dup_positions = np.flatnonzero(pd.Series(numbers).duplicated(keep=False).to_numpy())
+    duplicate_count = len(dup_positions)
+
+    if duplicate_count > 0:
+        log(f"VALIDATION FAILED: Found duplicate phone numbers\n")
+
+        # Group duplicate rows by number (file order within each group)
+        dup_positions = dup_positions[np.argsort(numbers[dup_positions], kind='stable')]
+        dup_keys = numbers[dup_positions]
+        starts = np.flatnonzero(np.r_[True, dup_keys[1:] != dup_keys[:-1]])
+        ends = np.r_[starts[1:], duplicate_count]
+        group_count = len(starts)
+
+        log("Duplicate phone numbers found:")
+        for start, end in zip(starts[:detail_limit].tolist(), ends[:detail_limit].tolist()):
+            group = dup_positions[start:end]
+            shown = group[:detail_limit]
+            spellings = unpack_phones(numbers[shown], tags[shown])
+            log(f"\n  {spellings[0]} appears {len(group)} times:")
+            row_nums = [idx + 2 for idx in df.index[shown]]  # +2 because Excel starts at 1 and has header
+            names = [_display_name(df, idx, name_col) for idx in df.index[shown]]
+            for line in _duplicate_row_lines(row_nums, names, spellings):
+                log(line)
+            _log_more(log, len(group) - detail_limit)
+        if group_count > detail_limit:
+            log("")
+        _log_more(log, group_count - detail_limit, "duplicated number(s)")
+
+        log(f"\nPlease remove duplicates before formatting.")
+        return _failed(
+            result, "duplicates",
+            f"Found duplicate phone numbers!\n\n"
+            f"Unique numbers duplicated: {group_count}\n"
+            f"Total rows affected: {duplicate_count}\n\n"
+            "Please fix the file and try again."
+        )
+
+    log("✓ No duplicates found\n")
+    return result
+
+
+def format_frame(df, log=print, fold_unicode=False, phones=None, progress=None):
+    """Format phone numbers and replace special characters on a cleaned frame.
+
+    With ``fold_unicode`` characters outside CHAR_MAP are also folded to
+    ASCII through NFKD where possible. ``phones`` takes the packed numbers
+    already computed by validate_frame. Returns the formatted frame and a
+    stats dict.
+    """
+    progress = progress or Progress()
+    phone_col = df.columns[0]
+
+    # Format phone numbers
+    log("Formatting phone numbers...")
+    progress.start("Formatting phone numbers", len(df))
+
+    # Track special formatting cases during actual formatting
+    if phones is None:
+        df[phone_col], whole_decimals = normalize_phones(df[phone_col])
+    else:
+        numbers, tags, whole_decimals = phones
+        df[phone_col] = pd.Series(unpack_phones(numbers, tags), index=df.index, dtype=object)
+    decimal_format_count = int(whole_decimals.sum())
+    formatted_count = len(df[df[phone_col] != ""])
+    progress.finish(len(df))
+    log(f"✓ Formatted {formatted_count} phone numbers")
+
+    # Show special formatting statistics
+    if decimal_format_count > 0:
+        log("Special formatting applied:")
+        log(f"  • {decimal_format_count} decimal format numbers (.0 suffix removed)")
+    log("")
+
+    # Replace special characters in all columns and track statistics
+    log("Replacing special characters (accented letters, symbols, etc.)...")
+
+    # Track special character replacements
+    total_replacements = 0
+    replacement_stats = {}
+    column_replacements = {}
+
+    text_columns = [col for col in df.columns if is_text_column(df[col])]  # Only string columns
+    progress.start("Replacing special characters", len(df) * len(text_columns), unit="cells")
+    for col in df.columns:
+        if col in text_columns:
+            df[col], counts = transliterate_column(df[col], fold_unicode)
+            progress.advance(len(df))
+            col_replacements = sum(info['count'] for info in counts.values())
+            for char, info in counts.items():
+                if char not in replacement_stats:
+                    replacement_stats[char] = {'replacement': info['replacement'], 'count': 0}
+                replacement_stats[char]['count'] += info['count']
+
+            if col_replacements > 0:
+                total_replacements += col_replacements
+                column_replacements[col] = col_replacements
+                log(f"  • {col}: {col_replacements} characters replaced")
+
+    progress.finish()
+    if total_replacements > 0:
+        log(f"✓ Special characters replaced: {total_replacements} total")
+
+        # Show detailed breakdown of replacements
+        log("  Replacement breakdown:")
+        for char, info in sorted(replacement_stats.items(), key=lambda x: x[1]['count'], reverse=True):
+            log(f"    {char} → {info['replacement']}: {info['count']} times")
+    else:
+        log("✓ No special characters found to replace")
+    log("")
+
+    return df, {
+        "formatted": formatted_count,
+        "decimal_formats": decimal_format_count,
+        "total_replacements": total_replacements,
+        "replacement_stats": replacement_stats,
+        "column_replacements": column_replacements,
+    }
+
+
+def apply_frequency_cap(df, history, max_sends, window_days=DEFAULT_WINDOW_DAYS, log=print):
+    """Drop rows of a formatted frame whose number was already sent in
+    ``max_sends`` campaign runs within the last ``window_days`` days.
+    The history is keyed on the national number, so the 09 and 63 spellings
+    of one subscriber count together. Returns the kept rows and how many
+    were skipped."""
+    counts = history.send_counts(pack_phones(df.iloc[:, 0])[0], window_days)
+    over = counts >= max_sends
+    skipped = int(over.sum())
+    if skipped:
+        log(f"✓ Skipped {skipped} number(s) already texted {max_sends} time(s) in the last {window_days} day(s)")
+        df = df[~over]
+    return df, skipped
+
+
+class Progress:
+    """Progress of the pipeline stages: rows done, throughput and ETA.
+
+    Pipeline code calls start(stage, total), advance(count) as work gets
+    done and finish(). ``report(text, done)`` gets a status line at most
+    every ``interval`` seconds while a stage runs (done=False) and a
+    summary line when it ends (done=True). Without ``report`` nothing is
+    reported, so functions can always take ``progress or Progress()``.
+    Every finished stage is also recorded in ``timings`` (a Timings), if
+    given.
+    """
+
+    def __init__(self, report=None, interval=0.25, clock=time.perf_counter, timings=None):
+        self.report = report
+        self.timings = timings
+        self.interval = interval
+        self.clock = clock
+        self.stage = None
+        self.total = None
+        self.count = 0
+        self.unit = "rows"
+        self.started = self.reported = 0.0
+
+    def start(self, stage, total=None, unit="rows"):
+        self.stage, self.total, self.count, self.unit = stage, total, 0, unit
+        self.started = self.reported = self.clock()
+        if self.timings is not None:
+            self.timings.begin(stage)
+        if self.report:
+            self.report(self.status(), False)
+
+    def advance(self, count):
+        self.count += count
+        now = self.clock()
+        if self.report and now - self.reported >= self.interval:
+            self.reported = now
+            self.report(self.status(), False)
+
+    def finish(self, count=None):
+        """End the stage; ``count`` sets the final amount for stages that
+        are done in one step"""
+        if count is not None:
+            self.count = count
+        if self.timings is not None:
+            self.timings.end(self.stage, self.count, self.unit)
+        if self.report:
+            self.report(self.status(done=True), True)
+        self.stage = None
+
+    def fraction(self):
+        """Share of the stage done (0..1), or None if the total is unknown"""
+        if not self.total:
+            return None
+        return min(self.count / self.total, 1.0)
+
+    def rate(self):
+        elapsed = self.clock() - self.started
+        return self.count / elapsed if elapsed > 0 else 0.0
+
+    def eta(self):
+        """Seconds left at the current rate, or None if unknown"""
+        rate = self.rate()
+        if not self.total or rate <= 0:
+            return None
+        return max(self.total - self.count, 0) / rate
+
+    def status(self, done=False):
+        rate = f"{self.rate():,.0f} {self.unit}/s"
+        if done:
+            return (f"✓ {self.stage}: {self.count:,} {self.unit} in "
+                    f"{self.clock() - self.started:.1f}s ({rate})")
+        text = f"⏳ {self.stage}: {self.count:,}"
+        if self.total:
+            text += f" / {self.total:,} {self.unit} ({self.fraction():.0%})"
+        else:
+            text += f" {self.unit}"
+        if self.count:
+            text += f" • {rate}"
+            if self.eta() is not None:
+                text += f" • ETA {self.eta():.0f}s"
+        return text
+
+
+# Set to 1/true to capture a cProfile of every run
+PROFILE_ENV = "SMS_PROFILE"
+# Set to 1/true to track memory (tracemalloc + RSS) of every run
+MEMORY_ENV = "SMS_MEMORY"
+# Directory for the command line timing reports (see --timings)
+TIMINGS_DIR_ENV = "SMS_TIMINGS_DIR"
+DEFAULT_TIMINGS_DIR = os.path.join(os.path.expanduser("~"), ".sms_timings")
+# Timing reports kept per directory (oldest are deleted)
+TIMINGS_KEEP = 200
+# Functions listed from a profile, by cumulative time
+HOT_SPOTS = 25
+
+
+def _env_flag(name):
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def profiling_requested():
+    """True if the SMS_PROFILE environment variable asks for cProfile"""
+    return _env_flag(PROFILE_ENV)
+
+
+def memory_tracking_requested():
+    """True if the SMS_MEMORY environment variable asks for memory tracking"""
+    return _env_flag(MEMORY_ENV)
+
+
+def rss_bytes():
+    """Resident set size of this process, or None where it cannot be read
+    (psutil if installed, else /proc on Linux)"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def _mb(count):
+    return round(count / 2**20, 3) if count is not None else None
+
+
+class Timings:
+    """Wall time and counts per named stage of a run, with optional
+    cProfile and memory tracking.
+
+    Stages come from a Progress created with ``timings=`` (every
+    start/finish pair), from ``with timings.stage(name, rows)`` for finer
+    steps such as the single validation checks and from timed() for chunk
+    reads. Stages may nest; a stage recorded again (per chunk, per batch
+    file) accumulates. With ``profile`` cProfile runs between start() and
+    stop(). With ``memory`` tracemalloc runs between them too, and every
+    stage also records its peak (traced memory above the level it started
+    at), what it left allocated (retained) and the process RSS when it
+    ended; track_frame() adds the size of DataFrames the run keeps alive.
+    Tracing makes the run itself noticeably slower.
+    """
+
+    def __init__(self, profile=False, memory=False, clock=time.perf_counter):
+        self.clock = clock
+        self.stages = {}
+        self.frames = {}
+        self.seconds = 0.0
+        self.started = None
+        self.profiler = cProfile.Profile() if profile else None
+        self.memory = memory
+        self.traced_peak = 0
+        self.rss_peak = None
+        self._open = []
+        self._frame_ids = {}
+        self._tracing = False
+
+    def start(self):
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        self.started = self.clock()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def stop(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.started is not None:
+            self.seconds += self.clock() - self.started
+            self.started = None
+        if self.memory and tracemalloc.is_tracing():
+            self._memory_sample()
+            self._rss_sample()
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+        self._open = []
+
+    def _memory_sample(self):
+        """Current traced size; folds the peak since the last sample into
+        every running stage and starts a new peak window"""
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        for frame in self._open:
+            frame["peak"] = max(frame["peak"], peak)
+        self.traced_peak = max(self.traced_peak, peak)
+        return current
+
+    def _rss_sample(self):
+        rss = rss_bytes()
+        if rss is not None:
+            self.rss_peak = max(self.rss_peak or 0, rss)
+        return rss
+
+    def begin(self, name):
+        """Start timing stage ``name``; end it with end(name, count)"""
+        frame = {"stage": name, "started": self.clock(), "current": 0, "peak": 0}
+        if self.memory and tracemalloc.is_tracing():
+            frame["current"] = frame["peak"] = self._memory_sample()
+        self._open.append(frame)
+
+    def end(self, name, count=None, unit="rows"):
+        """Record stage ``name`` (and drop any stage left open inside it)"""
+        positions = [i for i, frame in enumerate(self._open) if frame["stage"] == name]
+        if not positions:
+            return
+        frame = self._open[positions[-1]]
+        memory = {}
+        if self.memory and tracemalloc.is_tracing():
+            current = self._memory_sample()
+            memory = {"peak": frame["peak"] - frame["current"], "retained": current - frame["current"],
+                      "rss": self._rss_sample()}
+        del self._open[positions[-1]:]
+        self.add(name, self.clock() - frame["started"], count, unit, **memory)
+
+    def add(self, stage, seconds, count=None, unit="rows", calls=1, peak=None, retained=None, rss=None):
+        entry = self.stages.setdefault(stage, {"seconds": 0.0, "count": 0, "unit": unit, "calls": 0,
+                                               "peak": None, "retained": None, "rss": None})
+        entry["seconds"] += seconds
+        entry["count"] += count or 0
+        entry["calls"] += calls
+        if peak is not None:
+            entry["peak"] = max(entry["peak"] or 0, peak)
+        if retained is not None:
+            entry["retained"] = (entry["retained"] or 0) + retained
+        if rss is not None:
+            entry["rss"] = max(entry["rss"] or 0, rss)
+
+    @contextlib.contextmanager
+    def stage(self, name, count=None, unit="rows"):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name, count, unit)
+
+    def timed(self, name, chunks):
+        """Iterate ``chunks``, timing the wait for each one as ``name``"""
+        chunks = iter(chunks)
+        while True:
+            self.begin(name)
+            chunk = next(chunks, None)
+            if chunk is None:
+                self._open.pop()
+                return
+            self.end(name, len(chunk))
+            yield chunk
+
+    def track_frame(self, name, df):
+        """Record the deep size of a DataFrame the run keeps alive (memory
+        tracking only); a frame tracked under another name is counted once"""
+        if not self.memory or df is None:
+            return
+        same_as = self._frame_ids.get(id(df))
+        self._frame_ids.setdefault(id(df), name)
+        self.frames[name] = {
+            "rows": len(df),
+            "columns": df.shape[1],
+            "mb": _mb(0 if same_as else int(df.memory_usage(deep=True).sum())),
+            "same_as": same_as,
+        }
+
+    def merge(self, records):
+        """Add the records() of another run, e.g. a batch worker's"""
+        for record in records:
+            memory = {key: record[f"{key}_mb"] * 2**20 for key in ("peak", "retained", "rss")
+                      if record.get(f"{key}_mb") is not None}
+            self.add(record["stage"], record["seconds"], record["count"], record["unit"], record["calls"],
+                     **memory)
+
+    def records(self):
+        """One dict per stage (stage, seconds, count, unit, calls, per_second
+        and, with memory tracking, peak_mb, retained_mb and rss_mb), in the
+        order the stages first finished"""
+        records = []
+        for stage, entry in self.stages.items():
+            record = {"stage": stage, "seconds": round(entry["seconds"], 6), "count": entry["count"],
+                      "unit": entry["unit"], "calls": entry["calls"],
+                      "per_second": round(entry["count"] / entry["seconds"]) if entry["seconds"] > 0 else None}
+            if self.memory:
+                record.update(peak_mb=_mb(entry["peak"]), retained_mb=_mb(entry["retained"]),
+                              rss_mb=_mb(entry["rss"]))
+            records.append(record)
+        return records
+
+    def hot_spots(self, limit=HOT_SPOTS):
+        """The ``limit`` functions with the most cumulative time in the
+        profile (empty without profiling)"""
+        if self.profiler is None:
+            return []
+        stats = pstats.Stats(self.profiler).stats
+        top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [
+            {"function": f"{os.path.basename(filename)}:{line}({function})", "calls": calls,
+             "own_seconds": round(own, 6), "cumulative_seconds": round(cumulative, 6)}
+            for (filename, line, function), (_, calls, own, cumulative, _) in top
+        ]
+
+    def report(self):
+        report = {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "total_seconds": round(self.seconds, 6),
+            "stages": self.records(),
+            "hot_spots": self.hot_spots(),
+        }
+        if self.memory:
+            report["memory"] = {
+                "traced_peak_mb": _mb(self.traced_peak),
+                "rss_peak_mb": _mb(self.rss_peak),
+                "frames": self.frames,
+                "frames_mb": round(sum(frame["mb"] for frame in self.frames.values()), 3),
+            }
+        return report
+
+    def log_summary(self, log=print):
+        log(f"{'='*60}")
+        log("TIMING BREAKDOWN")
+        log(f"{'='*60}")
+        for record in self.records():
+            rate = f"{record['per_second']:,} {record['unit']}/s" if record["count"] and record["per_second"] else ""
+            line = f"  {record['stage']:<30}{record['seconds']:>9.3f}s  {rate:<20}"
+            if record.get("peak_mb") is not None:
+                line += f"peak {record['peak_mb']:>8,.1f} MB  kept {record['retained_mb']:>8,.1f} MB"
+            log(line.rstrip())
+        if self.seconds:
+            log(f"  {'Total':<30}{self.seconds:>9.3f}s")
+        if self.memory:
+            memory = self.report()["memory"]
+            log(f"\nMemory: traced peak {memory['traced_peak_mb']:,.1f} MB"
+                + (f", RSS peak {memory['rss_peak_mb']:,.1f} MB" if memory["rss_peak_mb"] is not None else ""))
+            for name, frame in self.frames.items():
+                size = f"same as {frame['same_as']}" if frame["same_as"] else f"{frame['mb']:,.1f} MB"
+                log(f"  • {name}: {frame['rows']:,} rows x {frame['columns']} columns, {size}")
+            if self.frames:
+                log(f"  Retained DataFrames: {memory['frames_mb']:,.1f} MB")
+        spots = self.hot_spots(10)
+        if spots:
+            log("\nSlowest functions (cumulative):")
+            for spot in spots:
+                log(f"  {spot['cumulative_seconds']:>9.3f}s  {spot['function']}")
+        log("")
+
+    def save(self, path):
+        """Write report() as JSON to ``path``; with profiling the raw
+        profile goes next to it (same name, .prof) for pstats/snakeviz"""
+        report = self.report()
+        if self.profiler is not None:
+            report["profile"] = os.path.splitext(path)[0] + ".prof"
+            self.profiler.dump_stats(report["profile"])
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+
+
+def save_timings(timings, directory, label):
+    """Save a run's timings as ``<directory>/<timestamp>_<label>.json``,
+    keeping the newest TIMINGS_KEEP reports; returns the path"""
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    label = re.sub(r"[^\w.-]+", "_", label) or "run"
+    path = os.path.join(directory, f"{stamp}_{label}.json")
+    timings.save(path)
+    reports = sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+    for name in reports[:-TIMINGS_KEEP]:
+        for old in (name, name[:-len(".json")] + ".prof"):
+            try:
+                os.remove(os.path.join(directory, old))
+            except OSError:
+                pass
+    return path
+
+
+# Compressed CSVs are recognised by their first bytes, whatever they are called
+COMPRESSION_MAGIC = {b"\x1f\x8b": "gzip", b"\x28\xb5\x2f\xfd": "zstd"}
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+# Levels for compressed output: well past the point of diminishing returns
+# in size while still writing faster than the pipeline formats
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def detect_compression(path):
+    """"gzip", "zstd" or None, from the file's magic bytes (not its name)"""
+    with open(path, "rb") as f:
+        head = f.read(4)
+    return next((codec for magic, codec in COMPRESSION_MAGIC.items() if head.startswith(magic)), None)
+
+
+def _require_codec(compression, action):
+    if compression == "zstd" and not ZSTANDARD_AVAILABLE:
+        raise ValueError(f"{action} needs zstandard (pip install zstandard)")
+
+
+def _csv_compression(path):
+    """detect_compression() for a CSV about to be read, checking the codec is installed"""
+    compression = detect_compression(path)
+    _require_codec(compression, f"Reading {os.path.basename(path)} (zstd-compressed)")
+    return compression
+
+
+def open_input(path, compression=None):
+    """Binary stream of path, decompressed on the fly"""
+    if compression == "gzip":
+        return gzip.open(path, "rb")
+    if compression == "zstd":
+        return zstandard.open(path, "rb")
+    return open(path, "rb")
+
+
+def open_output(path, compression=None):
+    """Text stream for writing CSV to path, compressed on the fly with
+    ``compression`` ("gzip", "zstd" or None)"""
+    _require_codec(compression, "Writing zstd output")
+    if compression == "gzip":
+        return gzip.open(path, "wt", compresslevel=GZIP_LEVEL, encoding="utf-8", newline="")
+    if compression == "zstd":
+        return zstandard.open(path, "wt", cctx=zstandard.ZstdCompressor(level=ZSTD_LEVEL),
+                              encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+
+def file_stem(path):
+    """Filename without directory, extension or compression suffix"""
+    name = os.path.basename(path)
+    for suffix in COMPRESSION_SUFFIXES.values():
+        if name.lower().endswith(suffix):
+            name = name[:-len(suffix)]
+    return os.path.splitext(name)[0]
+
+
+def count_data_rows(path, sheet=None):
+    """Quick row count estimate for progress totals (lines minus header;
+    quoted fields spanning lines make it an overestimate). Parquet and
+    Arrow files are counted exactly from their metadata, worksheets from
+    their recorded dimensions (None if the workbook has none); compressed
+    CSVs are decompressed to count."""
+    kind = input_format(path)
+    if kind == "excel":
+        with _open_worksheet(path, sheet) as worksheet:
+            return max(worksheet.max_row - 1, 0) if worksheet.max_row else None
+    if kind == "parquet":
+        _require_pyarrow(f"Reading {os.path.basename(path)}")
+        return pq.ParquetFile(path).metadata.num_rows
+    if kind == "arrow":
+        _require_pyarrow(f"Reading {os.path.basename(path)}")
+        with pa.memory_map(path, "r") as source:
+            reader = pa.ipc.open_file(source)
+            return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    lines = 0
+    last = b"\n"
+    with open_input(path, _csv_compression(path)) as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            lines += block.count(b"\n")
+            last = block[-1:]
+    if last != b"\n":
+        lines += 1
+    return max(lines - 1, 0)
+
+
+# Rows per to_csv call when writing with progress
+WRITE_CHUNK_ROWS = 50_000
+
+
+def write_csv(df, path, progress=None, compression=None):
+    """df.to_csv(path, index=False) in slices of WRITE_CHUNK_ROWS rows,
+    reporting progress, optionally compressed (see open_output)"""
+    progress = progress or Progress()
+    progress.start("Writing output", len(df))
+    with open_output(path, compression) as f:
+        df.iloc[:0].to_csv(f, index=False)
+        for start in range(0, len(df), WRITE_CHUNK_ROWS):
+            chunk = df.iloc[start:start + WRITE_CHUNK_ROWS]
+            chunk.to_csv(f, index=False, header=False)
+            progress.advance(len(chunk))
+    progress.finish()
+
+
+# A phone cell that is just a number in scientific notation, as spreadsheets
+# export long numbers ("6.39123456789E+11")
+SCIENTIFIC_NUMBER = r"[+-]?(?:\d+\.?\d*|\.\d+)[eE][+-]?\d+"
+
+# Columnar inputs, read through pyarrow
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+# Workbooks, streamed through openpyxl
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm")
+INPUT_EXTENSIONS = (".csv", ".csv.gz", ".csv.zst") + PARQUET_EXTENSIONS + ARROW_EXTENSIONS + EXCEL_EXTENSIONS
+
+
+def input_format(path):
+    """"csv", "parquet", "arrow" (Arrow IPC / Feather v2) or "excel", by extension"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in EXCEL_EXTENSIONS:
+        return "excel"
+    if extension in PARQUET_EXTENSIONS:
+        return "parquet"
+    if extension in ARROW_EXTENSIONS:
+        return "arrow"
+    return "csv"
+
+
+def is_contact_list(path):
+    """Whether path is an input the pipeline reads: a file with one of the
+    INPUT_EXTENSIONS or, whatever it is called, a gzip/zstd-compressed file"""
+    if path.lower().endswith(INPUT_EXTENSIONS):
+        return True
+    try:
+        return detect_compression(path) is not None
+    except OSError:
+        return False
+
+
+def _require_pyarrow(action):
+    if not PYARROW_AVAILABLE:
+        raise ValueError(f"{action} needs pyarrow (pip install pyarrow)")
+
+
+def _typed_contacts(df):
+    """Phone cells in scientific notation become the number they stand for
+    (as str(float) would print it), the way the old float parse read them"""
+    if df.shape[1] == 0 or len(df) == 0:
+        return df
+    phone = df.iloc[:, 0]
+    scientific = phone.str.strip().str.fullmatch(SCIENTIFIC_NUMBER, na=False).to_numpy(dtype=bool)
+    if scientific.any():
+        values = phone.to_numpy(dtype=object).copy()
+        values[scientific] = [repr(float(value.strip())) for value in values[scientific]]
+        df[df.columns[0]] = pd.Series(values, index=df.index, dtype=phone.dtype)
+    return df
+
+
+def _as_text(df):
+    """Typed columns of a Parquet/Arrow table as text, nulls kept as NaN"""
+    return df.astype(str).where(df.notna())
+
+
+# pandas' default missing-value markers, so both CSV parsers agree on NaN
+CSV_NA_VALUES = ["", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+                 "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"]
+CSV_NA_SET = frozenset(CSV_NA_VALUES)
+
+
+def _read_csv_arrow(path, compression=None):
+    """Whole CSV through pyarrow's multi-threaded parser with every column
+    typed as string up front (pandas' pyarrow engine infers types first and
+    casts afterwards, which drops leading zeros). None if pyarrow rejects
+    the file, e.g. ragged rows the pandas parser handles or reports."""
+    headers = pd.read_csv(path, nrows=0, compression=compression).columns
+    names = [f"c{i}" for i in range(len(headers))]
+    try:
+        table = pa_csv.read_csv(
+            pa.input_stream(path, compression=compression),
+            read_options=pa_csv.ReadOptions(column_names=names, skip_rows=1),
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(column_types={name: pa.string() for name in names},
+                                                  null_values=CSV_NA_VALUES, strings_can_be_null=True),
+        )
+    except pa.ArrowInvalid:
+        return None
+    df = _as_text(table.to_pandas())
+    df.columns = headers
+    return df
+
+
+# Rows per DataFrame built from a worksheet when reading it whole
+EXCEL_CHUNK_ROWS = 50_000
+
+
+def _cell_text(value):
+    """A worksheet cell as the text a CSV export of it would hold (None for
+    empty cells and the markers read_csv treats as missing)"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat() if value.time() == datetime.time() else value.isoformat(sep=" ")
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, float):
+        return repr(value)
+    text = str(value)
+    return None if text in CSV_NA_SET else text
+
+
+def _header_names(values):
+    """Column names from a header row, with read_csv's "Unnamed: i" for
+    blanks and ".1", ".2" suffixes for repeats"""
+    names = []
+    seen = {}
+    for i, value in enumerate(values):
+        name = _cell_text(value) or f"Unnamed: {i}"
+        base = name
+        while name in seen:
+            seen[base] += 1
+            name = f"{base}.{seen[base]}"
+        seen[name] = 0
+        names.append(name)
+    return names
+
+
+@contextlib.contextmanager
+def _open_worksheet(path, sheet=None):
+    """Read-only worksheet ``sheet`` (name; default the first) of a workbook.
+
+    Read-only mode parses rows as they are iterated instead of loading the
+    workbook, and data_only gives formula cells their cached result (error
+    results such as #REF! come through as text for clean_spreadsheet_artifacts).
+    """
+    if not OPENPYXL_AVAILABLE:
+        raise ValueError(f"Reading {os.path.basename(path)} needs openpyxl (pip install openpyxl)")
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        if sheet is None:
+            if not workbook.worksheets:
+                raise ValueError(f"{os.path.basename(path)} has no worksheets")
+            yield workbook.worksheets[0]
+        elif sheet in workbook.sheetnames:
+            yield workbook[sheet]
+        else:
+            raise ValueError(f"Sheet '{sheet}' not found in {os.path.basename(path)} "
+                             f"(sheets: {', '.join(workbook.sheetnames)})")
+    finally:
+        workbook.close()
+
+
+def excel_sheets(path):
+    """Worksheet names of a workbook, in workbook order"""
+    if not OPENPYXL_AVAILABLE:
+        raise ValueError(f"Reading {os.path.basename(path)} needs openpyxl (pip install openpyxl)")
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return [worksheet.title for worksheet in workbook.worksheets]
+    finally:
+        workbook.close()
+
+
+def _excel_chunks(path, chunksize, sheet=None, columns=None):
+    """Data rows of a worksheet as text frames of at most ``chunksize`` rows.
+
+    The first non-empty row is the header. Rows are indexed by position
+    after it, like read_csv chunks; blank rows are kept (as all-NaN rows)
+    so row numbers match the sheet's when the header is on row 1.
+    """
+    with _open_worksheet(path, sheet) as worksheet:
+        rows = worksheet.iter_rows(values_only=True)
+        header = next((row for row in rows if any(value is not None for value in row)), ())
+        # Formatting can stretch the sheet's dimension past the last header cell
+        width = len(header)
+        while width and header[width - 1] is None:
+            width -= 1
+        headers = _header_names(header[:width])
+        keep = [headers.index(col) for col in columns] if columns is not None else range(width)
+        names = [headers[i] for i in keep]
+        start = 0
+        batch = []
+        for row in rows:
+            if any(value is not None for value in row[width:]):
+                raise ValueError(f"Row {start + len(batch) + 2} of {os.path.basename(path)} has cells "
+                                 f"beyond the {width} header columns")
+            cells = tuple(row[i] if i < len(row) else None for i in keep)
+            batch.append([_cell_text(value) for value in cells])
+            if len(batch) == chunksize:
+                yield pd.DataFrame(batch, columns=names, index=pd.RangeIndex(start, start + len(batch)), dtype=str)
+                start += len(batch)
+                batch = []
+        if batch or start == 0:
+            yield pd.DataFrame(batch, columns=names, index=pd.RangeIndex(start, start + len(batch)), dtype=str)
+
+
+def _check_fields(df, path):
+    """Reject a frame read_csv indexed by its leading fields, which it does
+    when the rows have more fields than the header (e.g. unquoted commas)"""
+    if not isinstance(df.index, pd.RangeIndex):
+        raise ValueError(f"{os.path.basename(path)} has rows with more fields than its "
+                         f"{len(df.columns)} header columns (unquoted commas in a value?)")
+    return df
+
+
+def read_contacts(path, sheet=None, **kwargs):
+    """Read a contact list with every column as text.
+
+    The phone column keeps what was typed (09 numbers keep their leading
+    zero, no float rounding) and the other columns are written back exactly
+    as they came in. Uses pyarrow's multi-threaded parser when installed.
+    Parquet and Arrow files (see input_format) are read through pyarrow,
+    their typed columns turned into text; workbooks are streamed from
+    worksheet ``sheet`` (default: the first, see _excel_chunks). gzip and
+    zstd CSVs are decompressed while parsing (see detect_compression).
+    ``kwargs`` go to pd.read_csv.
+    """
+    kind = input_format(path)
+    if kind == "excel":
+        return _typed_contacts(pd.concat(_excel_chunks(path, EXCEL_CHUNK_ROWS, sheet)))
+    if kind != "csv":
+        _require_pyarrow(f"Reading {os.path.basename(path)}")
+        df = pd.read_parquet(path) if kind == "parquet" else pd.read_feather(path)
+        return _typed_contacts(_as_text(df))
+    compression = _csv_compression(path)
+    if PYARROW_AVAILABLE and not kwargs:
+        df = _read_csv_arrow(path, compression)
+        if df is not None:
+            return _typed_contacts(df)
+    return _typed_contacts(_check_fields(pd.read_csv(path, dtype=str, compression=compression, **kwargs), path))
+
+
+def _columnar_batches(path, chunksize, columns=None):
+    """pyarrow tables of at most ``chunksize`` rows from a Parquet or Arrow file"""
+    _require_pyarrow(f"Reading {os.path.basename(path)}")
+    if input_format(path) == "parquet":
+        parquet = pq.ParquetFile(path)
+        try:
+            for batch in parquet.iter_batches(batch_size=chunksize, columns=columns):
+                yield pa.Table.from_batches([batch])
+        finally:
+            parquet.close()
+        return
+    # Memory-mapped: slicing the table copies nothing until to_pandas()
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+        if columns is not None:
+            table = table.select(columns)
+        for start in range(0, table.num_rows, chunksize):
+            yield table.slice(start, chunksize)
+
+
+def read_contact_chunks(path, chunksize, columns=None, sheet=None):
+    """read_contacts() as a generator of ``chunksize``-row frames, indexed
+    by row position in the file like read_csv chunks. ``columns`` reads
+    just those columns, as plain text."""
+    kind = input_format(path)
+    if kind == "csv":
+        with pd.read_csv(path, dtype=str, chunksize=chunksize, usecols=columns,
+                         compression=_csv_compression(path)) as reader:
+            for chunk in reader:
+                _check_fields(chunk, path)
+                yield chunk if columns is not None else _typed_contacts(chunk)
+        return
+    if kind == "excel":
+        for chunk in _excel_chunks(path, chunksize, sheet, columns):
+            yield chunk if columns is not None else _typed_contacts(chunk)
+        return
+    start = 0
+    for table in _columnar_batches(path, chunksize, columns):
+        chunk = _as_text(table.to_pandas())
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        start += len(chunk)
+        yield chunk if columns is not None else _typed_contacts(chunk)
+
+
+def read_contact_headers(path, sheet=None):
+    """Column names of a contact list without reading its rows"""
+    kind = input_format(path)
+    if kind == "csv":
+        return pd.read_csv(path, nrows=0, compression=_csv_compression(path)).columns.tolist()
+    if kind == "excel":
+        with contextlib.closing(_excel_chunks(path, 1, sheet)) as chunks:
+            return next(chunks).columns.tolist()
+    _require_pyarrow(f"Reading {os.path.basename(path)}")
+    if kind == "parquet":
+        return pq.read_schema(path).names
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).schema.names
+
+
+def parquet_path(output_path):
+    """Path of the Parquet sidecar written next to a CSV output"""
+    return os.path.join(os.path.dirname(output_path), file_stem(output_path) + ".parquet")
+
+
+class ParquetSidecar:
+    """Formatted rows written as Parquet next to the CSV output.
+
+    Chunks are appended to ``path + '.part'`` with every column stored as
+    text (as read, see read_contacts); commit() moves the file into place
+    and discard() deletes it, mirroring the CSV ``.part`` handling.
+    """
+
+    def __init__(self, path):
+        _require_pyarrow("Writing Parquet")
+        self.path = path
+        self.part_path = path + ".part"
+        self.writer = None
+
+    def write(self, df):
+        schema = pa.schema([(str(col), pa.string()) for col in df.columns])
+        text = df.astype(object).where(df.notna(), None)
+        table = pa.Table.from_pandas(text, schema=schema, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.part_path, schema)
+        self.writer.write_table(table)
+
+    def commit(self, headers):
+        """Close and move into place; a file without rows still gets ``headers``"""
+        if self.writer is None:
+            self.write(pd.DataFrame(columns=headers))
+        self.writer.close()
+        self.writer = None
+        os.replace(self.part_path, self.path)
+
+    def discard(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if os.path.exists(self.part_path):
+            os.remove(self.part_path)
+
+
+def write_parquet(df, path, progress=None):
+    """Write a formatted frame as a Parquet sidecar (see ParquetSidecar)"""
+    progress = progress or Progress()
+    progress.start("Writing Parquet", len(df))
+    sidecar = ParquetSidecar(path)
+    try:
+        for start in range(0, len(df), WRITE_CHUNK_ROWS):
+            chunk = df.iloc[start:start + WRITE_CHUNK_ROWS]
+            sidecar.write(chunk)
+            progress.advance(len(chunk))
+        sidecar.commit(df.columns.tolist())
+    except Exception:
+        sidecar.discard()
+        raise
+    progress.finish()
+
+
+def file_signature(path):
+    """(absolute path, size, mtime) identifying one version of a file on disk"""
+    st = os.stat(path)
+    return (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+
+class SessionCache:
+    """Parsed and validated frames for the files of the current session.
+
+    Entries are keyed by file signature, so validation, preview and
+    formatting share one parse of an unchanged file while an edited file
+    is read again. Each entry is a dict with the raw frame (``raw``), the
+    validate_frame result (``result``), the validation report (``log``)
+    and the preview diffs computed so far (``preview``, by fold_unicode).
+    """
+
+    def __init__(self, max_entries=1):
+        self.max_entries = max_entries
+        self.entries = {}
+
+    def get(self, path, sheet=None):
+        """Cached entry for path, or None if missing or the file changed"""
+        try:
+            return self.entries.get(file_signature(path) + (sheet,))
+        except OSError:
+            return None
+
+    def load(self, path, log=print, progress=None, sheet=None):
+        """Validate path (worksheet ``sheet`` of a workbook), reusing the
+        cached parse if the file is unchanged.
+
+        On a hit the stored validation report is replayed through ``log``.
+        """
+        progress = progress or Progress()
+        entry = self.get(path, sheet)
+        if entry is not None:
+            for message in entry["log"]:
+                log(message)
+            return entry
+
+        signature = file_signature(path) + (sheet,)
+        lines = []
+        def tee(message):
+            lines.append(message)
+            log(message)
+
+        progress.start("Reading file")
+        raw = read_contacts(path, sheet)
+        progress.finish(len(raw))
+        progress.start("Validating", len(raw))
+        result = validate_frame(raw, tee, timings=progress.timings)
+        progress.finish(len(raw))
+        if progress.timings is not None:
+            progress.timings.track_frame("raw (session cache)", raw)
+            progress.timings.track_frame("cleaned (session cache)", result["df"])
+        entry = {"signature": signature, "raw": raw, "result": result, "log": lines, "preview": {}}
+        # Older versions of the same file are never valid again
+        for key in [key for key in self.entries if key[0] == signature[0]]:
+            del self.entries[key]
+        while len(self.entries) >= self.max_entries:
+            del self.entries[next(iter(self.entries))]
+        self.entries[signature] = entry
+        return entry
+
+    def preview_diff(self, entry, fold_unicode=False, progress=None):
+        """preview_diff for a loaded entry, computed once and kept with it.
+
+        Called from the validation worker so opening the preview only has to
+        render rows.
+        """
+        if fold_unicode not in entry["preview"]:
+            progress = progress or Progress()
+            raw = entry["raw"]
+            progress.start("Preparing preview", len(raw))
+            entry["preview"][fold_unicode] = preview_diff(raw, entry["result"]["df"], entry["result"]["phones"],
+                                                          fold_unicode)
+            progress.finish(len(raw))
+        return entry["preview"][fold_unicode]
+
+    def discard(self, path):
+        path = os.path.abspath(path)
+        for key in [key for key in self.entries if key[0] == path]:
+            del self.entries[key]
+
+    def clear(self):
+        self.entries.clear()
+
+
+# Characters shown per cell in the preview
+PREVIEW_CELL_WIDTH = 20
+
+
+def _cell_strings(values):
+    """str() of every cell, as an object array"""
+    return np.fromiter(map(str, values), dtype=object, count=len(values))
+
+
+def preview_diff(before, after, phones=None, fold_unicode=False):
+    """What formatting changes, as boolean arrays over the rows of ``before``.
+
+    ``after`` is ``before`` after clean_spreadsheet_artifacts (a subset of
+    its rows, same index). Returns a dict with ``after_position`` (row of
+    ``after`` for each row of ``before``, -1 if dropped), ``removed``
+    (dropped as a spreadsheet artifact), ``phone`` (phone cell changed by
+    normalization) and ``transliterated`` (rows × after columns, cell
+    changed by transliteration).
+    """
+    n = len(before)
+    kept = before.index.get_indexer(after.index)
+    after_position = np.full(n, -1, dtype=np.int64)
+    after_position[kept] = np.arange(len(after))
+
+    phone_col = after.columns[0]
+    original = before[phone_col]
+    phone = np.zeros(n, dtype=bool)
+    if phones is not None and original.dtype.kind == 'f':
+        # str() of a float always has a '.', an exponent or 'nan'
+        phone[kept] = True
+    elif phones is not None and original.dtype.kind in 'iu':
+        # str() of an int matches only the 63 form, which has no leading zero
+        numbers, tags = phones[0], phones[1]
+        phone[kept] = ~((tags == TAG_63) & (original.to_numpy()[kept] == 63 * 10**10 + numbers))
+    else:
+        if phones is not None:
+            digits = unpack_phones(phones[0], phones[1])
+        else:
+            digits = _cell_strings(normalize_phone_series(after[phone_col]))
+        values = original.to_numpy(dtype=object)[kept]
+        differs = np.flatnonzero(values != digits)
+        if not pd.api.types.is_string_dtype(original.dtype) or original.dtype == 'object':
+            # Only cells that differ as objects can differ as text (639... vs '639...' does not)
+            differs = differs[_cell_strings(values[differs]) != digits[differs]]
+        phone[kept[differs]] = True
+
+    transliterated = np.zeros((n, len(after.columns)), dtype=bool)
+    for pos, col in enumerate(after.columns[1:], start=1):
+        if is_text_column(after[col]):
+            transliterated[kept[_transliterate(after[col], fold_unicode)[2]], pos] = True
+
+    return {
+        "after_position": after_position,
+        "removed": after_position < 0,
+        "phone": phone,
+        "transliterated": transliterated,
+    }
+
+
+class PreviewRows:
+    """Before/after preview lines, rendered on demand for a window of rows.
+
+    ``before`` is the frame as read and ``after`` the cleaned frame that
+    will be formatted (a subset of its rows, same index). Which rows are
+    removed or changed comes from preview_diff (pass ``diff`` if it was
+    already computed, e.g. by SessionCache.preview_diff); only the rows
+    asked for are rendered, so scrolling costs the same for 100 rows or 1M.
+    ``phones`` is the validate_frame packed triple for ``after``, if
+    available.
+    """
+
+    def __init__(self, before, after, phones=None, fold_unicode=False, diff=None):
+        self.before = before
+        self.after = after
+        self.phones = phones
+        self.fold_unicode = fold_unicode
+        self.diff = diff if diff is not None else preview_diff(before, after, phones, fold_unicode)
+        self.changed = ~self.diff["removed"] & (self.diff["phone"] | self.diff["transliterated"].any(axis=1))
+        self.show_changes_only(False)
+
+    def show_changes_only(self, enabled):
+        """Limit the rows shown to removed and changed ones"""
+        if enabled:
+            self.rows = np.flatnonzero(self.diff["removed"] | self.changed)
+        else:
+            self.rows = np.arange(len(self.before))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def header(self, after=False):
+        columns = self.after.columns if after else self.before.columns
+        return "Row | " + " | ".join(map(str, columns))
+
+    def position_of(self, row_num):
+        """Position of spreadsheet row ``row_num`` (header is row 1) among
+        the rows shown, or None"""
+        matches = np.flatnonzero(self.before.index == row_num - 2)
+        if not len(matches):
+            return None
+        position = int(np.searchsorted(self.rows, matches[0]))
+        return position if position < len(self.rows) and self.rows[position] == matches[0] else None
+
+    def _formatted(self, positions):
+        """The after frame rows at ``positions``, as they will be exported"""
+        df = self.after.iloc[positions].copy()
+        phone_col = df.columns[0]
+        if self.phones is not None:
+            numbers, tags, _ = self.phones
+            df[phone_col] = pd.Series(unpack_phones(numbers[positions], tags[positions]), index=df.index, dtype=object)
+        else:
+            df[phone_col] = normalize_phone_series(df[phone_col])
+        for col in df.columns:
+            if is_text_column(df[col]):
+                df[col] = transliterate_column(df[col], self.fold_unicode)[0]
+        return df
+
+    def window(self, start, stop):
+        """(before line, after line, status) for shown rows ``start:stop``;
+        status is 'removed', 'changed' or None. Removed rows have no after
+        line."""
+        rows = self.rows[start:stop]
+        positions = self.diff["after_position"][rows]
+        after_rows = self._formatted(positions[positions >= 0]).iterrows()
+
+        def line(idx, values):
+            return f"{idx+2:3d} | " + " | ".join([str(val)[:PREVIEW_CELL_WIDTH] for val in values])
+
+        lines = []
+        for (idx, before_row), row in zip(self.before.iloc[rows].iterrows(), rows):
+            before_line = line(idx, before_row.values)
+            if self.diff["removed"][row]:
+                lines.append((before_line, "", "removed"))
+                continue
+            after_line = line(idx, next(after_rows)[1].values)
+            lines.append((before_line, after_line, "changed" if self.changed[row] else None))
+        return lines
+
+
+# Rows per chunk in streaming mode
+DEFAULT_CHUNKSIZE = 100_000
+
+
+# Order in which failed checks are reported (same order as validate_frame)
+CHECK_ORDER = ["empty_phone", "phone_letters", "phone_format", "missing_fields", "duplicates"]
+
+
+class DuplicateSpill:
+    """Disk-backed duplicate finder for normalized phone keys.
+
+    (key, row, tag) triples are range-partitioned on the key into spill
+    files under a temporary directory, so finding duplicates only needs one
+    partition in memory at a time (~24 bytes per row / partitions) and the
+    duplicates come out sorted by number.
+    """
+
+    def __init__(self, partitions=64, spill_dir=None):
+        self.partitions = partitions
+        self.dir = tempfile.mkdtemp(prefix="sms_dups_", dir=spill_dir)
+        self.rows = 0
+
+    def _path(self, slot):
+        return os.path.join(self.dir, f"{slot:06d}.bin")
+
+    def add(self, keys, rows, tags):
+        """Append one chunk of keys with their row numbers and format tags"""
+        keys = np.asarray(keys, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+        tags = np.asarray(tags, dtype=np.int64)
+        if len(keys) == 0:
+            return
+        # Slots are monotonic in the key, so slot order is key order. Each
+        # billion of key space (the 9 digits after the leading 9 of a mobile
+        # number) is split into ``partitions`` slots.
+        slot = keys * self.partitions // 10**9
+        order = np.argsort(slot, kind='stable')
+        slot = slot[order]
+        triples = np.column_stack([keys, rows, tags])[order]
+        starts = np.flatnonzero(np.r_[True, slot[1:] != slot[:-1]])
+        ends = np.r_[starts[1:], len(slot)]
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            with open(self._path(int(slot[start])), "ab") as f:
+                triples[start:end].tofile(f)
+        self.rows += len(keys)
+
+    def duplicates(self):
+        """Yield (key, rows, tags) for every key added more than once, sorted
+        by key, with rows in ascending order"""
+        for name in sorted(os.listdir(self.dir)):
+            triples = np.fromfile(os.path.join(self.dir, name), dtype=np.int64).reshape(-1, 3)
+            triples = triples[np.lexsort((triples[:, 1], triples[:, 0]))]
+            keys = triples[:, 0]
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            ends = np.r_[starts[1:], len(keys)]
+            for start, end in zip(starts[ends - starts > 1].tolist(), ends[ends - starts > 1].tolist()):
+                yield int(keys[start]), triples[start:end, 1], triples[start:end, 2]
+
+    def close(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def _record(failures, check, positions, describe, limit):
+    """Count offending rows and keep the first ``limit`` detail lines"""
+    failure = failures[check]
+    failure["count"] += len(positions)
+    room = limit - len(failure["rows"])
+    if room > 0:
+        failure["rows"].extend(describe(i) for i in positions[:room])
+
+
+def stream_file(input_path, output_path, chunksize=DEFAULT_CHUNKSIZE, log=print,
+                fold_unicode=False, detail_limit=DETAIL_LIMIT, duplicates_report=None, spill_dir=None,
+                history=None, max_sends=None, window_days=DEFAULT_WINDOW_DAYS, campaign=None, staged=None,
+                progress=None, parquet=False, sheet=None, compression=None):
+    """Validate and format a contact list chunk by chunk with bounded memory.
+
+    Every chunk goes through the same cleaning, checks and formatting as
+    validate_frame/format_frame and is appended to ``output_path + '.part'``,
+    which is renamed to ``output_path`` only if the whole file passes.
+    Normalized numbers are spilled to disk (DuplicateSpill, under
+    ``spill_dir``) for the duplicate check, so memory holds one chunk plus
+    at most ``detail_limit`` offending rows per check. Every duplicated
+    number with all of its rows can be written to ``duplicates_report``
+    (CSV). With a CampaignHistory, numbers over ``max_sends`` are skipped
+    and the sent numbers are recorded as ``campaign`` once the file passes,
+    or, if a ``staged`` list is given, their history segments are appended
+    to it for the caller to commit. ``progress`` gets one update per
+    chunk; the per-chunk steps add up in ``progress.timings``. With
+    ``parquet`` the formatted rows are also written to parquet_path()
+    (ParquetSidecar), committed and discarded with the CSV. ``sheet``
+    picks the worksheet of a workbook input and ``compression`` compresses
+    the output as it is written (see open_output). Returns (exit_code, stats).
+    """
+    progress = progress or Progress()
+    timings = progress.timings or Timings()
+    chunk_progress = Progress(timings=timings)
+    headers = read_contact_headers(input_path, sheet)
+    if len(headers) == 0:
+        raise ValueError("CSV file is empty")
+    phone_col = headers[0]
+    name_col = detect_column(headers, phone_col, r"\b(name|full\s*name|contact|recipient)\b")
+
+    failures = {check: {"count": 0, "rows": []} for check in CHECK_ORDER}
+    duplicates = {}
+    names = {}
+    stats = {
+        "rows": 0, "written": 0,
+        "artifacts": {"dropped": 0, "reasons": {"formula": 0, "error": 0, "empty": 0}, "blank_rows": 0},
+        "formatted": 0, "decimal_formats": 0, "total_replacements": 0,
+        "column_replacements": {}, "replacement_stats": {}, "capped": 0,
+    }
+    quiet = lambda message: None
+    segments = []
+    wrote_header = False
+
+    part_path = output_path + ".part"
+    sidecar = ParquetSidecar(parquet_path(output_path)) if parquet else None
+    output = open_output(part_path, compression)
+    spill = DuplicateSpill(spill_dir=spill_dir)
+    chunks = read_contact_chunks(input_path, chunksize, sheet=sheet)
+    try:
+        # The row count costs one extra read of the file, so only when someone is watching
+        progress.start("Processing chunks", count_data_rows(input_path, sheet) if progress.report else None)
+        for chunk in timings.timed("Reading chunks", chunks):
+            stats["rows"] += len(chunk)
+            progress.advance(len(chunk))
+            with timings.stage("Cleaning artifacts", len(chunk)):
+                df, artifact_stats = clean_spreadsheet_artifacts(chunk)
+            stats["artifacts"]["dropped"] += artifact_stats["dropped"]
+            stats["artifacts"]["blank_rows"] += artifact_stats["blank_rows"]
+            for reason, count in artifact_stats["reasons"].items():
+                stats["artifacts"]["reasons"][reason] += count
+            if df.empty:
+                continue
+
+            phones = df[phone_col]
+            display = (df[name_col] if name_col else pd.Series("N/A", index=df.index)).tolist()
+            row_nums = (df.index.to_numpy() + 2).tolist()
+            raw = phones.tolist()
+
+            with timings.stage("Check: empty phones", len(df)):
+                empty = np.nonzero(empty_phone_mask(phones))[0]
+            _record(failures, "empty_phone", empty,
+                    lambda i: f"  • Row {row_nums[i]}: {display[i]}", detail_limit)
+
+            with timings.stage("Check: phone letters", len(df)):
+                letters = np.nonzero(phone_letters_mask(phones))[0]
+            _record(failures, "phone_letters", letters,
+                    lambda i: f"  • Row {row_nums[i]}: {raw[i]} (Name: {display[i]})", detail_limit)
+
+            with timings.stage("Normalizing phones", len(df)):
+                digits, whole_decimals = normalize_phones(phones)
+            digit_list = digits.tolist()
+            with timings.stage("Check: phone format", len(df)):
+                valid = valid_phone_mask(digits)
+            _record(failures, "phone_format", np.nonzero(~valid)[0],
+                    lambda i: (f"  • Row {row_nums[i]}: {raw[i]} → {digit_list[i]} "
+                               f"({invalid_phone_reason(digit_list[i])}) (Name: {display[i]})"),
+                    detail_limit)
+
+            with timings.stage("Check: missing fields", len(df)):
+                missing = find_missing_fields(df, phone_col)
+            _record(failures, "missing_fields", missing,
+                    lambda entry: f"  • Row {entry[0] + 2}: missing {', '.join(entry[1])}", detail_limit)
+
+            if any(failure["count"] for failure in failures.values()):
+                continue
+
+            # Still clean: spill the numbers for the cross-chunk duplicate check
+            with timings.stage("Packing phones", len(df)):
+                numbers, tags = pack_phones(digits.to_numpy())
+                spill.add(numbers, np.asarray(row_nums, dtype=np.int64), tags)
+
+            # Still clean: format and stream this chunk to disk
+            df, format_stats = format_frame(df, quiet, fold_unicode, (numbers, tags, whole_decimals),
+                                            progress=chunk_progress)
+            if history is not None:
+                if max_sends:
+                    df, skipped = apply_frequency_cap(df, history, max_sends, window_days, quiet)
+                    stats["capped"] += skipped
+                segments.append(history.stage(pack_phones(df.iloc[:, 0])[0]))
+            with timings.stage("Writing output", len(df)):
+                df.to_csv(output, index=False, header=not wrote_header)
+            if sidecar is not None:
+                with timings.stage("Writing Parquet", len(df)):
+                    sidecar.write(df)
+            wrote_header = True
+            stats["written"] += len(df)
+            stats["formatted"] += format_stats["formatted"]
+            stats["decimal_formats"] += format_stats["decimal_formats"]
+            stats["total_replacements"] += format_stats["total_replacements"]
+            for col, count in format_stats["column_replacements"].items():
+                stats["column_replacements"][col] = stats["column_replacements"].get(col, 0) + count
+            for char, info in format_stats["replacement_stats"].items():
+                entry = stats["replacement_stats"].setdefault(char, {'replacement': info['replacement'], 'count': 0})
+                entry['count'] += info['count']
+        progress.finish(stats["rows"])
+        if not wrote_header:
+            pd.DataFrame(columns=headers).to_csv(output, index=False)
+        if not any(failure["count"] for failure in failures.values()):
+            progress.start("Checking duplicates", spill.rows)
+            _collect_duplicates(spill, failures["duplicates"], duplicates, detail_limit, duplicates_report)
+            progress.finish(spill.rows)
+    except Exception:
+        if history is not None:
+            history.discard(segments)
+        if sidecar is not None:
+            sidecar.discard()
+        output.close()
+        os.remove(part_path)
+        raise
+    finally:
+        chunks.close()
+        output.close()
+        spill.close()
+
+    log_artifact_stats(stats["artifacts"], log)
+    log(f"✓ Loaded {stats['rows']} rows")
+    log(f"✓ Found {len(headers)} columns: {', '.join(headers)}\n")
+    log(f"{'─'*60}")
+    log(f"VALIDATION CHECKS")
+    log(f"{'─'*60}\n")
+
+    failed = next((check for check in CHECK_ORDER if failures[check]["count"]), None)
+    if failed is not None:
+        os.remove(part_path)
+        if sidecar is not None:
+            sidecar.discard()
+        if history is not None:
+            history.discard(segments)
+        failure = failures[failed]
+        if failed == "duplicates":
+            _fill_names(input_path, name_col, duplicates, names, chunksize, sheet)
+            log(f"VALIDATION FAILED: Found duplicate phone numbers\n")
+            log("Duplicate phone numbers found:")
+            for key in sorted(duplicates):
+                entry = duplicates[key]
+                log(f"\n  {entry['spellings'][0]} appears {entry['count']} times:")
+                row_names = [names.get(row_num, 'N/A') for row_num in entry["rows"]]
+                for line in _duplicate_row_lines(entry["rows"], row_names, entry["spellings"]):
+                    log(line)
+                _log_more(log, entry["count"] - len(entry["rows"]))
+            if failure["numbers"] > detail_limit:
+                log("")
+            _log_more(log, failure["numbers"] - detail_limit, "duplicated number(s)")
+            log(f"\nUnique numbers duplicated: {failure['numbers']}")
+            log(f"Total rows affected: {failure['count']}")
+            if duplicates_report:
+                log(f"Full list written to: {duplicates_report}")
+        else:
+            labels = {
+                "empty_phone": "empty phone number(s)",
+                "phone_letters": "phone number(s) containing letters",
+                "phone_format": "phone number(s) not matching required format",
+                "missing_fields": "row(s) with missing field(s)",
+            }
+            log(f"VALIDATION FAILED: Found {failure['count']} {labels[failed]}\n")
+            for line in failure["rows"]:
+                log(line)
+            _log_more(log, failure["count"] - len(failure["rows"]))
+        return CHECK_EXIT_CODES[failed], stats
+
+    os.replace(part_path, output_path)
+    if sidecar is not None:
+        sidecar.commit(headers)
+    if history is not None and staged is not None:
+        staged.extend(segments)
+    elif history is not None:
+        history.commit(segments, campaign or file_stem(output_path))
+    log("✓ All validation checks passed")
+    log(f"✓ Formatted {stats['formatted']} phone numbers")
+    if stats["decimal_formats"] > 0:
+        log(f"  • {stats['decimal_formats']} decimal format numbers (.0 suffix removed)")
+    if stats["total_replacements"] > 0:
+        for col, count in stats["column_replacements"].items():
+            log(f"  • {col}: {count} characters replaced")
+        log(f"✓ Special characters replaced: {stats['total_replacements']} total")
+    else:
+        log("✓ No special characters found to replace")
+    if stats["capped"]:
+        log(f"✓ Skipped {stats['capped']} number(s) already texted {max_sends} time(s) "
+            f"in the last {window_days} day(s)")
+    return EXIT_OK, stats
+
+
+def _collect_duplicates(spill, failure, duplicates, detail_limit, report_path=None):
+    """Count every duplicated number in the spill, keep the first
+    ``detail_limit`` numbers (and rows) for the log and optionally write all
+    of them to a CSV report"""
+    failure["numbers"] = 0
+    report = open(report_path, "w", encoding="utf-8", newline="") if report_path else None
+    try:
+        if report:
+            report.write("Phone,Count,Rows\n")
+        for key, rows, tags in spill.duplicates():
+            failure["numbers"] += 1
+            failure["count"] += len(rows)
+            if len(duplicates) < detail_limit:
+                duplicates[key] = {
+                    "count": len(rows),
+                    "rows": rows[:detail_limit].tolist(),
+                    "spellings": unpack_phones(np.full(min(len(rows), detail_limit), key), tags[:detail_limit]).tolist(),
+                }
+            if report:
+                first = unpack_phones([key], tags[:1])[0]
+                report.write(f"{first},{len(rows)},{' '.join(map(str, rows.tolist()))}\n")
+    finally:
+        if report:
+            report.close()
+
+
+def _fill_names(input_path, name_col, duplicates, names, chunksize, sheet=None):
+    """Second pass over the name column for the duplicate rows being listed"""
+    wanted = {row for entry in duplicates.values() for row in entry["rows"]} - set(names)
+    if not wanted:
+        return
+    if not name_col:
+        names.update({row: "N/A" for row in wanted})
+        return
+    chunks = read_contact_chunks(input_path, chunksize, columns=[name_col], sheet=sheet)
+    try:
+        for chunk in chunks:
+            row_nums = chunk.index.to_numpy() + 2
+            hit = np.isin(row_nums, list(wanted))
+            for row_num, name in zip(row_nums[hit], chunk[name_col].to_numpy()[hit]):
+                names[int(row_num)] = name
+    finally:
+        chunks.close()
+
+
+def resolve_output_path(output_dir, custom_name, compression=None):
+    """Build a non-clobbering output path from a user supplied filename
+    (``.csv``, plus ``.gz``/``.zst`` for compressed output)"""
+    custom_name = (custom_name or "").strip() or DEFAULT_FILENAME
+
+    # Remove any file extension if user added one, including the whole of
+    # .csv.gz / .csv.zst
+    known = (".csv",) + tuple(COMPRESSION_SUFFIXES.values())
+    stem = custom_name
+    while stem.lower().endswith(known):
+        stem = stem[:-len(next(suffix for suffix in known if stem.lower().endswith(suffix)))]
+    custom_name = (stem or DEFAULT_FILENAME) if stem != custom_name else os.path.splitext(custom_name)[0]
+
+    # Remove any invalid filename characters
+    custom_name = re.sub(r'[<>:"/\\|?*]', '_', custom_name)
+
+    extension = ".csv" + COMPRESSION_SUFFIXES.get(compression, "")
+    output_path = os.path.join(output_dir, f"{custom_name}{extension}")
+
+    # Check if file exists and add number suffix if needed
+    counter = 1
+    while os.path.exists(output_path):
+        output_path = os.path.join(output_dir, f"{custom_name}_{counter}{extension}")
+        counter += 1
+    return output_path
+
+
+def run(input_path, output_dir, name=DEFAULT_FILENAME, output_path=None, log=print, fold_unicode=False,
+        chunksize=None, duplicates_report=None, history=None, max_sends=None,
+        window_days=DEFAULT_WINDOW_DAYS, campaign=None, progress=None, parquet=False, sheet=None,
+        compression=None):
+    """Validate and format one file. Returns (exit_code, output_path).
+
+    With ``chunksize`` the file is streamed through stream_file instead of
+    being loaded whole. With a CampaignHistory the sent numbers are recorded
+    as ``campaign`` (default: output filename) and, if ``max_sends`` is set,
+    numbers already sent that often within ``window_days`` are left out.
+    Each stage reports to ``progress`` (a Progress). With ``parquet`` the
+    formatted rows are also written as Parquet (see parquet_path). ``sheet``
+    names the worksheet to read from a workbook (default: the first) and
+    ``compression`` ("gzip" or "zstd") compresses the output.
+    """
+    exit_code, output_path, _ = _run(input_path, output_dir, name, output_path, log, fold_unicode,
+                                     chunksize, duplicates_report, history, max_sends, window_days, campaign,
+                                     progress=progress, parquet=parquet, sheet=sheet, compression=compression)
+    return exit_code, output_path
+
+
+def _run(input_path, output_dir, name=DEFAULT_FILENAME, output_path=None, log=print, fold_unicode=False,
+         chunksize=None, duplicates_report=None, history=None, max_sends=None,
+         window_days=DEFAULT_WINDOW_DAYS, campaign=None, staged=None, progress=None, parquet=False,
+         sheet=None, compression=None):
+    """run(), also returning the number of recipients written. With a
+    ``staged`` list the history segments are left for the caller to commit."""
+    progress = progress or Progress()
+    log(f"{'='*60}")
+    log(f"FILE VALIDATION")
+    log(f"{'='*60}")
+    log(f"File: {os.path.basename(input_path)}" + (f" (sheet: {sheet})" if sheet else "") + "\n")
+
+    if chunksize:
+        if output_path is None:
+            output_path = resolve_output_path(output_dir, name, compression)
+        exit_code, stats = stream_file(input_path, output_path, chunksize, log, fold_unicode,
+                                       duplicates_report=duplicates_report, history=history,
+                                       max_sends=max_sends, window_days=window_days, campaign=campaign,
+                                       staged=staged, progress=progress, parquet=parquet, sheet=sheet,
+                                       compression=compression)
+        if exit_code != EXIT_OK:
+            return exit_code, None, 0
+        log("\n✓ File exported successfully\n")
+        log(f"  • Filename: {os.path.basename(output_path)}")
+        log(f"  • Location: {os.path.dirname(os.path.abspath(output_path))}")
+        log(f"  • Total recipients ready: {stats['written']}")
+        if parquet:
+            log(f"  • Parquet copy: {os.path.basename(parquet_path(output_path))}")
+        return EXIT_OK, output_path, stats['written']
+
+    progress.start("Reading file")
+    df_raw = read_contacts(input_path, sheet)
+    progress.finish(len(df_raw))
+    progress.start("Validating", len(df_raw))
+    result = validate_frame(df_raw, log, timings=progress.timings)
+    progress.finish(len(df_raw))
+    if progress.timings is not None:
+        progress.timings.track_frame("raw", df_raw)
+        progress.timings.track_frame("cleaned", result["df"])
+    del df_raw
+    if not result["passed"]:
+        return CHECK_EXIT_CODES[result["check"]], None, 0
+
+    log(f"{'='*60}")
+    log(f"FORMATTING FILE")
+    log(f"{'='*60}\n")
+    df, stats = format_frame(result["df"], log, fold_unicode, result["phones"], progress=progress)
+    if history is not None and max_sends:
+        df, _ = apply_frequency_cap(df, history, max_sends, window_days, log)
+
+    if output_path is None:
+        output_path = resolve_output_path(output_dir, name, compression)
+    if progress.timings is not None:
+        progress.timings.track_frame("formatted", df)
+    write_csv(df, output_path, progress, compression)
+    if parquet:
+        write_parquet(df, parquet_path(output_path), progress)
+    if history is not None and staged is not None:
+        staged.append(history.stage(pack_phones(df.iloc[:, 0])[0]))
+    elif history is not None:
+        history.record(pack_phones(df.iloc[:, 0])[0], campaign or file_stem(output_path))
+
+    log("✓ File exported successfully\n")
+    log(f"  • Filename: {os.path.basename(output_path)}")
+    log(f"  • Location: {os.path.dirname(os.path.abspath(output_path))}")
+    log(f"  • Total recipients ready: {len(df)}")
+    if parquet:
+        log(f"  • Parquet copy: {os.path.basename(parquet_path(output_path))}")
+    return EXIT_OK, output_path, len(df)
+
+
+def expand_inputs(paths):
+    """Files to process: files as given, folders replaced by the contact
+    lists (is_contact_list) directly inside them (sorted)"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(
+                os.path.join(path, entry) for entry in os.listdir(path)
+                if os.path.isfile(os.path.join(path, entry)) and is_contact_list(os.path.join(path, entry))
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def batch_output_paths(input_paths, output_dir, name=DEFAULT_FILENAME, compression=None):
+    """One non-clobbering output path per input, ``<name>_<input stem>.csv``"""
+    outputs = []
+    for input_path in input_paths:
+        stem = f"{name}_{file_stem(input_path)}"
+        output_path = resolve_output_path(output_dir, stem, compression)
+        counter = 1
+        # Inputs with the same filename from different folders
+        while output_path in outputs:
+            output_path = resolve_output_path(output_dir, f"{stem}_{counter}", compression)
+            counter += 1
+        outputs.append(output_path)
+    return outputs
+
+
+def _batch_task(task):
+    """Validate and format one file of a batch (runs in a worker process)"""
+    input_path, output_path, options = task
+    lines = []
+    staged = []
+    history = CampaignHistory(options["history_dir"]) if options["history_dir"] else None
+    timings = Timings(memory=options["memory"])
+    timings.start()
+    started = time.perf_counter()
+    try:
+        exit_code, _, written = _run(
+            input_path, None, output_path=output_path, log=lines.append,
+            fold_unicode=options["fold_unicode"], chunksize=options["chunksize"], history=history,
+            max_sends=options["max_sends"], window_days=options["window_days"], staged=staged,
+            progress=Progress(timings=timings), parquet=options["parquet"],
+            sheet=options["sheet"] if input_format(input_path) == "excel" else None,
+            compression=options["compression"],
+        )
+    except Exception as e:
+        exit_code, written = EXIT_ERROR, 0
+        lines.append(f"Error: {str(e)}")
+        if history is not None:
+            history.discard(staged)
+            staged = []
+    timings.stop()
+    return {
+        "input": input_path,
+        "output": output_path if exit_code == EXIT_OK else None,
+        "exit_code": exit_code,
+        "written": written,
+        "seconds": time.perf_counter() - started,
+        "log": lines,
+        "staged": staged,
+        "timings": timings.records(),
+    }
+
+
+def run_batch(input_paths, output_dir, name=DEFAULT_FILENAME, log=print, fold_unicode=False,
+              chunksize=None, history=None, max_sends=None, window_days=DEFAULT_WINDOW_DAYS,
+              campaign=None, jobs=None, progress=None, parquet=False, sheet=None, compression=None):
+    """Validate and format several files in parallel, one worker process
+    per core (or ``jobs``).
+
+    Every file gets its own output (see batch_output_paths) and its report
+    is logged in one piece when it finishes. Numbers sent in the files that
+    pass are recorded as ``campaign``, or one campaign per output file if
+    not given. ``progress`` counts finished files; the workers' stage
+    timings (and memory, if ``progress.timings`` tracks it) are summed into
+    ``progress.timings``. ``parquet`` adds a Parquet copy of every output;
+    ``sheet`` is read from every workbook (default: each one's first) and
+    ``compression`` applies to every output.
+    Returns one result dict
+    per input, in input order (see batch_summary).
+    """
+    progress = progress or Progress()
+    if not input_paths:
+        return []
+    outputs = batch_output_paths(input_paths, output_dir, name, compression)
+    options = {
+        "history_dir": history.path if history is not None else None,
+        "fold_unicode": fold_unicode, "chunksize": chunksize,
+        "max_sends": max_sends, "window_days": window_days,
+        "memory": progress.timings is not None and progress.timings.memory,
+        "parquet": parquet, "sheet": sheet, "compression": compression,
+    }
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(input_paths)))
+    log(f"{'='*60}")
+    log(f"BATCH: {len(input_paths)} file(s), {jobs} worker process(es)")
+    log(f"{'='*60}")
+
+    results = [None] * len(input_paths)
+    progress.start("Processing files", len(input_paths), unit="files")
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(_batch_task, (input_path, output_path, options)): position
+            for position, (input_path, output_path) in enumerate(zip(input_paths, outputs))
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            position = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # The worker process itself died
+                result = {"input": input_paths[position], "output": None, "exit_code": EXIT_ERROR,
+                          "written": 0, "seconds": 0.0, "log": [f"Error: {str(e)}"], "staged": []}
+            results[position] = result
+            if progress.timings is not None:
+                progress.timings.merge(result.get("timings", []))
+            log(f"\n[{done}/{len(input_paths)}] {os.path.basename(result['input'])}")
+            for line in result["log"]:
+                log(line)
+            progress.advance(1)
+    progress.finish()
+
+    # Workers only stage their segments; the index is written here, once
+    if history is not None:
+        passed = [result for result in results if result["exit_code"] == EXIT_OK]
+        if campaign:
+            history.commit([segment for result in passed for segment in result["staged"]], campaign)
+        else:
+            for result in passed:
+                history.commit(result["staged"], file_stem(result["output"]))
+
+    log("")
+    for line in batch_summary(results):
+        log(line)
+    return results
+
+
+# Status column of the batch summary per exit code
+EXIT_STATUS = {EXIT_OK: "✓ formatted", EXIT_ERROR: "✗ error"}
+EXIT_STATUS.update({code: f"✗ {check.replace('_', ' ')}" for check, code in CHECK_EXIT_CODES.items()})
+
+
+def batch_summary(results):
+    """Per-file summary table (lines) for run_batch results"""
+    width = max([len("File")] + [len(os.path.basename(result["input"])) for result in results])
+    lines = [
+        f"{'='*60}",
+        "BATCH SUMMARY",
+        f"{'='*60}",
+        f"{'File':<{width}}  {'Status':<20}{'Recipients':>11}{'Time':>9}",
+        "─" * (width + 42),
+    ]
+    for result in results:
+        status = EXIT_STATUS.get(result["exit_code"], f"✗ exit {result['exit_code']}")
+        recipients = f"{result['written']:,}" if result["exit_code"] == EXIT_OK else "-"
+        lines.append(f"{os.path.basename(result['input']):<{width}}  {status:<20}"
+                     f"{recipients:>11}{result['seconds']:>8.1f}s")
+    passed = [result for result in results if result["exit_code"] == EXIT_OK]
+    lines.append("─" * (width + 42))
+    lines.append(f"{len(passed)} of {len(results)} file(s) formatted, "
+                 f"{sum(result['written'] for result in passed):,} recipients ready")
+    return lines
+
+
+def console_progress(log=print):
+    """Progress report callback for the command line: finished stages are
+    logged, the running stage is shown live on stderr if it is a terminal"""
+    live = sys.stderr.isatty()
+
+    def report(text, done):
+        if live:
+            sys.stderr.write("\r\033[K" + ("" if done else text))
+            sys.stderr.flush()
+        if done:
+            log(text)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m sms_pipeline",
+        description="Validate and format a Text Blast contact list without the GUI.",
+        epilog=(f"exit codes: {EXIT_OK}=ok, {EXIT_ERROR}=error, {EXIT_USAGE}=usage, "
+                f"{EXIT_EMPTY_PHONE}=empty phone, {EXIT_PHONE_LETTERS}=letters in phone, "
+                f"{EXIT_PHONE_FORMAT}=bad phone format, {EXIT_MISSING_FIELDS}=missing fields, "
+                f"{EXIT_DUPLICATES}=duplicates"),
+    )
+    parser.add_argument("input", nargs="+",
+                        help="CSV (or Parquet/Arrow/Excel) file to validate and format; several files or a "
+                             "folder run as a batch")
+    parser.add_argument("-o", "--output", help="exact output path (overwrites if it exists)")
+    parser.add_argument("--output-dir", default=os.getcwd(),
+                        help="directory for the output file (default: current directory)")
+    parser.add_argument("--name", default=DEFAULT_FILENAME,
+                        help=f"output filename without extension (default: {DEFAULT_FILENAME})")
+    parser.add_argument("--fold-unicode", action="store_true",
+                        help="also fold accented characters outside the built-in map to ASCII (NFKD)")
+    parser.add_argument("--chunksize", type=int, metavar="ROWS",
+                        help="stream the file in chunks of ROWS rows instead of loading it whole")
+    parser.add_argument("--duplicates-report", metavar="CSV",
+                        help="with --chunksize, write every duplicated number and all of its rows to CSV")
+    parser.add_argument("--compress", choices=sorted(COMPRESSION_SUFFIXES),
+                        help="compress the output CSV (gzip, or zstd with zstandard installed); compressed "
+                             "inputs are detected automatically")
+    parser.add_argument("--sheet", metavar="NAME",
+                        help="worksheet to read from .xlsx inputs (default: the first; needs openpyxl)")
+    parser.add_argument("--parquet", action="store_true",
+                        help="also write each output as Parquet next to the CSV (needs pyarrow)")
+    parser.add_argument("--history", nargs="?", const=DEFAULT_HISTORY_DIR, metavar="DIR",
+                        help=f"record sent numbers in a campaign history (default dir: {DEFAULT_HISTORY_DIR})")
+    parser.add_argument("--campaign", help="campaign name for the history (default: output filename)")
+    parser.add_argument("--max-sends", type=int, metavar="N",
+                        help="skip numbers already sent in N campaigns within --window-days (implies --history)")
+    parser.add_argument("--window-days", type=int, default=DEFAULT_WINDOW_DAYS, metavar="DAYS",
+                        help=f"look-back window for --max-sends (default: {DEFAULT_WINDOW_DAYS})")
+    parser.add_argument("-j", "--jobs", type=int, metavar="N",
+                        help="worker processes for a batch (default: one per CPU core)")
+    parser.add_argument("--timings", nargs="?", const=DEFAULT_TIMINGS_DIR, metavar="DIR",
+                        default=os.environ.get(TIMINGS_DIR_ENV),
+                        help=f"save the per-stage timing breakdown as JSON (default dir: {DEFAULT_TIMINGS_DIR}; "
+                             f"also enabled by {TIMINGS_DIR_ENV})")
+    parser.add_argument("--profile", action="store_true", default=profiling_requested(),
+                        help=f"capture a cProfile of the run into the timing report (or set {PROFILE_ENV}=1)")
+    parser.add_argument("--memory", action="store_true", default=memory_tracking_requested(),
+                        help="track peak/retained memory per stage with tracemalloc and RSS (slower; implies "
+                             f"--timings; or set {MEMORY_ENV}=1)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only report errors")
+    args = parser.parse_args(argv)
+    batch = len(args.input) > 1 or os.path.isdir(args.input[0])
+    if args.chunksize is not None and args.chunksize < 1:
+        parser.error("--chunksize must be a positive number of rows")
+    if args.duplicates_report and args.chunksize is None:
+        parser.error("--duplicates-report requires --chunksize")
+    if args.max_sends is not None and args.max_sends < 1:
+        parser.error("--max-sends must be at least 1")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if batch and (args.output or args.duplicates_report):
+        parser.error("--output and --duplicates-report take a single input file")
+    if args.parquet and not PYARROW_AVAILABLE:
+        parser.error("--parquet needs pyarrow (pip install pyarrow)")
+    if args.compress == "zstd" and not ZSTANDARD_AVAILABLE:
+        parser.error("--compress zstd needs zstandard (pip install zstandard)")
+
+    inputs = expand_inputs(args.input)
+    for path in inputs:
+        if not os.path.isfile(path):
+            print(f"Error: file not found: {path}", file=sys.stderr)
+            return EXIT_USAGE
+    if not inputs:
+        print(f"Error: no {'/'.join(INPUT_EXTENSIONS)} files found in: {', '.join(args.input)}", file=sys.stderr)
+        return EXIT_USAGE
+    if args.output is None and not os.path.isdir(args.output_dir):
+        print(f"Error: output directory not found: {args.output_dir}", file=sys.stderr)
+        return EXIT_USAGE
+
+    log = (lambda message: None) if args.quiet else print
+    timings = Timings(profile=args.profile, memory=args.memory)
+    timings_dir = args.timings or (DEFAULT_TIMINGS_DIR if args.memory else None)
+    progress = Progress(None if args.quiet else console_progress(log), timings=timings)
+    label = file_stem(os.path.normpath(args.input[0])) + ("_batch" if batch else "")
+    timings.start()
+    try:
+        history_dir = args.history or (DEFAULT_HISTORY_DIR if args.max_sends else None)
+        history = CampaignHistory(history_dir) if history_dir else None
+        if batch:
+            results = run_batch(inputs, args.output_dir, args.name, log, args.fold_unicode, args.chunksize,
+                                history, args.max_sends, args.window_days, args.campaign, args.jobs, progress,
+                                args.parquet, args.sheet, args.compress)
+            failed = [result for result in results if result["exit_code"] != EXIT_OK]
+            if args.quiet:
+                for result in failed:
+                    print(f"{result['input']}: failed ({result['exit_code']})", file=sys.stderr)
+            # The first failing file (in input order) decides the exit code
+            return failed[0]["exit_code"] if failed else EXIT_OK
+        exit_code, _ = run(inputs[0], args.output_dir, args.name, args.output, log, args.fold_unicode,
+                           args.chunksize, args.duplicates_report, history, args.max_sends,
+                           args.window_days, args.campaign, progress, args.parquet,
+                           args.sheet if input_format(inputs[0]) == "excel" else None, args.compress)
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return EXIT_ERROR
+    finally:
+        timings.stop()
+        timings.log_summary(log)
+        if timings_dir:
+            try:
+                log(f"✓ Timings saved to {save_timings(timings, timings_dir, label)}")
+            except OSError as e:
+                print(f"Warning: could not save timings: {e}", file=sys.stderr)
+    if exit_code != EXIT_OK and args.quiet:
+        print(f"Validation failed ({exit_code})", file=sys.stderr)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+CAMPAIGN HISTORY TEST SUITE
+===========================
+
+Checks the per-campaign send history (campaign_history.py) and the
+frequency cap applied by the headless pipeline.
+"""
+
+import datetime
+
+import numpy as np
+import pandas as pd
+
+import sms_pipeline
+from campaign_history import CampaignHistory
+
+
+def test_send_counts_respect_window(tmp_path):
+    history = CampaignHistory(str(tmp_path))
+    today = datetime.date(2024, 3, 10)
+    history.record([639123456789, 639234567890], "monday", today - datetime.timedelta(days=6))
+    history.record([639123456789], "old", today - datetime.timedelta(days=30))
+    history.record([639123456789, 9123456789], "today", today)
+
+    keys = np.array([639123456789, 639234567890, 9123456789, 639999999999])
+    assert history.send_counts(keys, 7, until=today).tolist() == [2, 1, 1, 0]
+    assert history.send_counts(keys, 60, until=today).tolist() == [3, 1, 1, 0]
+    assert history.send_counts(keys, 7, until=today - datetime.timedelta(days=1)).tolist() == [1, 1, 0, 0]
+
+
+def test_staged_segments_are_invisible_until_committed(tmp_path):
+    history = CampaignHistory(str(tmp_path))
+    staged = [history.stage([639123456789]), history.stage([639234567890])]
+    assert history.send_counts([639123456789]).tolist() == [0]
+    history.commit(staged, "chunked")
+    assert history.send_counts([639123456789, 639234567890]).tolist() == [1, 1]
+    assert [entry["campaign"] for entry in history.campaigns()] == ["chunked", "chunked"]
+
+
+def test_cli_frequency_cap_skips_recent_numbers(tmp_path):
+    history_dir = tmp_path / "history"
+    # History is keyed on the national number: 09123456789 was sent last week
+    CampaignHistory(str(history_dir)).record(sms_pipeline.pack_phones(["09123456789"])[0], "last_week")
+    source = tmp_path / "list.csv"
+    source.write_text("Phone,Name\n639123456789,John\n639234567890,Jane\n")
+
+    for extra in ([], ["--chunksize", "1"]):
+        output = tmp_path / "out.csv"
+        code = sms_pipeline.main([str(source), "-o", str(output), "--history", str(history_dir),
+                                  "--max-sends", "1", "-q"] + extra)
+        assert code == sms_pipeline.EXIT_OK
+        assert pd.read_csv(output, dtype=str)["Phone"].tolist() == ["639234567890"]
+        # The number that was just sent is now capped too
+        code = sms_pipeline.main([str(source), "-o", str(output), "--history", str(history_dir),
+                                  "--max-sends", "1", "-q"] + extra)
+        assert pd.read_csv(output, dtype=str)["Phone"].tolist() == []
+        history = CampaignHistory(str(history_dir))
+        history.prune(-1)
+        history.record([9123456789], "last_week")
+
+
+def test_failed_streaming_run_records_nothing(tmp_path):
+    history = CampaignHistory(str(tmp_path / "history"))
+    source = tmp_path / "dups.csv"
+    source.write_text("Phone,Name\n639123456789,A\n639234567890,B\n639123456789,C\n")
+    code, _ = sms_pipeline.stream_file(str(source), str(tmp_path / "out.csv"), chunksize=1,
+                                       log=lambda m: None, history=history)
+    assert code == sms_pipeline.EXIT_DUPLICATES
+    assert history.campaigns() == []
+    assert sorted(p.name for p in (tmp_path / "history").iterdir()) == []
+
+
+def test_batch_records_passing_files_as_one_campaign(tmp_path):
+    history_dir = tmp_path / "history"
+    folder = tmp_path / "lists"
+    folder.mkdir()
+    (folder / "north.csv").write_text("Phone,Name\n639123456789,A\n")
+    (folder / "south.csv").write_text("Phone,Name\n0923-456-7890,B\n")
+    (folder / "bad.csv").write_text("Phone,Name\n639345678901,C\n639345678901,D\n")
+    code = sms_pipeline.main([str(folder), "--output-dir", str(tmp_path), "--history", str(history_dir),
+                              "--campaign", "regional", "-j", "2", "-q"])
+    assert code == sms_pipeline.EXIT_DUPLICATES
+    history = CampaignHistory(str(history_dir))
+    assert [entry["campaign"] for entry in history.campaigns()] == ["regional", "regional"]
+    assert history.send_counts([9123456789, 9234567890, 9345678901]).tolist() == [1, 1, 0]
+    assert len(list(history_dir.iterdir())) == 3  # two segments + index
@@ -0,0 +1,645 @@
+#!/usr/bin/env python3
+"""
+HEADLESS PIPELINE TEST SUITE
+============================
+
+Runs the Tk-free validate/format pipeline (sms_pipeline.py) against the
+test_*.csv corpus and checks exit codes and output files.
+"""
+
+import gzip
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import benchmark_pipeline
+import generate_contacts
+import sms_pipeline
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def corpus(name):
+    return os.path.join(HERE, name)
+
+
+def test_cli_formats_valid_file(tmp_path):
+    """A clean list exits 0 and writes the formatted CSV"""
+    output = tmp_path / "out.csv"
+    code = sms_pipeline.main([corpus("test_01_basic_63_format.csv"), "-o", str(output), "-q"])
+    assert code == sms_pipeline.EXIT_OK
+    df = pd.read_csv(output, dtype=str)
+    assert len(df) == 5
+    assert df["Phone"].str.fullmatch(r"63\d{10}").all()
+
+
+def test_cli_exit_codes_per_check(tmp_path):
+    """Each failing check maps to its own exit code and writes nothing"""
+    cases = [
+        ("test_08_invalid_formats.csv", sms_pipeline.EXIT_PHONE_LETTERS),
+        ("test_09_duplicates.csv", sms_pipeline.EXIT_DUPLICATES),
+        ("test_17_leading_zeros_63.csv", sms_pipeline.EXIT_DUPLICATES),  # 0639... is 639...
+        ("test_16_negative_numbers.csv", sms_pipeline.EXIT_PHONE_FORMAT),
+    ]
+    for name, expected in cases:
+        output = tmp_path / f"{name}.out"
+        code = sms_pipeline.main([corpus(name), "-o", str(output), "-q"])
+        assert code == expected, name
+        assert not output.exists()
+
+
+def test_cli_missing_fields(tmp_path):
+    """Rows with a phone but an empty field fail the strict rule"""
+    source = tmp_path / "missing.csv"
+    source.write_text("Phone,Name,Date\n639123456789,John,2024-01-01\n639234567890,,2024-01-02\n")
+    code = sms_pipeline.main([str(source), "--output-dir", str(tmp_path), "-q"])
+    assert code == sms_pipeline.EXIT_MISSING_FIELDS
+
+
+def test_cli_usage_errors(tmp_path):
+    assert sms_pipeline.main([str(tmp_path / "nope.csv"), "-q"]) == sms_pipeline.EXIT_USAGE
+
+
+def test_cli_batch_folder(tmp_path):
+    """A folder runs as a parallel batch: every file is reported, the first failure sets the exit code"""
+    folder = tmp_path / "lists"
+    folder.mkdir()
+    for name in ("test_01_basic_63_format.csv", "test_09_duplicates.csv", "test_16_negative_numbers.csv"):
+        (folder / name).write_bytes(open(corpus(name), "rb").read())
+    out = tmp_path / "out"
+    out.mkdir()
+    lines = []
+    results = sms_pipeline.run_batch(sms_pipeline.expand_inputs([str(folder)]), str(out), log=lines.append, jobs=2)
+    assert [result["exit_code"] for result in results] == [
+        sms_pipeline.EXIT_OK, sms_pipeline.EXIT_DUPLICATES, sms_pipeline.EXIT_PHONE_FORMAT]
+    assert results[0]["written"] == 5
+    assert os.listdir(out) == ["sms_contacts_test_01_basic_63_format.csv"]
+    assert lines[-1] == "1 of 3 file(s) formatted, 5 recipients ready"
+    code = sms_pipeline.main([str(folder), "--output-dir", str(out), "-j", "2", "-q"])
+    assert code == sms_pipeline.EXIT_DUPLICATES
+
+
+def test_output_name_does_not_clobber(tmp_path):
+    (tmp_path / "list.csv").write_text("")
+    path = sms_pipeline.resolve_output_path(str(tmp_path), "list.csv")
+    assert os.path.basename(path) == "list_1.csv"
+    names = {("out.csv.gz", "gzip"): "out.csv.gz", ("out.CSV.ZST", "zstd"): "out.csv.zst",
+             ("out.csv.gz", None): "out.csv", ("report.v2.txt", None): "report.v2.csv", (".csv", None): "sms_contacts.csv"}
+    for (name, compression), expected in names.items():
+        path = sms_pipeline.resolve_output_path(str(tmp_path), name, compression)
+        assert os.path.basename(path) == expected, name
+
+
+def test_special_characters_replaced(tmp_path):
+    source = tmp_path / "names.csv"
+    source.write_text("Phone,Name\n639123456789,Ñoño Pérez\n639234567890,José\n", encoding="utf-8")
+    output = tmp_path / "out.csv"
+    assert sms_pipeline.main([str(source), "-o", str(output), "-q"]) == sms_pipeline.EXIT_OK
+    df = pd.read_csv(output, dtype=str)
+    assert df["Name"].tolist() == ["Nono Perez", "Jose"]
+
+
+PHONE_EDGE_CASES = [
+    "639123456789", "09123456789", "639123456789.0", "091234567890.5", "00639123456789.5",
+    "639123456789.999999999", "0.5", "-0.5", ".5", "5.", "-.0", "6.39123456789E+11",
+    "639.123.456.789", "0912-345.678 9", "(639) 123-456-789", "+639123456789", "1_000.5",
+    " 639123456789.0", "Ñ639", "٣٣", "1.0e400", "nan", "", "   ", None, float("nan"),
+    "0639123456789", "000639123456789", "-00639123456789", "06391234567890", "0091234567890",
+]
+
+
+def test_vectorized_phones_match_scalar_on_corpus():
+    """normalize_phone_series gives exactly what format_phone_number gives"""
+    import glob
+    for path in sorted(glob.glob(corpus("test_*.csv"))):
+        try:
+            frames = [pd.read_csv(path), pd.read_csv(path, dtype=str)]
+        except pd.errors.ParserError:
+            continue
+        for df in frames:
+            for col in df.columns:
+                expected = [sms_pipeline.format_phone_number(v) for v in df[col].tolist()]
+                assert sms_pipeline.normalize_phone_series(df[col]).tolist() == expected, (path, col)
+
+
+def test_vectorized_phones_match_scalar_on_edge_cases():
+    series = pd.Series(PHONE_EDGE_CASES, dtype=object)
+    digits, whole = sms_pipeline.normalize_phones(series)
+    assert digits.tolist() == [sms_pipeline.format_phone_number(v) for v in PHONE_EDGE_CASES]
+    assert digits.tolist()[-5:] == ["639123456789"] * 3 + ["06391234567890", "0091234567890"]
+    assert whole.tolist() == [not pd.isna(v) and sms_pipeline.is_whole_decimal(v) for v in PHONE_EDGE_CASES]
+
+    numbers = pd.Series([639123456789.0, 91234567890.5, -0.0, 1e16, 1.5e-05, float("inf"), float("nan")])
+    assert sms_pipeline.normalize_phone_series(numbers).tolist() == [
+        sms_pipeline.format_phone_number(v) for v in numbers.tolist()
+    ]
+    integers = pd.Series([639123456789, -9123456789, 0])
+    assert sms_pipeline.normalize_phone_series(integers).tolist() == ["639123456789", "9123456789", "0"]
+
+
+def test_artifact_cleaner_breakdown():
+    df = pd.DataFrame({
+        "Phone": ["639123456789", "=A1", " #N/A ", "0", None, "639234567890"],
+        "Name": ["John", "Formula", "Error", "", None, "=B2"],
+    })
+    cleaned, stats = sms_pipeline.clean_spreadsheet_artifacts(df)
+    assert cleaned.index.tolist() == [0, 5]
+    assert stats["dropped"] == 4
+    assert stats["reasons"] == {"formula": 1, "error": 1, "empty": 2}
+    assert stats["blank_rows"] == 2
+
+
+def test_artifact_cleaner_numeric_phone_column():
+    df = pd.DataFrame({"Phone": [639123456789.0, 0.0, -0.0, float("nan")], "Name": ["a", "b", "c", "d"]})
+    cleaned, stats = sms_pipeline.clean_spreadsheet_artifacts(df)
+    # str(-0.0) is '-0.0', which is not one of the empty-like tokens
+    assert cleaned.index.tolist() == [0, 2]
+    assert stats["reasons"]["empty"] == 2
+
+
+def test_transliterate_column_counts_and_values():
+    series = pd.Series(["Ñoño Pérez", "Plain", None, "José"], dtype=object)
+    result, counts = sms_pipeline.transliterate_column(series)
+    assert result.tolist()[:2] == ["Nono Perez", "Plain"] and result.tolist()[3] == "Jose"
+    assert pd.isna(result.iloc[2])
+    assert counts == {
+        'Ñ': {'replacement': 'N', 'count': 1},
+        'é': {'replacement': 'e', 'count': 2},
+        'ñ': {'replacement': 'n', 'count': 1},
+    }
+    assert sms_pipeline.replace_special_chars("Ñoño Pérez") == "Nono Perez"
+    assert sms_pipeline.special_characters(series) == {'Ñ', 'ñ', 'é'}
+
+
+def test_detect_column_type_matches_float_parsing():
+    values = ["639171234567", " 12 ", "1_000", "-1.5e-3", ".5", "inf", "nan", "٣"]
+    assert sms_pipeline.detect_column_type(pd.Series(values + ["N/A"], dtype=str)) == "numeric"
+    assert sms_pipeline.detect_column_type(pd.Series(["2024-01-01", "+63 917", "1_", "1.2.3", "12"])) == "text"
+    assert sms_pipeline.detect_column_type(pd.Series([True, False])) == "text"
+    assert sms_pipeline.detect_column_type(pd.Series([1.5, None])) == "numeric"
+    assert sms_pipeline.detect_column_type(pd.Series([None], dtype=object)) == "empty"
+
+
+def test_transliterate_nfkd_fallback_is_opt_in():
+    series = pd.Series(["Çağlar Dvořák", "Straße"], dtype=object)
+    assert sms_pipeline.transliterate_column(series)[0].tolist() == ["Cağlar Dvořak", "Straße"]
+    folded, counts = sms_pipeline.transliterate_column(series, fold_unicode=True)
+    # Characters without an ASCII decomposition are left alone
+    assert folded.tolist() == ["Caglar Dvorak", "Straße"]
+    assert counts['ğ'] == {'replacement': 'g', 'count': 1}
+    assert sms_pipeline.replace_special_chars("Dvořák", fold_unicode=True) == "Dvorak"
+
+
+# Corpus files whose rows have more fields than their header
+RAGGED_FILES = ("test_06_google_sheets_formulas.csv", "test_24_phone_with_commas.csv")
+
+
+def test_streaming_matches_whole_file(tmp_path):
+    """Chunked mode reaches the same verdict and writes the same CSV"""
+    import glob
+    for path in sorted(glob.glob(corpus("test_*.csv"))):
+        whole, streamed = tmp_path / "whole.csv", tmp_path / "streamed.csv"
+        if path.endswith(RAGGED_FILES):
+            # Malformed CSVs are rejected in both modes, leaving nothing behind
+            for chunksize in (None, 1, 3):
+                with pytest.raises(ValueError, match="fields"):
+                    sms_pipeline.run(path, str(tmp_path), output_path=str(streamed), log=lambda m: None,
+                                     chunksize=chunksize)
+                assert not streamed.exists() and not (tmp_path / "streamed.csv.part").exists(), path
+            continue
+        expected, _ = sms_pipeline.run(path, str(tmp_path), output_path=str(whole), log=lambda m: None)
+        for chunksize in (1, 3):
+            code, _ = sms_pipeline.run(path, str(tmp_path), output_path=str(streamed), log=lambda m: None,
+                                       chunksize=chunksize)
+            assert code == expected, (path, chunksize)
+            if code == sms_pipeline.EXIT_OK:
+                assert streamed.read_bytes() == whole.read_bytes(), path
+            else:
+                assert not streamed.exists() and not (tmp_path / "streamed.csv.part").exists()
+            if streamed.exists():
+                streamed.unlink()
+        if whole.exists():
+            whole.unlink()
+
+
+def test_streaming_finds_duplicates_across_chunks(tmp_path):
+    source = tmp_path / "dups.csv"
+    source.write_text("Phone,Name\n639123456789,First\n639234567890,Other\n"
+                      "639345678901,Third\n639123456789,Again\n")
+    lines = []
+    code, stats = sms_pipeline.stream_file(str(source), str(tmp_path / "out.csv"), chunksize=2, log=lines.append)
+    assert code == sms_pipeline.EXIT_DUPLICATES
+    assert "    • Row 2: First" in lines and "    • Row 5: Again" in lines
+    assert not (tmp_path / "out.csv").exists()
+
+
+def test_duplicate_spill_reports_sorted_groups(tmp_path):
+    spill = sms_pipeline.DuplicateSpill(partitions=4, spill_dir=str(tmp_path))
+    numbers, tags = sms_pipeline.pack_phones(["639123456789", "09123456789", "639999999999", "09123456789"])
+    spill.add(numbers[:2], [2, 3], tags[:2])
+    spill.add(numbers[2:], [4, 5], tags[2:])
+    spill.add(*sms_pipeline.pack_phones(["639999999999"])[:1], [6], [sms_pipeline.TAG_63])
+    found = [(key, rows.tolist(), sms_pipeline.unpack_phones(np.full(len(rows), key), tags).tolist())
+             for key, rows, tags in spill.duplicates()]
+    assert found == [(9123456789, [2, 3, 5], ["639123456789", "09123456789", "09123456789"]),
+                     (9999999999, [4, 6], ["639999999999", "639999999999"])]
+    spill.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_duplicates_match_across_63_and_09_forms(tmp_path):
+    source = tmp_path / "in.csv"
+    source.write_text("Phone,Name\n639171234567,First\n639222222222,Second\n0917-123-4567,Again\n")
+    lines = []
+    result = sms_pipeline.validate_frame(pd.read_csv(source, dtype=str), log=lines.append)
+    assert result["check"] == "duplicates"
+    assert "\n  639171234567 appears 2 times:" in lines
+    assert "    • Row 2: First" in lines and "    • Row 4: Again (as 09171234567)" in lines
+    streamed = []
+    code, _ = sms_pipeline.stream_file(str(source), str(tmp_path / "out.csv"), chunksize=1,
+                                       log=streamed.append)
+    assert code == sms_pipeline.EXIT_DUPLICATES
+    assert "    • Row 4: Again (as 09171234567)" in streamed
+
+
+def test_streaming_duplicates_report(tmp_path):
+    source = tmp_path / "dups.csv"
+    source.write_text("Phone,Name\n639123456789,A\n639234567890,B\n639123456789,C\n639123456789,D\n")
+    report = tmp_path / "dups_report.csv"
+    code = sms_pipeline.main([str(source), "--output-dir", str(tmp_path), "--chunksize", "1",
+                              "--duplicates-report", str(report), "-q"])
+    assert code == sms_pipeline.EXIT_DUPLICATES
+    assert report.read_text() == "Phone,Count,Rows\n639123456789,3,2 4 5\n"
+
+
+def test_session_cache_reuses_unchanged_file(tmp_path, monkeypatch):
+    source = tmp_path / "list.csv"
+    source.write_text("Phone,Name\n639123456789,John\n639234567890.0,Jane\n")
+    cache = sms_pipeline.SessionCache()
+    first_log, second_log = [], []
+    entry = cache.load(str(source), first_log.append)
+    assert entry["result"]["passed"]
+
+    reads = []
+    monkeypatch.setattr(sms_pipeline.pd, "read_csv", lambda *a, **k: reads.append(a))
+    assert cache.load(str(source), second_log.append) is entry
+    assert second_log == first_log and reads == []
+
+    df, stats = sms_pipeline.format_frame(entry["result"]["df"].copy(), lambda m: None,
+                                          phones=entry["result"]["phones"])
+    fresh, fresh_stats = sms_pipeline.format_frame(entry["result"]["df"].copy(), lambda m: None)
+    assert df["Phone"].tolist() == fresh["Phone"].tolist() == ["639123456789", "639234567890"]
+    assert stats == fresh_stats
+
+
+def test_session_cache_invalidates_on_change(tmp_path):
+    source = tmp_path / "list.csv"
+    source.write_text("Phone,Name\n639123456789,John\n")
+    cache = sms_pipeline.SessionCache()
+    entry = cache.load(str(source), lambda m: None)
+    source.write_text("Phone,Name\n639123456789,John\n639123456789,Again\n")
+    assert cache.get(str(source)) is None
+    changed = cache.load(str(source), lambda m: None)
+    assert changed is not entry and changed["result"]["check"] == "duplicates"
+    assert len(cache.entries) == 1
+
+
+def test_validation_report_is_capped():
+    """Only the first detail_limit offending rows are listed; the rest are counted"""
+    df = pd.DataFrame({"Phone": [f"6391234{i:05d}" for i in range(10)] * 2, "Name": ["x"] * 20})
+    lines = []
+    result = sms_pipeline.validate_frame(df, lines.append, detail_limit=3)
+    assert result["check"] == "duplicates"
+    assert sum(line.startswith("\n  6391234") for line in lines) == 3
+    assert "  ... and 7 more duplicated number(s)" in lines
+
+    df = pd.DataFrame({"Phone": ["12345"] * 50, "Name": ["x"] * 50})
+    lines = []
+    assert sms_pipeline.validate_frame(df, lines.append, detail_limit=3)["check"] == "phone_format"
+    assert sum(line.startswith("  • Row") for line in lines) == 3
+    assert "  ... and 47 more row(s)" in lines
+
+
+def test_find_missing_fields_lists_columns_per_row():
+    df = pd.DataFrame({
+        "Phone": ["639123456789", "639234567890", None, "639345678901"],
+        "Name": ["John", "None", "", "=A1"],
+        "Date": [" ", "2024-01-02", "", "#N/A"],
+        "Amount": [1.5, float("nan"), 2.0, 0.0],
+    }, index=[3, 5, 7, 9])
+    assert sms_pipeline.find_missing_fields(df, "Phone") == [
+        (3, ["Date"]),
+        (5, ["Name", "Amount"]),
+        (9, ["Name", "Date"]),
+    ]
+
+
+def test_packed_phones_round_trip():
+    digits = ["09123456789", "639123456789", "630012345678", "12345", ""]
+    numbers, tags = sms_pipeline.pack_phones(digits)
+    assert numbers.dtype == np.int64 and tags.dtype == np.int8
+    assert numbers.tolist() == [9123456789, 9123456789, 12345678, 0, 0]
+    assert tags.tolist() == [sms_pipeline.TAG_09, sms_pipeline.TAG_63, sms_pipeline.TAG_63,
+                             sms_pipeline.TAG_INVALID, sms_pipeline.TAG_INVALID]
+    assert sms_pipeline.unpack_phones(numbers[:3], tags[:3]).tolist() == digits[:3]
+    assert sms_pipeline.phone_keys(digits[:3]).tolist() == [9123456789, 9123456789, 12345678]
+
+
+def test_preview_rows_render_only_the_window():
+    raw = pd.DataFrame({"Phone": ["639123456789", "=A1", "09234567890"], "Name": ["Ann", "Bob", "José"]})
+    result = sms_pipeline.validate_frame(raw, log=lambda message: None)
+    rows = sms_pipeline.PreviewRows(raw, result["df"], result["phones"])
+    assert len(rows) == 3 and rows.position_of(4) == 2 and rows.position_of(9) is None
+    assert rows.window(1, 3) == [
+        ("  3 | =A1 | Bob", "", "removed"),
+        ("  4 | 09234567890 | José", "  4 | 09234567890 | Jose", "changed"),
+    ]
+    assert rows.window(0, 1)[0][2] is None
+
+
+def test_preview_diff_matrices_and_changes_filter():
+    raw = pd.DataFrame({"Phone": ["639123456789", "0923-456-7890", "639345678901", "#N/A"],
+                        "Name": ["Ann", "Zoë", "Bo", "Cy"], "City": ["Cebu", "Pasig", "Parañaque", "Iloilo"]})
+    result = sms_pipeline.validate_frame(raw, log=lambda message: None)
+    rows = sms_pipeline.PreviewRows(raw, result["df"], result["phones"])
+    diff = rows.diff
+    assert diff["removed"].tolist() == [False, False, False, True]
+    assert diff["phone"].tolist() == [False, True, False, False]
+    assert diff["transliterated"].tolist() == [[False, False, False], [False, True, False],
+                                               [False, False, True], [False, False, False]]
+    rows.show_changes_only(True)
+    assert len(rows) == 3 and rows.position_of(2) is None and rows.position_of(5) == 2
+
+
+def test_session_cache_keeps_the_preview_diff(tmp_path, monkeypatch):
+    source = tmp_path / "list.csv"
+    source.write_text("Phone,Name\n639123456789,Ann\n0923-456-7890,Zoë\n")
+    cache = sms_pipeline.SessionCache()
+    entry = cache.load(str(source), log=lambda message: None)
+    diff = cache.preview_diff(entry)
+    assert diff["phone"].tolist() == [False, True]
+    assert cache.preview_diff(entry) is diff
+    monkeypatch.setattr(sms_pipeline, "preview_diff", None)  # the preview only slices the cached diff
+    rows = sms_pipeline.PreviewRows(entry["raw"], entry["result"]["df"], entry["result"]["phones"], diff=diff)
+    assert rows.window(1, 2)[0][2] == "changed"
+
+
+def test_progress_reports_rate_and_eta(tmp_path):
+    now = [0.0]
+    reports = []
+    progress = sms_pipeline.Progress(lambda text, done: reports.append((text, done)), interval=1.0,
+                                     clock=lambda: now[0])
+    progress.start("Writing output", 1000)
+    now[0] = 0.5
+    progress.advance(100)  # within the interval: not reported
+    now[0] = 2.0
+    progress.advance(300)
+    now[0] = 4.0
+    progress.finish(1000)
+    assert reports == [
+        ("⏳ Writing output: 0 / 1,000 rows (0%)", False),
+        ("⏳ Writing output: 400 / 1,000 rows (40%) • 200 rows/s • ETA 3s", False),
+        ("✓ Writing output: 1,000 rows in 4.0s (250 rows/s)", True),
+    ]
+    source = tmp_path / "rows.csv"
+    source.write_text("Phone,Name\n639123456789,A\n639234567890,B")
+    assert sms_pipeline.count_data_rows(str(source)) == 2
+
+
+def test_benchmark_records_every_stage(tmp_path):
+    records = benchmark_pipeline.benchmark([200], work_dir=str(tmp_path), log=lambda m: None)
+    stages = [name for name, _ in benchmark_pipeline._stages("", "")]
+    assert [r["stage"] for r in records] == stages
+    assert all(r["rows"] == 200 and r["seconds"] >= 0 and r["peak_mb"] is not None for r in records)
+    assert os.listdir(tmp_path) == []
+
+
+def test_generated_lists_are_seeded_and_streamed(tmp_path):
+    first, second = tmp_path / "a.csv", tmp_path / "b.csv"
+    assert generate_contacts.write_contacts(str(first), 2500, seed=7, chunk_rows=1000) == 2500
+    generate_contacts.write_contacts(str(second), 2500, seed=7, chunk_rows=1000)
+    assert first.read_bytes() == second.read_bytes()
+    df = pd.read_csv(first, dtype=str)
+    assert len(df) == 2500 and list(df.columns) == ["Phone", "Name", "City", "Date"]
+    assert df["Phone"].str.startswith("09").any() and df["Phone"].str.endswith(".0").any()
+    assert sms_pipeline.validate_frame(df, lambda m: None)["passed"]
+
+    for problem, check in [("duplicate", "duplicates"), ("missing", "missing_fields"),
+                           ("letters", "phone_letters"), ("scientific", None)]:
+        generate_contacts.write_contacts(str(first), 2000, ratios={problem: 0.02})
+        result = sms_pipeline.validate_frame(sms_pipeline.read_contacts(str(first)), lambda m: None)
+        assert result["check"] == check and result["passed"] == (check is None)
+    with pytest.raises(ValueError):
+        generate_contacts.resolve_ratios({"local": 0.9, "decimal": 0.2})
+
+
+def test_timings_record_stages_checks_and_reports(tmp_path, monkeypatch):
+    now = [0.0]
+    timings = sms_pipeline.Timings(clock=lambda: now[0])
+    progress = sms_pipeline.Progress(clock=lambda: now[0], timings=timings)
+    for _ in range(2):
+        progress.start("Writing output", 100)
+        now[0] += 0.5
+        progress.finish(100)
+    with timings.stage("Check: duplicates", 50):
+        now[0] += 0.25
+    assert timings.records() == [
+        {"stage": "Writing output", "seconds": 1.0, "count": 200, "unit": "rows", "calls": 2, "per_second": 200},
+        {"stage": "Check: duplicates", "seconds": 0.25, "count": 50, "unit": "rows", "calls": 1, "per_second": 200},
+    ]
+
+    checks = sms_pipeline.Timings()
+    sms_pipeline.validate_frame(pd.read_csv(corpus("test_01_basic_63_format.csv")), lambda m: None, timings=checks)
+    assert {"Cleaning artifacts", "Check: empty phones", "Normalizing phones", "Check: duplicates"} <= set(checks.stages)
+
+    monkeypatch.setattr(sms_pipeline, "TIMINGS_KEEP", 2)
+    for _ in range(3):
+        path = sms_pipeline.save_timings(timings, str(tmp_path), "run")
+    assert len(os.listdir(tmp_path)) == 2
+    with open(path, encoding="utf-8") as f:
+        assert [record["stage"] for record in json.load(f)["stages"]] == ["Writing output", "Check: duplicates"]
+
+    monkeypatch.setenv(sms_pipeline.PROFILE_ENV, "1")
+    code = sms_pipeline.main([corpus("test_01_basic_63_format.csv"), "-o", str(tmp_path / "out.csv"),
+                              "--timings", str(tmp_path / "timings"), "-q"])
+    assert code == sms_pipeline.EXIT_OK
+    saved = sorted(os.listdir(tmp_path / "timings"))
+    assert [os.path.splitext(name)[1] for name in saved] == [".json", ".prof"]
+    with open(tmp_path / "timings" / saved[0], encoding="utf-8") as f:
+        report = json.load(f)
+    assert "Validating" in [record["stage"] for record in report["stages"]] and report["hot_spots"]
+
+
+def test_memory_tracking_per_stage_and_frame():
+    timings = sms_pipeline.Timings(memory=True)
+    timings.start()
+    with timings.stage("Outer"):
+        with timings.stage("Allocate", 1):
+            kept = np.ones(1 << 20)  # 8 MB
+            scratch = np.ones(1 << 21)  # 16 MB, freed below
+            del scratch
+    df = pd.DataFrame({"Phone": ["639123456789"] * 1000})
+    timings.track_frame("raw", df)
+    timings.track_frame("cleaned", df)
+    timings.stop()
+    records = {record["stage"]: record for record in timings.records()}
+    assert records["Allocate"]["peak_mb"] >= 24 and 7.9 <= records["Allocate"]["retained_mb"] < 9
+    assert records["Outer"]["peak_mb"] >= 24
+    memory = timings.report()["memory"]
+    assert memory["traced_peak_mb"] >= 24 and memory["frames"]["cleaned"]["same_as"] == "raw"
+    assert memory["frames_mb"] == memory["frames"]["raw"]["mb"] > 0
+    assert kept.size and not sms_pipeline.tracemalloc.is_tracing()
+
+
+def test_contacts_are_read_as_text(tmp_path):
+    source = tmp_path / "typed.csv"
+    source.write_text("Phone,Name,Zip\n09171234567,Ana,0400\n6.39181234567E+11,Ben,1100\n639191234567.0,Cy,0001\n")
+    df = sms_pipeline.read_contacts(str(source))
+    assert df["Phone"].tolist() == ["09171234567", "639181234567.0", "639191234567.0"]
+    chunks = list(sms_pipeline.read_contact_chunks(str(source), 2))
+    assert pd.concat(chunks)["Phone"].tolist() == df["Phone"].tolist()
+
+    whole, streamed = tmp_path / "whole.csv", tmp_path / "streamed.csv"
+    assert sms_pipeline.run(str(source), None, output_path=str(whole), log=lambda m: None)[0] == sms_pipeline.EXIT_OK
+    assert sms_pipeline.run(str(source), None, output_path=str(streamed), log=lambda m: None,
+                            chunksize=2)[0] == sms_pipeline.EXIT_OK
+    assert whole.read_text() == streamed.read_text() == (
+        "Phone,Name,Zip\n09171234567,Ana,0400\n639181234567,Ben,1100\n639191234567,Cy,0001\n")
+
+
+def test_columnar_inputs_are_recognised(tmp_path):
+    for name in ("a.csv", "b.parquet", "c.feather", "notes.txt"):
+        (tmp_path / name).write_text("")
+    assert [os.path.basename(p) for p in sms_pipeline.expand_inputs([str(tmp_path)])] == [
+        "a.csv", "b.parquet", "c.feather"]
+    assert sms_pipeline.input_format("x.PQ") == "parquet"
+    assert sms_pipeline.input_format("x.arrow") == "arrow"
+    assert sms_pipeline.parquet_path(os.path.join("out", "list.csv")) == os.path.join("out", "list.parquet")
+    if not sms_pipeline.PYARROW_AVAILABLE:
+        with pytest.raises(ValueError, match="pyarrow"):
+            sms_pipeline.read_contacts(str(tmp_path / "b.parquet"))
+
+
+def test_parquet_input_and_sidecar_match_csv(tmp_path):
+    pytest.importorskip("pyarrow")
+    source = tmp_path / "contacts.parquet"
+    pd.DataFrame({"Phone": ["09171234567", "639181234567"], "Name": ["Ana", "José"],
+                  "Zip": [400, 1100]}).to_parquet(source)
+    df = sms_pipeline.read_contacts(str(source))
+    assert df["Zip"].tolist() == ["400", "1100"]
+    chunks = list(sms_pipeline.read_contact_chunks(str(source), 1))
+    assert [chunk.index[0] for chunk in chunks] == [0, 1]
+
+    whole, streamed = tmp_path / "whole.csv", tmp_path / "streamed.csv"
+    assert sms_pipeline.run(str(source), None, output_path=str(whole), log=lambda m: None,
+                            parquet=True)[0] == sms_pipeline.EXIT_OK
+    assert sms_pipeline.run(str(source), None, output_path=str(streamed), log=lambda m: None,
+                            chunksize=1, parquet=True)[0] == sms_pipeline.EXIT_OK
+    assert whole.read_text() == streamed.read_text() == "Phone,Name,Zip\n09171234567,Ana,400\n639181234567,Jose,1100\n"
+    for output in (whole, streamed):
+        copy = pd.read_parquet(sms_pipeline.parquet_path(str(output)))
+        assert copy.values.tolist() == pd.read_csv(output, dtype=str).values.tolist()
+
+
+def test_workbooks_stream_like_csv(tmp_path):
+    source = tmp_path / "contacts.xlsx"
+    if not sms_pipeline.OPENPYXL_AVAILABLE:
+        source.write_bytes(b"")
+        with pytest.raises(ValueError, match="openpyxl"):
+            sms_pipeline.read_contacts(str(source))
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["not the list"])
+    sheet = workbook.create_sheet("Contacts")
+    for row in [["Phone", "Name", "Zip"], ["09171234567", "José", "0400"], [639181234567, "Ben", 1100],
+                ["#REF!", "Err", None], [None, None, None], [6.39191234567e11, "Cy", "0001"]]:
+        sheet.append(row)
+    workbook.save(source)
+
+    df = sms_pipeline.read_contacts(str(source), "Contacts")
+    assert df["Phone"].tolist()[:3] == ["09171234567", "639181234567", "#REF!"]
+    assert df["Zip"].tolist()[:2] == ["0400", "1100"]
+    chunks = list(sms_pipeline.read_contact_chunks(str(source), 2, sheet="Contacts"))
+    assert [chunk.index.tolist() for chunk in chunks] == [[0, 1], [2, 3], [4]]
+    with pytest.raises(ValueError, match="Sheet 'Missing' not found"):
+        sms_pipeline.read_contacts(str(source), "Missing")
+
+    whole, streamed = tmp_path / "whole.csv", tmp_path / "streamed.csv"
+    assert sms_pipeline.run(str(source), None, output_path=str(whole), log=lambda m: None,
+                            sheet="Contacts")[0] == sms_pipeline.EXIT_OK
+    assert sms_pipeline.run(str(source), None, output_path=str(streamed), log=lambda m: None,
+                            chunksize=2, sheet="Contacts")[0] == sms_pipeline.EXIT_OK
+    assert whole.read_text() == streamed.read_text() == (
+        "Phone,Name,Zip\n09171234567,Jose,0400\n639181234567,Ben,1100\n639191234567,Cy,0001\n")
+
+
+def test_compressed_lists_are_detected_and_written(tmp_path):
+    text = "Phone,Name\n09171234567,José\n639181234567,Ben\n"
+    expected = "Phone,Name\n09171234567,Jose\n639181234567,Ben\n"
+    # gzip content behind a plain .csv name is recognised by its magic bytes
+    source = tmp_path / "export.csv"
+    source.write_bytes(gzip.compress(text.encode("utf-8")))
+    assert sms_pipeline.detect_compression(str(source)) == "gzip"
+    assert sms_pipeline.read_contacts(str(source))["Phone"].tolist() == ["09171234567", "639181234567"]
+
+    for chunksize in (None, 1):
+        code, output = sms_pipeline.run(str(source), str(tmp_path), name=f"out{chunksize}", log=lambda m: None,
+                                        chunksize=chunksize, compression="gzip")
+        assert code == sms_pipeline.EXIT_OK and output.endswith(".csv.gz")
+        assert gzip.decompress(open(output, "rb").read()).decode("utf-8") == expected
+    assert sms_pipeline.file_stem(output) == "out1"
+    # Folders (CLI batch and GUI drops) pick compressed lists up by content too
+    folder = tmp_path / "lists"
+    folder.mkdir()
+    (folder / "archive.dat").write_bytes(source.read_bytes())
+    (folder / "notes.txt").write_text("not a list")
+    assert sms_pipeline.expand_inputs([str(folder)]) == [str(folder / "archive.dat")]
+    assert not sms_pipeline.is_contact_list(str(folder / "notes.txt"))
+
+    zstandard = pytest.importorskip("zstandard")
+    source.write_bytes(zstandard.ZstdCompressor().compress(text.encode("utf-8")))
+    assert sms_pipeline.detect_compression(str(source)) == "zstd"
+    code, output = sms_pipeline.run(str(source), str(tmp_path), log=lambda m: None, chunksize=1,
+                                    compression="zstd")
+    with zstandard.open(output, "rt", encoding="utf-8", newline="") as f:
+        assert f.read() == expected
+
+
+def test_failed_stream_leaves_no_part_file(tmp_path, monkeypatch):
+    source = tmp_path / "contacts.csv"
+    source.write_text("Phone,Name\n639171234567,Ana\n639181234567,Ben\n639191234567,Cy\n")
+    output = tmp_path / "out.csv"
+    calls = []
+
+    def failing_format(df, *args, **kwargs):
+        calls.append(len(df))
+        if len(calls) == 2:
+            raise RuntimeError("disk full")
+        return original(df, *args, **kwargs)
+    original = sms_pipeline.format_frame
+    monkeypatch.setattr(sms_pipeline, "format_frame", failing_format)
+    with pytest.raises(RuntimeError):
+        sms_pipeline.run(str(source), None, output_path=str(output), log=lambda m: None, chunksize=1)
+    assert os.listdir(tmp_path) == ["contacts.csv"]
+
+
+def test_phones_are_normalized_once_per_row(tmp_path, monkeypatch):
+    source = tmp_path / "contacts.csv"
+    source.write_text("Phone,Name\n639171234567.0,Ana\n09181234567,Ben\n+63 919 123 4567,Cy\n")
+    normalized = []
+
+    def counting_normalize(series):
+        normalized.append(len(series))
+        return original(series)
+    original = sms_pipeline.normalize_phones
+    monkeypatch.setattr(sms_pipeline, "normalize_phones", counting_normalize)
+    for chunksize in (None, 2):
+        normalized.clear()
+        output = tmp_path / f"out_{chunksize}.csv"
+        code, _ = sms_pipeline.run(str(source), None, output_path=str(output), log=lambda m: None,
+                                   chunksize=chunksize)
+        assert code == sms_pipeline.EXIT_OK and sum(normalized) == 3, chunksize
+        assert pd.read_csv(output, dtype=str)["Phone"].tolist() == ["639171234567", "09181234567", "639191234567"]